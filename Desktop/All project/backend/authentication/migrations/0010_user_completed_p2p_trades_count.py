@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0009_add_seller_status_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="completed_p2p_trades_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of completed P2P service transactions as buyer (maintained by P2PServiceTransaction.save)",
+            ),
+        ),
+    ]
@@ -34,6 +34,7 @@ class User(AbstractUser):
     
     # Trust Score & Reputation System
     successful_trades = models.IntegerField(default=0, help_text="Number of successfully completed gift card trades")
+    completed_p2p_trades_count = models.PositiveIntegerField(default=0, help_text="Number of completed P2P service transactions as buyer (maintained by P2PServiceTransaction.save)")
     disputes_filed = models.IntegerField(default=0, help_text="Number of disputes filed by this user")
     disputes_against = models.IntegerField(default=0, help_text="Number of disputes filed against this user")
     trust_score = models.IntegerField(default=0, help_text="Trust score calculated from trades, disputes, and verification")
@@ -240,9 +241,12 @@ class User(AbstractUser):
         
         return active_count < max_allowed
     
-    def get_max_gift_card_value_cedis(self):
-        """Get maximum gift card value in cedis allowed based on trust score"""
-        score = self.get_effective_trust_score()
+    def get_max_gift_card_value_cedis(self, trust_score=None):
+        """
+        Get maximum gift card value in cedis allowed based on trust score
+        Pass trust_score when the caller already has get_effective_trust_score()
+        """
+        score = self.get_effective_trust_score() if trust_score is None else trust_score
         
         # New users (trust_score < 3): Cannot list gift cards above 500 cedis
         if score < 3:
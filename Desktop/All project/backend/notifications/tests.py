@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from .models import Notification
+from .utils import create_notifications_bulk
 
 User = get_user_model()
 
@@ -60,4 +61,30 @@ class NotificationModelTest(TestCase):
         )
         
         unread_count = Notification.get_unread_count(self.user)
-        self.assertEqual(unread_count, 2)
\ No newline at end of file
+        self.assertEqual(unread_count, 2)
+
+
+class CreateNotificationsBulkTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+
+    def test_creates_all_notifications_in_one_query(self):
+        """Test that bulk creation accepts users or ids and issues a single INSERT"""
+        events = [
+            (self.user, 'SYSTEM', 'Title 1', 'Message 1', 'order', 1),
+            (self.other_user.id, 'SYSTEM', 'Title 2', 'Message 2', 'order', 2),
+        ]
+        with self.assertNumQueries(1):
+            notifications = create_notifications_bulk(events)
+        self.assertEqual(len(notifications), 2)
+        self.assertEqual(Notification.objects.get(user=self.user).message, 'Message 1')
+        self.assertEqual(Notification.objects.get(user=self.other_user).related_object_id, 2)
@@ -77,6 +77,45 @@ def create_notification(user, notification_type, title, message, related_object_
     return notification
 
 
+def create_notifications_bulk(events, batch_size=500):
+    """
+    Create many notifications with one bulk INSERT, then push each via WebSocket.
+    
+    Args:
+        events: Iterable of (user, notification_type, title, message,
+                related_object_type, related_object_id) tuples. user may be a
+                User instance or a user id.
+        batch_size: Rows per INSERT statement
+    
+    Returns:
+        List of created Notification instances
+    """
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=getattr(user, 'pk', user),
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            related_object_type=related_object_type,
+            related_object_id=related_object_id,
+        )
+        for user, notification_type, title, message, related_object_type, related_object_id in events
+    ], batch_size=batch_size)
+    
+    if 'channels' in settings.INSTALLED_APPS:
+        for notification in notifications:
+            send_realtime_notification(notification.user_id, {
+                'id': notification.id,
+                'title': notification.title,
+                'message': notification.message,
+                'notification_type': notification.notification_type,
+                'created_at': notification.created_at.isoformat(),
+                'read': notification.read,
+            })
+    
+    return notifications
+
+
 def send_realtime_notification(user_id, notification_data):
     """
     Send real-time notification via WebSocket.
@@ -0,0 +1,74 @@
+"""
+Management command to hash P2P listing proof images uploaded before hashing moved to the process_proof_image task.
+P2PServiceListing.save() only queues that task for new uploads, so legacy listings are hashed here, once.
+"""
+from contextlib import ExitStack
+from itertools import islice
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.image_utils import phash_band_fields
+from orders.p2p_models import P2PServiceListing
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Listings read and hashed per batch
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Hash proof images of P2P listings that were never processed (hash and bands only, no watermarking)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many listings would be hashed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        listings = P2PServiceListing.objects.exclude(proof_image='').exclude(proof_image__isnull=True).filter(
+            proof_image_hash='', proof_image_processed_at__isnull=True
+        ).only('proof_image')
+        self.stdout.write(f'Found {listings.count()} listings with an unprocessed proof image')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+            return
+
+        listing_iterator = listings.iterator(chunk_size=BATCH_SIZE)
+        hashed = total = 0
+        while True:
+            chunk = list(islice(listing_iterator, BATCH_SIZE))
+            if not chunk:
+                break
+            hashed += self._hash_chunk(chunk)
+            total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Hashed {hashed} proof images ({total - hashed} could not be hashed)'))
+
+    def _hash_chunk(self, listings):
+        """Hash a chunk of listings' proof images in one batch and store the results; returns how many were hashed"""
+        with ExitStack() as stack:
+            opened, image_files = [], []
+            for listing in listings:
+                try:
+                    image_files.append(stack.enter_context(listing.proof_image.open('rb')))
+                    opened.append(listing.pk)
+                except OSError as e:
+                    logger.warning(f"Could not open proof image for P2P listing {listing.pk}: {str(e)}")
+            image_hashes = dict(zip(opened, P2PServiceListing.batch_hash_images(image_files)))
+
+        now = timezone.now()
+        hashed = 0
+        for listing in listings:
+            image_hash = image_hashes.get(listing.pk) or ''
+            # Failures are recorded too, so a rerun doesn't retry them; skip listings whose image changed meanwhile
+            P2PServiceListing.objects.filter(pk=listing.pk, proof_image=listing.proof_image.name).update(
+                proof_image_hash=image_hash,
+                proof_image_processed_at=now,
+                **phash_band_fields('proof_image_hash', image_hash),
+            )
+            if image_hash:
+                hashed += 1
+        return hashed
@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+def hex_signatures_to_bytes(apps, schema_editor):
+    """Convert existing 64-char hex signatures into raw 32-byte digests"""
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    for log in TransactionAuditLog.objects.exclude(signature='').only('id', 'signature').iterator(chunk_size=2000):
+        try:
+            digest = bytes.fromhex(log.signature)
+        except ValueError:
+            continue
+        TransactionAuditLog.objects.filter(pk=log.pk).update(signature_bin=digest)
+
+
+def bytes_signatures_to_hex(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    for log in TransactionAuditLog.objects.only('id', 'signature_bin').iterator(chunk_size=2000):
+        if log.signature_bin:
+            TransactionAuditLog.objects.filter(pk=log.pk).update(signature=bytes(log.signature_bin).hex())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0023_giftcardtransaction_auto_cancelled_and_more"),
+    ]
+
+    operations = [
+        # Postgres cannot cast varchar -> bytea in place, so copy into a new
+        # column, convert the hex payload, then swap the columns over.
+        migrations.AddField(
+            model_name="transactionauditlog",
+            name="signature_bin",
+            field=models.BinaryField(blank=True, max_length=32),
+        ),
+        migrations.RunPython(hex_signatures_to_bytes, reverse_code=bytes_signatures_to_hex),
+        migrations.RemoveField(
+            model_name="transactionauditlog",
+            name="signature",
+        ),
+        migrations.RenameField(
+            model_name="transactionauditlog",
+            old_name="signature_bin",
+            new_name="signature",
+        ),
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="signature",
+            field=models.BinaryField(
+                blank=True,
+                help_text="Raw HMAC-SHA256 digest for log integrity",
+                max_length=32,
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+# GIN / expression indexes only exist on Postgres. SQLite (local dev) has no
+# jsonb, so these are created conditionally instead of via Meta.indexes.
+JSONB_INDEXES = [
+    (
+        "idx_audit_metadata_gin",
+        "CREATE INDEX IF NOT EXISTS idx_audit_metadata_gin "
+        "ON transaction_audit_logs USING gin (metadata jsonb_path_ops);",
+    ),
+    (
+        "idx_audit_new_state_gin",
+        "CREATE INDEX IF NOT EXISTS idx_audit_new_state_gin "
+        "ON transaction_audit_logs USING gin (new_state);",
+    ),
+    (
+        # Expression index on the extracted scalar is far smaller than a GIN
+        # over the whole document and serves metadata__reason lookups directly
+        "idx_audit_reason",
+        "CREATE INDEX IF NOT EXISTS idx_audit_reason "
+        "ON transaction_audit_logs ((metadata->>'reason'));",
+    ),
+]
+
+
+def create_jsonb_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _name, sql in JSONB_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_jsonb_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _sql in JSONB_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name};")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0024_transactionauditlog_binary_signature"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_jsonb_indexes, reverse_code=drop_jsonb_indexes),
+    ]
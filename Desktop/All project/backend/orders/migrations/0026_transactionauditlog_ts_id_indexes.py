@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+def create_timestamp_brin(apps, schema_editor):
+    # BRIN suits the append-only, monotonically growing timestamp column
+    # at a fraction of a btree's size. Postgres only.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_audit_ts_brin "
+        "ON transaction_audit_logs USING brin (timestamp);"
+    )
+
+
+def drop_timestamp_brin(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_audit_ts_brin;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0025_transactionauditlog_jsonb_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transactionauditlog",
+            name="idx_action_timestamp",
+        ),
+        migrations.AddIndex(
+            model_name="transactionauditlog",
+            index=models.Index(fields=["-timestamp", "-id"], name="idx_audit_ts_id"),
+        ),
+        migrations.AddIndex(
+            model_name="transactionauditlog",
+            index=models.Index(
+                condition=models.Q(("action__in", ["dispute_opened", "rejected_by_admin"])),
+                fields=["action"],
+                name="idx_audit_action_partial",
+            ),
+        ),
+        migrations.RunPython(create_timestamp_brin, reverse_code=drop_timestamp_brin),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0026_transactionauditlog_ts_id_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transactionauditlog",
+            name="idx_txn_type_id",
+        ),
+        migrations.AddIndex(
+            model_name="transactionauditlog",
+            index=models.Index(
+                fields=["transaction_type", "transaction_id", "-timestamp"],
+                include=("action", "performed_by"),
+                name="idx_txn_type_id_ts",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_performed_by_email(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    User = apps.get_model('authentication', 'User')
+    TransactionAuditLog.objects.filter(performed_by__isnull=False).update(
+        performed_by_email=Subquery(
+            User.objects.filter(pk=OuterRef('performed_by_id')).values('email')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0009_add_seller_status_fields"),
+        ("orders", "0027_transactionauditlog_history_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transactionauditlog",
+            name="performed_by_email",
+            field=models.CharField(
+                blank=True,
+                help_text="Email of performed_by at the time of the action (snapshot, not updated)",
+                max_length=254,
+            ),
+        ),
+        migrations.RunPython(backfill_performed_by_email, reverse_code=migrations.RunPython.noop),
+    ]
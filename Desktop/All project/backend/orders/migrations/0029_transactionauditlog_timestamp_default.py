@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def set_timestamp_server_default(apps, schema_editor):
+    # Django 4.2 has no db_default; give Postgres a server-side default so raw
+    # and COPY inserts that omit the column still get a timestamp
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE transaction_audit_logs ALTER COLUMN timestamp SET DEFAULT CURRENT_TIMESTAMP;"
+    )
+
+
+def drop_timestamp_server_default(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE transaction_audit_logs ALTER COLUMN timestamp DROP DEFAULT;"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0028_transactionauditlog_performed_by_email"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.RunPython(set_timestamp_server_default, reverse_code=drop_timestamp_server_default),
+    ]
@@ -0,0 +1,62 @@
+import socket
+
+from django.db import migrations, models
+
+
+def pack_ip_addresses(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    logs = TransactionAuditLog.objects.exclude(ip_address__isnull=True)
+    for log in logs.only('id', 'ip_address').iterator(chunk_size=2000):
+        if not log.ip_address:
+            continue
+        family = socket.AF_INET6 if ':' in log.ip_address else socket.AF_INET
+        try:
+            packed = socket.inet_pton(family, log.ip_address)
+        except OSError:
+            continue
+        TransactionAuditLog.objects.filter(pk=log.pk).update(ip_address_packed=packed)
+
+
+def unpack_ip_addresses(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    logs = TransactionAuditLog.objects.exclude(ip_address_packed__isnull=True)
+    for log in logs.only('id', 'ip_address_packed').iterator(chunk_size=2000):
+        packed = bytes(log.ip_address_packed)
+        family = socket.AF_INET if len(packed) == 4 else socket.AF_INET6
+        TransactionAuditLog.objects.filter(pk=log.pk).update(ip_address=socket.inet_ntop(family, packed))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0029_transactionauditlog_timestamp_default"),
+    ]
+
+    operations = [
+        # Same copy/convert/swap approach as 0024: no in-place text -> bytea cast
+        migrations.AddField(
+            model_name="transactionauditlog",
+            name="ip_address_packed",
+            field=models.BinaryField(blank=True, max_length=16, null=True),
+        ),
+        migrations.RunPython(pack_ip_addresses, reverse_code=unpack_ip_addresses),
+        migrations.RemoveField(
+            model_name="transactionauditlog",
+            name="ip_address",
+        ),
+        migrations.RenameField(
+            model_name="transactionauditlog",
+            old_name="ip_address_packed",
+            new_name="ip_address",
+        ),
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="ip_address",
+            field=models.BinaryField(
+                blank=True,
+                help_text="Packed IP address of requester (4 bytes IPv4, 16 bytes IPv6); see ip_str",
+                max_length=16,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,158 @@
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+TRANSACTION_TYPE_CODES = {
+    'gift_card': 1,
+    'p2p_service': 2,
+    'crypto_buy': 3,
+    'crypto_sell': 4,
+    'escrow': 5,
+}
+
+ACTION_CODES = {
+    'created': 1,
+    'payment_verified': 2,
+    'payment_locked': 3,
+    'card_provided': 4,
+    'buyer_verified': 5,
+    'funds_released': 6,
+    'auto_cancelled': 7,
+    'auto_released': 8,
+    'dispute_opened': 9,
+    'dispute_resolved': 10,
+    'cancelled': 11,
+    'refund_issued': 12,
+    'approved_by_admin': 13,
+    'rejected_by_admin': 14,
+}
+
+
+def _case(source, mapping):
+    return Case(*[When(**{source: key}, then=Value(code)) for key, code in mapping.items()])
+
+
+def encode_choices(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    TransactionAuditLog.objects.update(
+        transaction_type_code=_case('transaction_type', TRANSACTION_TYPE_CODES),
+        action_code=_case('action', ACTION_CODES),
+    )
+
+
+def decode_choices(apps, schema_editor):
+    TransactionAuditLog = apps.get_model('orders', 'TransactionAuditLog')
+    TransactionAuditLog.objects.update(
+        transaction_type=_case('transaction_type_code', {v: k for k, v in TRANSACTION_TYPE_CODES.items()}),
+        action=_case('action_code', {v: k for k, v in ACTION_CODES.items()}),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0030_transactionauditlog_packed_ip_address"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transactionauditlog",
+            name="idx_txn_type_id_ts",
+        ),
+        migrations.RemoveIndex(
+            model_name="transactionauditlog",
+            name="idx_audit_action_partial",
+        ),
+        migrations.AddField(
+            model_name="transactionauditlog",
+            name="transaction_type_code",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="transactionauditlog",
+            name="action_code",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        # Nullable first so the reverse migration can re-add the text columns to
+        # a populated table, refill them, and only then restore NOT NULL
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="transaction_type",
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="action",
+            field=models.CharField(max_length=30, null=True),
+        ),
+        migrations.RunPython(encode_choices, reverse_code=decode_choices),
+        migrations.RemoveField(
+            model_name="transactionauditlog",
+            name="transaction_type",
+        ),
+        migrations.RemoveField(
+            model_name="transactionauditlog",
+            name="action",
+        ),
+        migrations.RenameField(
+            model_name="transactionauditlog",
+            old_name="transaction_type_code",
+            new_name="transaction_type",
+        ),
+        migrations.RenameField(
+            model_name="transactionauditlog",
+            old_name="action_code",
+            new_name="action",
+        ),
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="transaction_type",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (1, "Gift Card Transaction"),
+                    (2, "P2P Service Transaction"),
+                    (3, "Crypto Buy"),
+                    (4, "Crypto Sell"),
+                    (5, "Escrow Operation"),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transactionauditlog",
+            name="action",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (1, "Transaction Created"),
+                    (2, "Payment Verified"),
+                    (3, "Payment Locked in Escrow"),
+                    (4, "Gift Card Provided"),
+                    (5, "Buyer Verified Item"),
+                    (6, "Funds Released to Seller"),
+                    (7, "Auto-Cancelled by System"),
+                    (8, "Auto-Released by System"),
+                    (9, "Dispute Opened"),
+                    (10, "Dispute Resolved"),
+                    (11, "Transaction Cancelled"),
+                    (12, "Refund Issued"),
+                    (13, "Approved by Admin"),
+                    (14, "Rejected by Admin"),
+                ]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transactionauditlog",
+            index=models.Index(
+                fields=["transaction_type", "transaction_id", "-timestamp"],
+                include=("action", "performed_by"),
+                name="idx_txn_type_id_ts",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transactionauditlog",
+            index=models.Index(
+                condition=models.Q(("action__in", [9, 14])),
+                fields=["action"],
+                name="idx_audit_action_partial",
+            ),
+        ),
+    ]
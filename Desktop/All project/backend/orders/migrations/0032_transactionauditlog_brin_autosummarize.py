@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def _rebuild_timestamp_brin(schema_editor, options):
+    # Built concurrently under a temporary name and swapped in, so writers to
+    # the audit table aren't blocked and timestamp scans keep an index meanwhile
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_audit_ts_brin_new;")
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY idx_audit_ts_brin_new ON transaction_audit_logs "
+        f"USING brin (timestamp){options};"
+    )
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_audit_ts_brin;")
+    schema_editor.execute("ALTER INDEX idx_audit_ts_brin_new RENAME TO idx_audit_ts_brin;")
+
+
+def tune_timestamp_brin(apps, schema_editor):
+    # Smaller block ranges and autosummarize keep the BRIN selective for
+    # "last N days" scans: autovacuum summarizes each newly filled range
+    # instead of leaving the tail of the table unsummarized. Postgres only.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild_timestamp_brin(schema_editor, " WITH (pages_per_range = 32, autosummarize = on)")
+
+
+def restore_timestamp_brin(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild_timestamp_brin(schema_editor, "")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("orders", "0031_transactionauditlog_integer_choices"),
+    ]
+
+    operations = [
+        migrations.RunPython(tune_timestamp_brin, reverse_code=restore_timestamp_brin),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.13 on 2026-10-17 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0032_transactionauditlog_brin_autosummarize'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status', 'payment_received')), fields=['payment_deadline'], name='p2p_pymt_dl_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status', 'buyer_marked_paid')), fields=['seller_confirmation_deadline'], name='p2p_sconf_dl_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status__in', ['payment_received', 'seller_confirmed_payment'])), fields=['seller_response_deadline'], name='p2p_sresp_dl_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status', 'service_provided')), fields=['buyer_verification_deadline'], name='p2p_bver_dl_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status', 'verifying')), fields=['auto_release_at'], name='p2p_autorel_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='p2pservicetransaction',
+            index=models.Index(condition=models.Q(('escrow_released', False), ('status', 'completed')), fields=['id'], name='p2p_done_unreleased_idx'),
+        ),
+    ]
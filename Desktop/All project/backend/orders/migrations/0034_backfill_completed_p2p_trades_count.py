@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_completed_p2p_trades_count(apps, schema_editor):
+    P2PServiceTransaction = apps.get_model('orders', 'P2PServiceTransaction')
+    User = apps.get_model('authentication', 'User')
+    User.objects.update(
+        completed_p2p_trades_count=Coalesce(
+            Subquery(
+                P2PServiceTransaction.objects.filter(buyer_id=OuterRef('pk'), status='completed')
+                .order_by().values('buyer_id').annotate(count=Count('id')).values('count'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0010_user_completed_p2p_trades_count"),
+        ("orders", "0033_p2pservicetransaction_deadline_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_completed_p2p_trades_count, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+COMPLETED_INDEXES = [
+    models.Index(condition=models.Q(("status", "completed")), fields=["buyer"], name="p2ptx_buyer_completed_partial"),
+    models.Index(condition=models.Q(("status", "completed")), fields=["seller"], name="p2ptx_seller_completed_partial"),
+]
+
+
+def create_completed_indexes(apps, schema_editor):
+    # CONCURRENTLY keeps writes to the transactions table flowing while the
+    # indexes build on Postgres; other backends build them the usual way.
+    model = apps.get_model('orders', 'P2PServiceTransaction')
+    concurrently = schema_editor.connection.vendor == 'postgresql'
+    for index in COMPLETED_INDEXES:
+        if concurrently:
+            schema_editor.execute(
+                str(index.create_sql(model, schema_editor)).replace(
+                    'CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1
+                )
+            )
+        else:
+            schema_editor.add_index(model, index)
+
+
+def drop_completed_indexes(apps, schema_editor):
+    model = apps.get_model('orders', 'P2PServiceTransaction')
+    concurrently = schema_editor.connection.vendor == 'postgresql'
+    for index in COMPLETED_INDEXES:
+        if concurrently:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}";')
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("orders", "0034_backfill_completed_p2p_trades_count"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="p2pservicetransaction", index=index)
+                for index in COMPLETED_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_completed_indexes, reverse_code=drop_completed_indexes),
+            ],
+        ),
+    ]
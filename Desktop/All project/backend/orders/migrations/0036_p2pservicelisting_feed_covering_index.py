@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+# (service_type, status) is a prefix of the feed index; orders_p2ps_seller_status_idx
+# duplicates the (seller, status) index declared in Meta. Earlier migrations left
+# these in varying states across environments, so they are dropped with IF EXISTS.
+REDUNDANT_INDEXES = [
+    "orders_p2ps_service_type_status_idx",
+    "p2p_service_service_a27a12_idx",
+    "orders_p2ps_seller_status_idx",
+]
+
+FEED_INDEX = models.Index(
+    fields=["service_type", "status", "listing_type"],
+    include=["rate_cedis_per_usd", "max_rate_cedis_per_usd", "seller", "available_amount_usd"],
+    name="p2p_listing_feed_cov",
+)
+
+
+def create_feed_index(apps, schema_editor):
+    model = apps.get_model('orders', 'P2PServiceListing')
+    for name in REDUNDANT_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}";')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            str(FEED_INDEX.create_sql(model, schema_editor)).replace(
+                'CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1
+            )
+        )
+    else:
+        schema_editor.add_index(model, FEED_INDEX)
+
+
+def drop_feed_index(apps, schema_editor):
+    # The redundant indexes are not recreated; they only duplicated others
+    model = apps.get_model('orders', 'P2PServiceListing')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{FEED_INDEX.name}";')
+    else:
+        schema_editor.remove_index(model, FEED_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("orders", "0035_p2pservicetransaction_completed_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name="p2pservicelisting", name=name)
+                for name in REDUNDANT_INDEXES
+            ] + [
+                migrations.AddIndex(model_name="p2pservicelisting", index=FEED_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_feed_index, reverse_code=drop_feed_index),
+            ],
+        ),
+    ]
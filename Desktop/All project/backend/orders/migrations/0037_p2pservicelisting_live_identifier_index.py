@@ -0,0 +1,66 @@
+from django.db import migrations, models
+
+# The field-level db_index and the plain Meta index both covered service_identifier_hash
+# alone, over every listing. The duplicate check only looks at a seller's live listings,
+# so a single partial index replaces them. The Meta index was already dropped by 0012
+# in some environments, hence IF EXISTS.
+REDUNDANT_INDEX = "orders_p2ps_service_identifier_hash_idx"
+
+IDENTIFIER_INDEX = models.Index(
+    fields=["service_identifier_hash", "service_type", "seller"],
+    condition=models.Q(status__in=["active", "under_review"]) & ~models.Q(service_identifier_hash=""),
+    name="p2p_listing_live_ident_idx",
+)
+
+
+def create_identifier_index(apps, schema_editor):
+    model = apps.get_model('orders', 'P2PServiceListing')
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{REDUNDANT_INDEX}";')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            str(IDENTIFIER_INDEX.create_sql(model, schema_editor)).replace(
+                'CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1
+            )
+        )
+    else:
+        schema_editor.add_index(model, IDENTIFIER_INDEX)
+
+
+def drop_identifier_index(apps, schema_editor):
+    # The redundant index is not recreated; the reversed AlterField restores db_index
+    model = apps.get_model('orders', 'P2PServiceListing')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{IDENTIFIER_INDEX.name}";')
+    else:
+        schema_editor.remove_index(model, IDENTIFIER_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("orders", "0036_p2pservicelisting_feed_covering_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="p2pservicelisting",
+            name="service_identifier_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="SHA256 hash of service identifier (email/tag) for duplicate detection",
+                max_length=64,
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name="p2pservicelisting", name=REDUNDANT_INDEX),
+                migrations.AddIndex(model_name="p2pservicelisting", index=IDENTIFIER_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_identifier_index, reverse_code=drop_identifier_index),
+            ],
+        ),
+    ]
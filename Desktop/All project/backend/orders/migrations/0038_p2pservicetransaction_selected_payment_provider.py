@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_selected_payment_provider(apps, schema_editor):
+    P2PServiceTransaction = apps.get_model('orders', 'P2PServiceTransaction')
+    P2PServiceTransaction.objects.update(
+        selected_payment_provider=Coalesce(
+            Substr(KeyTextTransform('provider', 'payment_method_details'), 1, 50),
+            Value(''),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0037_p2pservicelisting_live_identifier_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="p2pservicetransaction",
+            name="selected_payment_provider",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Provider from payment_method_details, kept as a column for filtering and reporting",
+                max_length=50,
+            ),
+        ),
+        migrations.RunPython(backfill_selected_payment_provider, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.13 on 2026-10-17 14:03
+
+from django.db import migrations, models
+
+
+def backfill_hash_bands(apps, schema_editor):
+    # Same split as orders.image_utils.phash_band_fields: four 16-bit bands, high bits first
+    for model_name, field in (('P2PServiceListing', 'proof_image_hash'), ('SellerApplication', 'proof_of_funds_hash')):
+        model = apps.get_model('orders', model_name)
+        band_fields = [f'{field}_band{i}' for i in range(4)]
+        rows = []
+        for row in model.objects.filter(**{f'{field}__regex': r'^[0-9a-f]{16}$'}).only('pk', field).iterator():
+            value = int(getattr(row, field), 16)
+            for i, band_field in enumerate(band_fields):
+                setattr(row, band_field, (value >> (16 * (3 - i))) & 0xFFFF)
+            rows.append(row)
+        model.objects.bulk_update(rows, band_fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0038_p2pservicetransaction_selected_payment_provider'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='p2pservicelisting',
+            name='proof_image_hash_band0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='p2pservicelisting',
+            name='proof_image_hash_band1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='p2pservicelisting',
+            name='proof_image_hash_band2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='p2pservicelisting',
+            name='proof_image_hash_band3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sellerapplication',
+            name='proof_of_funds_hash_band0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sellerapplication',
+            name='proof_of_funds_hash_band1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sellerapplication',
+            name='proof_of_funds_hash_band2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sellerapplication',
+            name='proof_of_funds_hash_band3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_hash_bands, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0039_proof_hash_bands'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='p2pservicelisting',
+            name='proof_image_processed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text="When process_proof_image last ran on the current proof image (set even if it couldn't be hashed)", null=True),
+        ),
+    ]
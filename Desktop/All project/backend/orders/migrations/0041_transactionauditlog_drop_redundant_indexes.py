@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-17 15:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0040_p2pservicelisting_proof_image_processed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transactionauditlog',
+            name='idx_audit_action_partial',
+        ),
+        migrations.AlterField(
+            model_name='transactionauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,3 +1,69 @@
+"""
+Transaction audit log model
+Canonical definition; re-exported from orders.models
+"""
+from django.db import models, transaction as db_transaction
+from django.conf import settings
+from django.utils import timezone
+import hmac
+import socket
+
+
+class TxnType(models.IntegerChoices):
+    """Audit transaction types, stored as 2-byte integers. Callers use the lowercase member name as the key"""
+    GIFT_CARD = 1, 'Gift Card Transaction'
+    P2P_SERVICE = 2, 'P2P Service Transaction'
+    CRYPTO_BUY = 3, 'Crypto Buy'
+    CRYPTO_SELL = 4, 'Crypto Sell'
+    ESCROW = 5, 'Escrow Operation'
+
+
+class AuditAction(models.IntegerChoices):
+    """Audit actions, stored as 2-byte integers. Callers use the lowercase member name as the key"""
+    CREATED = 1, 'Transaction Created'
+    PAYMENT_VERIFIED = 2, 'Payment Verified'
+    PAYMENT_LOCKED = 3, 'Payment Locked in Escrow'
+    CARD_PROVIDED = 4, 'Gift Card Provided'
+    BUYER_VERIFIED = 5, 'Buyer Verified Item'
+    FUNDS_RELEASED = 6, 'Funds Released to Seller'
+    AUTO_CANCELLED = 7, 'Auto-Cancelled by System'
+    AUTO_RELEASED = 8, 'Auto-Released by System'
+    DISPUTE_OPENED = 9, 'Dispute Opened'
+    DISPUTE_RESOLVED = 10, 'Dispute Resolved'
+    CANCELLED = 11, 'Transaction Cancelled'
+    REFUND_ISSUED = 12, 'Refund Issued'
+    APPROVED_BY_ADMIN = 13, 'Approved by Admin'
+    REJECTED_BY_ADMIN = 14, 'Rejected by Admin'
+
+
+def _coerce_choice(enum_cls, value):
+    """Map a string key ('gift_card') or integer to its enum member; ValueError if unknown"""
+    if isinstance(value, str):
+        member = enum_cls.__members__.get(value.upper())
+        if member is None:
+            raise ValueError(f"Invalid audit {enum_cls.__name__} key: {value}")
+        return member
+    return enum_cls(value)
+
+
+# Advisory lock key space for audit chains: pg_advisory_xact_lock(_CHAIN_LOCK_CLASS + transaction_type, transaction_id)
+_CHAIN_LOCK_CLASS = 0x41554400
+
+
+def _lock_chains(keys):
+    """
+    Serialize writers per (transaction_type, transaction_id) chain until the enclosing transaction ends
+    A row lock on the chain head can't do this: a new chain has no row to lock, and under READ COMMITTED
+    a writer that waited on the head re-checks that same row instead of the newer head. Locks are taken
+    in sorted order so batches can't deadlock. SQLite only allows one writer at a time, so it needs none.
+    """
+    connection = db_transaction.get_connection()
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for transaction_type, transaction_id in sorted(keys):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [_CHAIN_LOCK_CLASS + transaction_type, transaction_id])
+
 
 # ✅ FIX #6: Audit logging model for transaction tracking
 class TransactionAuditLog(models.Model):
@@ -5,35 +71,15 @@ class TransactionAuditLog(models.Model):
     Comprehensive audit log for all transaction actions
     Tracks who did what, when, and why for complete transaction history and dispute resolution
     """
-    TRANSACTION_TYPE_CHOICES = [
-        ('gift_card', 'Gift Card Transaction'),
-        ('p2p_service', 'P2P Service Transaction'),
-        ('crypto_buy', 'Crypto Buy'),
-        ('crypto_sell', 'Crypto Sell'),
-        ('escrow', 'Escrow Operation'),
-    ]
-    
-    ACTION_CHOICES = [
-        ('created', 'Transaction Created'),
-        ('payment_verified', 'Payment Verified'),
-        ('payment_locked', 'Payment Locked in Escrow'),
-        ('card_provided', 'Gift Card Provided'),
-        ('buyer_verified', 'Buyer Verified Item'),
-        ('funds_released', 'Funds Released to Seller'),
-        ('auto_cancelled', 'Auto-Cancelled by System'),
-        ('auto_released', 'Auto-Released by System'),
-        ('dispute_opened', 'Dispute Opened'),
-        ('dispute_resolved', 'Dispute Resolved'),
-        ('cancelled', 'Transaction Cancelled'),
-        ('refund_issued', 'Refund Issued'),
-        ('approved_by_admin', 'Approved by Admin'),
-        ('rejected_by_admin', 'Rejected by Admin'),
-    ]
+    TRANSACTION_TYPE_CHOICES = TxnType.choices
+    ACTION_CHOICES = AuditAction.choices
+    # Keys are validated by _coerce_choice (O(1) enum lookup); full_clean() is
+    # intentionally never called on this high-write table, save() is the only write path
 
     # Core fields
-    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
+    transaction_type = models.PositiveSmallIntegerField(choices=TRANSACTION_TYPE_CHOICES)
     transaction_id = models.PositiveIntegerField()  # Not a ForeignKey to allow flexibility
-    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
+    action = models.PositiveSmallIntegerField(choices=ACTION_CHOICES)
     
     # User information
     performed_by = models.ForeignKey(
@@ -44,7 +90,17 @@ class TransactionAuditLog(models.Model):
         related_name='transaction_audit_logs',
         help_text="User who performed action (null for system actions)"
     )
-    ip_address = models.GenericIPAddressField(null=True, blank=True, help_text="IP address of requester")
+    performed_by_email = models.CharField(
+        max_length=254,
+        blank=True,
+        help_text="Email of performed_by at the time of the action (snapshot, not updated)"
+    )
+    ip_address = models.BinaryField(
+        max_length=16,
+        null=True,
+        blank=True,
+        help_text="Packed IP address of requester (4 bytes IPv4, 16 bytes IPv6); see ip_str"
+    )
     user_agent = models.TextField(blank=True, help_text="User agent of requester")
     
     # State tracking
@@ -56,10 +112,13 @@ class TransactionAuditLog(models.Model):
     metadata = models.JSONField(default=dict, blank=True, help_text="Additional context (amounts, reasons, etc)")
     
     # Security
-    signature = models.CharField(max_length=256, blank=True, help_text="HMAC signature for log integrity")
+    signature = models.BinaryField(max_length=32, blank=True, help_text="Raw HMAC-SHA256 digest for log integrity")
     
     # Timestamps
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Python default so the value exists before INSERT (and before signing);
+    # on Postgres the column also carries DEFAULT CURRENT_TIMESTAMP for raw inserts
+    # No single-column index: idx_audit_ts_id and the BRIN cover timestamp lookups and sorts
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-timestamp']
@@ -67,28 +126,128 @@ class TransactionAuditLog(models.Model):
         verbose_name_plural = 'Transaction Audit Logs'
         db_table = 'transaction_audit_logs'
         indexes = [
-            models.Index(fields=['transaction_type', 'transaction_id'], name='idx_txn_type_id'),
-            models.Index(fields=['action', 'timestamp'], name='idx_action_timestamp'),
+            # Serves get_history() as an index-only scan on Postgres
+            models.Index(
+                fields=['transaction_type', 'transaction_id', '-timestamp'],
+                include=['action', 'performed_by'],
+                name='idx_txn_type_id_ts',
+            ),
+            # Matches default ordering with a unique tiebreaker for stable pagination
+            models.Index(fields=['-timestamp', '-id'], name='idx_audit_ts_id'),
             models.Index(fields=['performed_by', 'timestamp'], name='idx_user_timestamp'),
         ]
+        # Postgres-only GIN indexes on metadata/new_state, the
+        # metadata->>'reason' expression index (0025) and the BRIN index
+        # on timestamp (0026, autosummarized in 0032) are created in migrations
     
     def __str__(self):
-        user_str = self.performed_by.email if self.performed_by else 'SYSTEM'
-        return f"{self.transaction_type}#{self.transaction_id} - {self.action} by {user_str}"
+        user_str = self.performed_by_email or 'SYSTEM'
+        return f"{self.transaction_type_key}#{self.transaction_id} - {self.action_key} by {user_str}"
+    
+    @property
+    def transaction_type_key(self):
+        return TxnType(self.transaction_type).name.lower()
+    
+    @property
+    def action_key(self):
+        return AuditAction(self.action).name.lower()
+    
+    def _compute_signature(self, prev_signature):
+        """HMAC over the previous entry's digest followed by this entry's key fields"""
+        signature_data = f"{self.transaction_type_key}{self.transaction_id}{self.action_key}{self.timestamp}".encode()
+        # hmac.digest() is OpenSSL's one-shot HMAC: no HMAC object is built per call
+        return hmac.digest(
+            settings.SECRET_KEY.encode(),
+            bytes(prev_signature or b'') + signature_data,
+            'sha256'
+        )
     
     def save(self, *args, **kwargs):
-        """Generate HMAC signature for audit integrity"""
-        import hmac
-        import hashlib
-        if not self.signature:
-            # Create HMAC signature of key fields for integrity checking
-            signature_data = f"{self.transaction_type}{self.transaction_id}{self.action}{self.timestamp}"
-            self.signature = hmac.new(
-                key=settings.SECRET_KEY.encode(),
-                msg=signature_data.encode(),
-                digestmod=hashlib.sha256
-            ).hexdigest()
-        super().save(*args, **kwargs)
+        """
+        Sign the entry as the next link of its transaction's hash chain
+        Chains are per (transaction_type, transaction_id), so writes serialize per
+        transaction but different transactions can be logged in parallel
+        """
+        self.transaction_type = _coerce_choice(TxnType, self.transaction_type)
+        self.action = _coerce_choice(AuditAction, self.action)
+        if isinstance(self.ip_address, str):
+            self.ip_address = self.pack_ip(self.ip_address)
+        if self.signature:
+            return super().save(*args, **kwargs)
+        
+        self.timestamp = self.timestamp or timezone.now()
+        with db_transaction.atomic():
+            # Hold the chain's lock so concurrent writers can't fork it; the head is read after it's granted
+            _lock_chains([(self.transaction_type, self.transaction_id)])
+            prev_signature = TransactionAuditLog.objects.filter(
+                transaction_type=self.transaction_type,
+                transaction_id=self.transaction_id
+            ).order_by('-id').values_list('signature', flat=True).first()
+            self.signature = self._compute_signature(prev_signature)
+            super().save(*args, **kwargs)
+    
+    @staticmethod
+    def bulk_create_audit_logs(logs, batch_size=500):
+        """
+        Sign and insert unsaved audit entries with one multi-row INSERT per batch
+        bulk_create() skips save(), so the chain is built here: each transaction's
+        chain is locked once and its new entries are signed in list order
+        """
+        logs = list(logs)
+        if not logs:
+            return []
+        now = timezone.now()
+        for log in logs:
+            log.transaction_type = _coerce_choice(TxnType, log.transaction_type)
+            log.action = _coerce_choice(AuditAction, log.action)
+            if isinstance(log.ip_address, str):
+                log.ip_address = TransactionAuditLog.pack_ip(log.ip_address)
+            log.timestamp = log.timestamp or now
+        
+        with db_transaction.atomic():
+            _lock_chains({(log.transaction_type, log.transaction_id) for log in logs})
+            head_ids = TransactionAuditLog.objects.filter(
+                transaction_type__in={log.transaction_type for log in logs},
+                transaction_id__in={log.transaction_id for log in logs}
+            ).order_by().values('transaction_type', 'transaction_id').annotate(
+                head_id=models.Max('id')
+            ).values_list('head_id', flat=True)
+            heads = {
+                (transaction_type, transaction_id): signature
+                for transaction_type, transaction_id, signature in TransactionAuditLog.objects.filter(
+                    id__in=list(head_ids)
+                ).values_list('transaction_type', 'transaction_id', 'signature')
+            }
+            for log in logs:
+                key = (log.transaction_type, log.transaction_id)
+                log.signature = log._compute_signature(heads.get(key))
+                heads[key] = log.signature
+            return TransactionAuditLog.objects.bulk_create(logs, batch_size=batch_size)
+    
+    @staticmethod
+    def pack_ip(ip):
+        """Pack a textual IPv4/IPv6 address into bytes; None for empty or invalid input"""
+        if not ip:
+            return None
+        for family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                return socket.inet_pton(family, ip)
+            except OSError:
+                continue
+        return None
+    
+    @property
+    def ip_str(self):
+        """Textual form of the stored IP address"""
+        if not self.ip_address:
+            return None
+        packed = bytes(self.ip_address)
+        return socket.inet_ntop(socket.AF_INET if len(packed) == 4 else socket.AF_INET6, packed)
+    
+    @property
+    def signature_hex(self):
+        """Hex form of the stored digest for admin/serializer display"""
+        return bytes(self.signature).hex() if self.signature else ''
     
     @staticmethod
     def create_audit_log(transaction_type, transaction_id, action, performed_by=None, 
@@ -98,14 +257,69 @@ class TransactionAuditLog(models.Model):
         Helper function to create audit logs with proper error handling
         """
         return TransactionAuditLog.objects.create(
-            transaction_type=transaction_type,
+            transaction_type=_coerce_choice(TxnType, transaction_type),
             transaction_id=transaction_id,
-            action=action,
+            action=_coerce_choice(AuditAction, action),
             performed_by=performed_by,
+            performed_by_email=performed_by.email if performed_by else "",
             previous_state=previous_state or {},
             new_state=new_state or {},
             notes=notes,
             metadata=metadata or {},
-            ip_address=ip_address,
-            user_agent=user_agent
+            ip_address=TransactionAuditLog.pack_ip(ip_address),
+            user_agent=user_agent or ""
         )
+    
+    @staticmethod
+    def queue_audit_log(transaction_type, transaction_id, action, performed_by=None,
+                        previous_state=None, new_state=None, notes="", metadata=None,
+                        ip_address=None, user_agent=None):
+        """
+        Same as create_audit_log, but the write (HMAC signing + INSERT) runs in a
+        Celery worker once the surrounding DB transaction commits
+        """
+        from .tasks import write_transaction_audit_log
+        payload = {
+            # Validated here so bad keys fail in the request, not in the worker
+            'transaction_type': int(_coerce_choice(TxnType, transaction_type)),
+            'transaction_id': transaction_id,
+            'action': int(_coerce_choice(AuditAction, action)),
+            'performed_by_id': performed_by.pk if performed_by else None,
+            'performed_by_email': performed_by.email if performed_by else "",
+            'previous_state': previous_state or {},
+            'new_state': new_state or {},
+            'notes': notes,
+            'metadata': metadata or {},
+            'ip_address': ip_address,
+            'user_agent': user_agent or "",
+            # Record when the action happened, not when the worker got to it
+            'timestamp': timezone.now().isoformat(),
+        }
+        db_transaction.on_commit(lambda: write_transaction_audit_log.delay(payload))
+    
+    @staticmethod
+    def verify_chain(transaction_type, transaction_id):
+        """
+        Recompute a transaction's hash chain in insertion order
+        Returns False if any entry was altered, removed or reordered
+        """
+        prev_signature = None
+        logs = TransactionAuditLog.objects.filter(
+            transaction_type=_coerce_choice(TxnType, transaction_type),
+            transaction_id=transaction_id
+        ).order_by('id').only('transaction_type', 'transaction_id', 'action', 'timestamp', 'signature')
+        for log in logs:
+            if bytes(log.signature) != log._compute_signature(prev_signature):
+                return False
+            prev_signature = log.signature
+        return True
+    
+    @staticmethod
+    def get_history(transaction_type, transaction_id):
+        """
+        Audit trail for a single transaction, newest first
+        """
+        return TransactionAuditLog.objects.filter(
+            transaction_type=_coerce_choice(TxnType, transaction_type),
+            transaction_id=transaction_id
+        ).order_by('-timestamp')
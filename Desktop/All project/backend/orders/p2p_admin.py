@@ -2,8 +2,12 @@
 Admin interfaces for P2P Service models
 """
 from django.contrib import admin
+from django.db import transaction as db_transaction
+from django.http import StreamingHttpResponse
 from django.utils.html import format_html
 from django.utils import timezone
+from itertools import chain
+import csv
 from .p2p_models import (
     P2PServiceListing,
     P2PServiceTransaction,
@@ -13,12 +17,45 @@ from .p2p_models import (
     P2PServiceDisputeLog,
     SellerApplication,
 )
-from notifications.utils import create_notification
+from notifications.utils import create_notification, create_notifications_bulk
 
 # Note: These models are registered with the custom admin site in config/admin.py
 # Using @admin.register() would register with default admin, so we don't use it here
 
 
+# Choice label lookup for bulk actions (get_FOO_display scans the choices per call)
+_SERVICE_TYPE_DISPLAY = dict(P2PServiceListing.SERVICE_TYPE_CHOICES)
+
+_LISTING_APPROVED_MESSAGE = 'Your {service} listing {reference} has been approved.'
+_LISTING_REJECTED_MESSAGE = 'Your {service} listing {reference} has been rejected.'
+
+
+def _is_changelist(request):
+    """True for the admin list page (and its actions), where column projections are safe"""
+    match = getattr(request, 'resolver_match', None)
+    return bool(match and match.url_name and match.url_name.endswith('_changelist'))
+
+
+class _Echo:
+    """File-like sink for csv.writer: write() returns the formatted line instead of buffering it"""
+    def write(self, value):
+        return value
+
+
+def _stream_csv(filename, header, rows):
+    """
+    Stream rows as a CSV download; each line is written to the socket as it is produced,
+    so memory stays bounded by the queryset iterator's chunk size, not the table size
+    """
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in chain([header], rows)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 class P2PServiceListingAdmin(admin.ModelAdmin):
     list_display = ('reference', 'service_type', 'seller', 'service_identifier_display', 'available_amount_usd', 'rate_cedis_per_usd', 'status', 'views_count', 'created_at')
     list_filter = ('status', 'service_type', 'is_negotiable', 'created_at')
@@ -53,62 +90,92 @@ class P2PServiceListingAdmin(admin.ModelAdmin):
         return obj.get_service_identifier()
     service_identifier_display.short_description = 'Service Identifier'
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('seller')
+        if _is_changelist(request):
+            # Only the list_display columns; skips proof_image, notes and the JSON fields
+            queryset = queryset.only(
+                'reference', 'service_type', 'seller', 'seller__email',
+                'paypal_email', 'cashapp_tag', 'zelle_email', 'service_identifier_hash',
+                'available_amount_usd', 'rate_cedis_per_usd', 'status', 'views_count', 'created_at',
+            )
+        return queryset
+    
     actions = ['approve_listings', 'reject_listings']
     
-    def approve_listings(self, request, queryset):
-        """Approve selected listings"""
-        count = 0
-        for listing in queryset.filter(status='under_review'):
-            listing.status = 'active'
-            listing.reviewed_by = request.user
-            listing.reviewed_at = timezone.now()
-            listing.save()
+    def _review_listings(self, request, queryset, new_status, notification_type, title, message_template):
+        """
+        Move under-review listings to new_status with a single UPDATE and notify sellers in one INSERT.
+        Bypasses P2PServiceListing.save(), which would re-hash identifiers and proof images per row.
+        """
+        now = timezone.now()
+        with db_transaction.atomic():
+            # Lock the rows so another admin or the proof image task can't change them between the read and the UPDATE
+            pending = list(
+                queryset.select_related(None).select_for_update().filter(status='under_review').only(
+                    'id', 'seller_id', 'reference', 'service_type'
+                )
+            )
+            if not pending:
+                return 0
             
-            create_notification(
-                user=listing.seller,
-                notification_type='P2P_SERVICE_LISTING_APPROVED',
-                title='P2P Service Listing Approved',
-                message=f'Your {listing.get_service_type_display()} listing {listing.reference} has been approved.',
-                related_object_type='p2p_service_listing',
-                related_object_id=listing.id,
+            updated = P2PServiceListing.objects.filter(
+                id__in=[listing.id for listing in pending], status='under_review'
+            ).update(
+                status=new_status,
+                reviewed_by=request.user,
+                reviewed_at=now,
+                updated_at=now,
             )
-            count += 1
+            
+            create_notifications_bulk(
+                (
+                    listing.seller_id,
+                    notification_type,
+                    title,
+                    message_template.format(
+                        service=_SERVICE_TYPE_DISPLAY.get(listing.service_type, listing.service_type),
+                        reference=listing.reference,
+                    ),
+                    'p2p_service_listing',
+                    listing.id,
+                )
+                for listing in pending
+            )
+        return updated
+    
+    def approve_listings(self, request, queryset):
+        """Approve selected listings"""
+        count = self._review_listings(
+            request, queryset, 'active',
+            'P2P_SERVICE_LISTING_APPROVED', 'P2P Service Listing Approved',
+            _LISTING_APPROVED_MESSAGE,
+        )
         self.message_user(request, f'{count} listing(s) approved.')
     approve_listings.short_description = 'Approve selected listings'
     
     def reject_listings(self, request, queryset):
         """Reject selected listings"""
-        count = 0
-        for listing in queryset.filter(status='under_review'):
-            listing.status = 'cancelled'
-            listing.reviewed_by = request.user
-            listing.reviewed_at = timezone.now()
-            listing.save()
-            
-            create_notification(
-                user=listing.seller,
-                notification_type='P2P_SERVICE_LISTING_REJECTED',
-                title='P2P Service Listing Rejected',
-                message=f'Your {listing.get_service_type_display()} listing {listing.reference} has been rejected.',
-                related_object_type='p2p_service_listing',
-                related_object_id=listing.id,
-            )
-            count += 1
+        count = self._review_listings(
+            request, queryset, 'cancelled',
+            'P2P_SERVICE_LISTING_REJECTED', 'P2P Service Listing Rejected',
+            _LISTING_REJECTED_MESSAGE,
+        )
         self.message_user(request, f'{count} listing(s) rejected.')
     reject_listings.short_description = 'Reject selected listings'
 
 
 class P2PServiceTransactionAdmin(admin.ModelAdmin):
     list_display = ('reference', 'listing', 'buyer', 'seller', 'amount_usd', 'agreed_price_cedis', 'status', 'risk_score', 'created_at')
-    list_filter = ('status', 'has_dispute', 'listing__service_type', 'created_at')
+    list_filter = ('status', 'has_dispute', 'listing__service_type', 'selected_payment_provider', 'created_at')
     search_fields = ('reference', 'buyer__email', 'seller__email', 'listing__reference')
-    readonly_fields = ('reference', 'created_at', 'updated_at', 'completed_at', 'cancelled_at', 'risk_score', 'risk_factors', 'device_fingerprint')
+    readonly_fields = ('reference', 'created_at', 'updated_at', 'completed_at', 'cancelled_at', 'risk_score', 'risk_factors', 'device_fingerprint', 'selected_payment_provider')
     fieldsets = (
         ('Transaction Information', {
             'fields': ('reference', 'listing', 'buyer', 'seller', 'status')
         }),
         ('Financial Details', {
-            'fields': ('amount_usd', 'agreed_price_cedis', 'escrow_amount_cedis', 'selected_payment_method', 'payment_method_details')
+            'fields': ('amount_usd', 'agreed_price_cedis', 'escrow_amount_cedis', 'selected_payment_method', 'selected_payment_provider', 'payment_method_details')
         }),
         ('Service Delivery', {
             'fields': ('service_identifier', 'service_proof_image', 'service_provided_at')
@@ -134,7 +201,16 @@ class P2PServiceTransactionAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('buyer', 'seller', 'listing')
+        queryset = super().get_queryset(request).with_related().select_related('listing__seller')
+        if _is_changelist(request):
+            # Wide text/JSON columns the list page never renders
+            queryset = queryset.defer(
+                'payment_method_details', 'risk_factors', 'admin_notes', 'dispute_reason',
+                'dispute_resolution', 'buyer_verification_notes',
+                'listing__accepted_payment_methods', 'listing__required_payment_providers',
+                'listing__terms_notes', 'listing__proof_notes', 'listing__admin_notes',
+            )
+        return queryset
 
 
 class P2PServiceDisputeAdmin(admin.ModelAdmin):
@@ -190,11 +266,29 @@ class P2PServiceTransactionLogAdmin(admin.ModelAdmin):
     list_filter = ('action', 'timestamp')
     search_fields = ('transaction__reference', 'performed_by__email', 'notes')
     readonly_fields = ('transaction', 'action', 'performed_by', 'notes', 'timestamp')
+    actions = ['export_as_csv']
     
     def transaction_reference(self, obj):
         return obj.transaction.reference
     transaction_reference.short_description = 'Transaction Reference'
     
+    def export_as_csv(self, request, queryset):
+        """Export selected log entries as a streamed CSV"""
+        fields = ('id', 'transaction__reference', 'action', 'performed_by__email', 'notes', 'timestamp')
+        rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=2000)
+        return _stream_csv('p2p_transaction_logs.csv', fields, rows)
+    export_as_csv.short_description = 'Export selected logs as CSV'
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('transaction', 'performed_by')
+        if _is_changelist(request):
+            # Read-only list: one joined query carrying just the rendered columns
+            queryset = queryset.only(
+                'action', 'timestamp', 'transaction', 'transaction__reference',
+                'performed_by', 'performed_by__email',
+            )
+        return queryset
+    
     def has_add_permission(self, request):
         return False
     
@@ -210,10 +304,26 @@ class P2PServiceDisputeLogAdmin(admin.ModelAdmin):
     list_filter = ('action', 'timestamp')
     search_fields = ('dispute__transaction__reference', 'performed_by__email', 'notes')
     readonly_fields = ('dispute', 'action', 'performed_by', 'notes', 'timestamp')
+    actions = ['export_as_csv']
     
     def dispute_id(self, obj):
-        return obj.dispute.id
+        return obj.dispute_id
     dispute_id.short_description = 'Dispute ID'
+    dispute_id.admin_order_field = 'dispute_id'
+    
+    def export_as_csv(self, request, queryset):
+        """Export selected log entries as a streamed CSV"""
+        fields = ('id', 'dispute_id', 'dispute__transaction__reference', 'action', 'performed_by__email', 'notes', 'timestamp')
+        rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=2000)
+        return _stream_csv('p2p_dispute_logs.csv', fields, rows)
+    export_as_csv.short_description = 'Export selected logs as CSV'
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('performed_by')
+        if _is_changelist(request):
+            # Read-only list: one joined query carrying just the rendered columns
+            queryset = queryset.only('dispute', 'action', 'timestamp', 'performed_by', 'performed_by__email')
+        return queryset
     
     def has_add_permission(self, request):
         return False
@@ -14,9 +14,17 @@ Key Changes:
 
 from django.utils import timezone
 from django.db import transaction as db_transaction
+from django.db.models import Case, CharField, F, Q, Value, When
 from datetime import timedelta
-from decimal import Decimal
+from functools import partial, reduce
 import logging
+import operator
+import secrets
+
+from notifications.utils import create_notifications_bulk
+from orders.p2p_models import P2PServiceListing, P2PServiceTransaction
+from orders.p2p_views import log_p2p_transaction_action
+from wallets.models import Wallet, WalletTransaction
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +35,15 @@ SELLER_RESPONSE_DEADLINE_MINUTES = 15
 BUYER_VERIFICATION_DEADLINE_MINUTES = 15
 AUTO_RELEASE_DELAY_MINUTES = 15
 MAX_ACTIVE_TRANSACTIONS = 5
+AUTO_ACTION_BATCH_SIZE = 500  # Transactions claimed per run across all deadline checks, oldest first
+AUTO_ACTION_CHUNK_SIZE = 50  # Transactions handled per database transaction, bounding how long row locks are held
+
+# Columns the auto-action steps read or write (plus what the save signals touch);
+# buyer/seller are still loaded in full for the completion signal's trade counters
+_AUTO_ACTION_FIELDS = (
+    'reference', 'status', 'amount_usd', 'escrow_amount_cedis', 'escrow_released', 'escrow_released_at',
+    'buyer_verified', 'completed_at', 'cancelled_at', 'updated_at', 'buyer', 'seller', 'listing__listing_type',
+)
 
 
 def create_p2p_transaction_with_deadlines(listing, buyer, amount_usd, agreed_price_cedis, 
@@ -41,9 +58,6 @@ def create_p2p_transaction_with_deadlines(listing, buyer, amount_usd, agreed_pri
     
     Returns: P2PServiceTransaction instance
     """
-    from orders.p2p_models import P2PServiceTransaction
-    from wallets.models import Wallet
-    
     now = timezone.now()
     
     # Set deadlines based on listing type
@@ -82,8 +96,6 @@ def update_seller_confirmation_deadline(transaction):
     Set seller confirmation deadline after buyer marks payment as complete.
     Called from mark_payment_complete action.
     """
-    from orders.p2p_models import P2PServiceTransaction
-    
     if transaction.listing.listing_type == 'sell':
         transaction.seller_confirmation_deadline = timezone.now() + timedelta(
             minutes=SELLER_CONFIRMATION_DEADLINE_MINUTES
@@ -96,8 +108,6 @@ def update_seller_response_deadline_after_confirmation(transaction):
     Set seller response deadline after seller confirms payment.
     Called from confirm_payment action.
     """
-    from orders.p2p_models import P2PServiceTransaction
-    
     if transaction.listing.listing_type == 'sell':
         transaction.seller_response_deadline = timezone.now() + timedelta(
             minutes=SELLER_RESPONSE_DEADLINE_MINUTES
@@ -105,7 +115,7 @@ def update_seller_response_deadline_after_confirmation(transaction):
         transaction.save(update_fields=['seller_response_deadline'])
 
 
-def release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet):
+def release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet, wallet_txns=None):
     """
     Release escrow for BUY listings - refund to buyer (they're buying service, not selling).
     
@@ -118,72 +128,193 @@ def release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet):
     - Buyer's funds are locked in escrow
     - After seller provides service and buyer verifies, escrow is released to seller
     - Seller receives payment for providing service
-    """
-    from wallets.models import WalletTransaction
-    import uuid
     
+    If wallet_txns is a list, the WalletTransaction rows are appended to it unsaved
+    so the caller can insert them in bulk; otherwise they are created immediately.
+    """
+    ref = transaction.reference
+    amount = transaction.escrow_amount_cedis
     escrow_before = buyer_wallet.escrow_balance
+    new_txns = []
     
     if transaction.listing.listing_type == 'buy':
         # BUY listing: Refund escrow to buyer
-        buyer_wallet.release_cedis_from_escrow(transaction.escrow_amount_cedis)
-        buyer_wallet.refresh_from_db()
+        buyer_wallet.release_cedis_from_escrow(amount)
         
         # Create wallet transaction for refund
-        buyer_txn_ref = f"{transaction.reference}-REFUND-{uuid.uuid4().hex[:8]}"
-        WalletTransaction.objects.create(
+        buyer_txn_ref = f"{ref}-REFUND-{secrets.token_hex(4)}"
+        new_txns.append(WalletTransaction(
             wallet=buyer_wallet,
             transaction_type='escrow_release',
-            amount=transaction.escrow_amount_cedis,
+            amount=amount,
             currency='cedis',
             status='completed',
             reference=buyer_txn_ref,
-            description=f"Escrow refunded for BUY listing transaction. Service verified. Ref: {transaction.reference}",
+            description=f"Escrow refunded for BUY listing transaction. Service verified. Ref: {ref}",
             balance_before=escrow_before,
             balance_after=buyer_wallet.escrow_balance
-        )
+        ))
         
-        logger.info(f"Escrow refunded to buyer for BUY listing transaction {transaction.reference}")
+        logger.info("Escrow refunded to buyer for BUY listing transaction %s", ref)
         
     else:
         # SELL listing: Release escrow to seller
         seller_balance_before = seller_wallet.balance_cedis
         
-        buyer_wallet.deduct_from_escrow(transaction.escrow_amount_cedis)
-        buyer_wallet.refresh_from_db()
+        buyer_wallet.deduct_from_escrow(amount)
         
-        seller_wallet.add_cedis(transaction.escrow_amount_cedis)
-        seller_wallet.refresh_from_db()
+        seller_wallet.add_cedis(amount)
         
         # Create wallet transactions
-        buyer_txn_ref = f"{transaction.reference}-RELEASE-{uuid.uuid4().hex[:8]}"
-        seller_txn_ref = f"{transaction.reference}-CREDIT-{uuid.uuid4().hex[:8]}"
+        buyer_txn_ref = f"{ref}-RELEASE-{secrets.token_hex(4)}"
+        seller_txn_ref = f"{ref}-CREDIT-{secrets.token_hex(4)}"
         
-        WalletTransaction.objects.create(
+        new_txns.append(WalletTransaction(
             wallet=buyer_wallet,
             transaction_type='escrow_release',
-            amount=transaction.escrow_amount_cedis,
+            amount=amount,
             currency='cedis',
             status='completed',
             reference=buyer_txn_ref,
-            description=f"Escrow released to seller for SELL listing transaction. Ref: {transaction.reference}",
+            description=f"Escrow released to seller for SELL listing transaction. Ref: {ref}",
             balance_before=escrow_before,
             balance_after=buyer_wallet.escrow_balance
-        )
+        ))
         
-        WalletTransaction.objects.create(
+        new_txns.append(WalletTransaction(
             wallet=seller_wallet,
             transaction_type='credit',
-            amount=transaction.escrow_amount_cedis,
+            amount=amount,
             currency='cedis',
             status='completed',
             reference=seller_txn_ref,
-            description=f"Payment received for SELL listing transaction. Ref: {transaction.reference}",
+            description=f"Payment received for SELL listing transaction. Ref: {ref}",
             balance_before=seller_balance_before,
             balance_after=seller_wallet.balance_cedis
-        )
+        ))
         
-        logger.info(f"Escrow released to seller for SELL listing transaction {transaction.reference}")
+        logger.info("Escrow released to seller for SELL listing transaction %s", ref)
+    
+    if wallet_txns is None:
+        WalletTransaction.objects.bulk_create(new_txns)
+    else:
+        wallet_txns.extend(new_txns)
+
+
+def _wallets_by_user(user_ids):
+    """
+    Wallets for user_ids keyed by user_id, fetched in one query and row-locked
+    until the surrounding transaction ends (must be called inside atomic()).
+    Missing wallets are created with a single INSERT instead of per-row get_or_create.
+    """
+    def locked(ids):
+        # Lock in primary key order so concurrent callers can't deadlock on each other
+        return Wallet.objects.select_for_update().filter(user_id__in=ids).order_by('pk')
+    
+    wallets = {wallet.user_id: wallet for wallet in locked(user_ids)}
+    missing = set(user_ids) - wallets.keys()
+    if missing:
+        Wallet.objects.bulk_create([Wallet(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+        wallets.update((wallet.user_id, wallet) for wallet in locked(missing))
+    return wallets
+
+
+def _restore_listing(listing_id, amount):
+    """Give a cancelled amount back to its listing, reopening it if it had sold out, in one UPDATE"""
+    P2PServiceListing.objects.filter(id=listing_id).update(
+        available_amount_usd=F('available_amount_usd') + amount,
+        status=Case(When(status='sold', then=Value('active')), default=F('status')),
+    )
+
+
+def _auto_action_branches(now):
+    """
+    (branch, condition) pairs for process_auto_actions_enhanced, in priority order.
+    A row matching several conditions is handled by the first one only.
+    """
+    return [
+        # 1. Auto-cancel: Buyer didn't mark payment within deadline (SELL listings only)
+        ('payment_timeout', Q(
+            status='payment_received',
+            payment_deadline__lte=now,
+            payment_deadline__isnull=False,
+            escrow_released=False,
+            listing__listing_type='sell'
+        )),
+        # 2. Auto-cancel: Seller didn't confirm payment within deadline (SELL listings only)
+        ('seller_confirmation_timeout', Q(
+            status='buyer_marked_paid',
+            seller_confirmation_deadline__lte=now,
+            seller_confirmation_deadline__isnull=False,
+            seller_confirmed_payment=False,
+            escrow_released=False,
+            listing__listing_type='sell'
+        )),
+        # 3. Auto-cancel: Seller didn't provide service within deadline
+        ('seller_response_timeout', Q(
+            status__in=['payment_received', 'seller_confirmed_payment'],
+            seller_response_deadline__lte=now,
+            seller_response_deadline__isnull=False,
+            escrow_released=False
+        )),
+        # 4. Auto-complete: Buyer didn't verify within deadline (assume satisfied)
+        ('buyer_verification_timeout', Q(
+            status='service_provided',
+            buyer_verification_deadline__lte=now,
+            buyer_verification_deadline__isnull=False,
+            buyer_verified=False,
+            escrow_released=False
+        )),
+        # 5. Auto-release: After buyer verification (15 minutes delay)
+        ('auto_released', Q(
+            status='verifying',
+            auto_release_at__lte=now,
+            auto_release_at__isnull=False,
+            buyer_verified=True,
+            escrow_released=False
+        )),
+        # 6. Safety net: Completed transactions with unreleased escrow
+        ('safety_net_releases', Q(
+            status='completed',
+            escrow_released=False,
+            escrow_amount_cedis__gt=0
+        )),
+    ]
+
+
+# Auto-cancel branches: (wallet reference suffix, ledger reason, buyer notice reason, seller notice reason)
+_CANCEL_BRANCHES = {
+    'payment_timeout': (
+        'PAYMENT-TIMEOUT',
+        "Buyer didn't mark payment in time",
+        f"payment was not marked within {PAYMENT_DEADLINE_MINUTES} minutes",
+        None,
+    ),
+    'seller_confirmation_timeout': (
+        'SELLER-CONFIRM-TIMEOUT',
+        "Seller didn't confirm payment in time",
+        f"seller didn't confirm payment within {SELLER_CONFIRMATION_DEADLINE_MINUTES} minutes",
+        f"you didn't confirm payment within {SELLER_CONFIRMATION_DEADLINE_MINUTES} minutes",
+    ),
+    'seller_response_timeout': (
+        'SELLER-RESPONSE-TIMEOUT',
+        "Seller didn't provide service in time",
+        f"seller didn't provide service within {SELLER_RESPONSE_DEADLINE_MINUTES} minutes",
+        f"you didn't provide service within {SELLER_RESPONSE_DEADLINE_MINUTES} minutes",
+    ),
+}
+
+
+def _record_auto_actions(notifications, action_logs):
+    """Post-commit side effects of process_auto_actions_enhanced."""
+    create_notifications_bulk(notifications)
+    for transaction, notes in action_logs:
+        log_p2p_transaction_action(
+            transaction=transaction,
+            action='auto_released',
+            performed_by=None,
+            notes=notes
+        )
 
 
 def process_auto_actions_enhanced():
@@ -192,13 +323,10 @@ def process_auto_actions_enhanced():
     
     This should be called periodically (every 5-10 minutes) via cron.
     Replaces the existing process_p2p_auto_actions command logic.
-    """
-    from orders.p2p_models import P2PServiceTransaction
-    from wallets.models import Wallet, WalletTransaction
-    from notifications.utils import create_notification
-    from orders.p2p_views import log_p2p_transaction_action
-    import uuid
     
+    Due transactions are claimed a chunk at a time, tagged with the branch that
+    applies to them, and handled in one pass per chunk sharing that chunk's wallets.
+    """
     now = timezone.now()
     processed = {
         'payment_timeout': 0,
@@ -208,343 +336,177 @@ def process_auto_actions_enhanced():
         'auto_released': 0,
         'safety_net_releases': 0
     }
+    branches = _auto_action_branches(now)
     
-    # 1. Auto-cancel: Buyer didn't mark payment within deadline (SELL listings only)
-    payment_timeout_transactions = P2PServiceTransaction.objects.filter(
-        status='payment_received',
-        payment_deadline__lte=now,
-        payment_deadline__isnull=False,
-        escrow_released=False,
-        listing__listing_type='sell'
-    )
-    
-    for transaction in payment_timeout_transactions:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                balance_before = buyer_wallet.balance_cedis
-                
-                buyer_wallet.release_cedis_from_escrow(transaction.escrow_amount_cedis)
-                buyer_wallet.refresh_from_db()
-                
-                WalletTransaction.objects.create(
-                    wallet=buyer_wallet,
-                    transaction_type='escrow_release',
-                    amount=transaction.escrow_amount_cedis,
-                    currency='cedis',
-                    status='completed',
-                    reference=f"{transaction.reference}-PAYMENT-TIMEOUT",
-                    description=f"Auto-cancelled: Buyer didn't mark payment in time. Escrow refunded. Ref: {transaction.reference}",
-                    balance_before=balance_before,
-                    balance_after=buyer_wallet.balance_cedis
-                )
-                
-                # Restore listing available amount
-                listing = transaction.listing
-                if listing.listing_type == 'sell':
-                    from django.db.models import F
-                    listing.refresh_from_db()
-                    listing.available_amount_usd = F('available_amount_usd') + transaction.amount_usd
-                    listing.save(update_fields=['available_amount_usd'])
-                    listing.refresh_from_db()
-                    if listing.status == 'sold':
-                        listing.status = 'active'
-                        listing.save(update_fields=['status'])
-                
-                transaction.status = 'cancelled'
-                transaction.cancelled_at = now
-                transaction.save()
-                
-                create_notification(
-                    user=transaction.buyer,
-                    notification_type='P2P_SERVICE_CANCELLED',
-                    title='Transaction Auto-Cancelled',
-                    message=f'Transaction {transaction.reference} was auto-cancelled because payment was not marked within {PAYMENT_DEADLINE_MINUTES} minutes. Your payment has been refunded.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                processed['payment_timeout'] += 1
-                logger.info(f"Auto-cancelled transaction {transaction.reference} due to payment timeout")
-                
-        except Exception as e:
-            logger.error(f"Error processing payment timeout for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
-    
-    # 2. Auto-cancel: Seller didn't confirm payment within deadline (SELL listings only)
-    seller_confirmation_timeout_transactions = P2PServiceTransaction.objects.filter(
-        status='buyer_marked_paid',
-        seller_confirmation_deadline__lte=now,
-        seller_confirmation_deadline__isnull=False,
-        seller_confirmed_payment=False,
-        escrow_released=False,
-        listing__listing_type='sell'
-    )
-    
-    for transaction in seller_confirmation_timeout_transactions:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                balance_before = buyer_wallet.balance_cedis
-                
-                buyer_wallet.release_cedis_from_escrow(transaction.escrow_amount_cedis)
-                buyer_wallet.refresh_from_db()
-                
-                WalletTransaction.objects.create(
-                    wallet=buyer_wallet,
-                    transaction_type='escrow_release',
-                    amount=transaction.escrow_amount_cedis,
-                    currency='cedis',
-                    status='completed',
-                    reference=f"{transaction.reference}-SELLER-CONFIRM-TIMEOUT",
-                    description=f"Auto-cancelled: Seller didn't confirm payment in time. Escrow refunded. Ref: {transaction.reference}",
-                    balance_before=balance_before,
-                    balance_after=buyer_wallet.balance_cedis
-                )
-                
-                # Restore listing available amount
-                listing = transaction.listing
-                if listing.listing_type == 'sell':
-                    from django.db.models import F
-                    listing.refresh_from_db()
-                    listing.available_amount_usd = F('available_amount_usd') + transaction.amount_usd
-                    listing.save(update_fields=['available_amount_usd'])
-                    listing.refresh_from_db()
-                    if listing.status == 'sold':
-                        listing.status = 'active'
-                        listing.save(update_fields=['status'])
-                
-                transaction.status = 'cancelled'
-                transaction.cancelled_at = now
-                transaction.save()
-                
-                create_notification(
-                    user=transaction.buyer,
-                    notification_type='P2P_SERVICE_CANCELLED',
-                    title='Transaction Auto-Cancelled',
-                    message=f'Transaction {transaction.reference} was auto-cancelled because seller didn\'t confirm payment within {SELLER_CONFIRMATION_DEADLINE_MINUTES} minutes. Your payment has been refunded.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                create_notification(
-                    user=transaction.seller,
-                    notification_type='P2P_SERVICE_CANCELLED',
-                    title='Transaction Auto-Cancelled',
-                    message=f'Transaction {transaction.reference} was auto-cancelled because you didn\'t confirm payment within {SELLER_CONFIRMATION_DEADLINE_MINUTES} minutes.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                processed['seller_confirmation_timeout'] += 1
-                logger.info(f"Auto-cancelled transaction {transaction.reference} due to seller confirmation timeout")
-                
-        except Exception as e:
-            logger.error(f"Error processing seller confirmation timeout for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
-    
-    # 3. Auto-cancel: Seller didn't provide service within deadline
-    seller_response_timeout_transactions = P2PServiceTransaction.objects.filter(
-        status__in=['payment_received', 'seller_confirmed_payment'],
-        seller_response_deadline__lte=now,
-        seller_response_deadline__isnull=False,
-        escrow_released=False
-    )
-    
-    for transaction in seller_response_timeout_transactions:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                balance_before = buyer_wallet.balance_cedis
-                
-                buyer_wallet.release_cedis_from_escrow(transaction.escrow_amount_cedis)
-                buyer_wallet.refresh_from_db()
-                
-                WalletTransaction.objects.create(
-                    wallet=buyer_wallet,
-                    transaction_type='escrow_release',
-                    amount=transaction.escrow_amount_cedis,
-                    currency='cedis',
-                    status='completed',
-                    reference=f"{transaction.reference}-SELLER-RESPONSE-TIMEOUT",
-                    description=f"Auto-cancelled: Seller didn't provide service in time. Escrow refunded. Ref: {transaction.reference}",
-                    balance_before=balance_before,
-                    balance_after=buyer_wallet.balance_cedis
-                )
-                
-                # Restore listing available amount
-                listing = transaction.listing
-                if listing.listing_type == 'sell':
-                    from django.db.models import F
-                    listing.refresh_from_db()
-                    listing.available_amount_usd = F('available_amount_usd') + transaction.amount_usd
-                    listing.save(update_fields=['available_amount_usd'])
-                    listing.refresh_from_db()
-                    if listing.status == 'sold':
-                        listing.status = 'active'
-                        listing.save(update_fields=['status'])
-                
-                transaction.status = 'cancelled'
-                transaction.cancelled_at = now
-                transaction.save()
-                
-                create_notification(
-                    user=transaction.buyer,
-                    notification_type='P2P_SERVICE_CANCELLED',
-                    title='Transaction Auto-Cancelled',
-                    message=f'Transaction {transaction.reference} was auto-cancelled because seller didn\'t provide service within {SELLER_RESPONSE_DEADLINE_MINUTES} minutes. Your payment has been refunded.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                create_notification(
-                    user=transaction.seller,
-                    notification_type='P2P_SERVICE_CANCELLED',
-                    title='Transaction Auto-Cancelled',
-                    message=f'Transaction {transaction.reference} was auto-cancelled because you didn\'t provide service within {SELLER_RESPONSE_DEADLINE_MINUTES} minutes.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                processed['seller_response_timeout'] += 1
-                logger.info(f"Auto-cancelled transaction {transaction.reference} due to seller response timeout")
-                
-        except Exception as e:
-            logger.error(f"Error processing seller response timeout for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
-    
-    # 4. Auto-complete: Buyer didn't verify within deadline (assume satisfied)
-    buyer_verification_timeout_transactions = P2PServiceTransaction.objects.filter(
-        status='service_provided',
-        buyer_verification_deadline__lte=now,
-        buyer_verification_deadline__isnull=False,
-        buyer_verified=False,
-        escrow_released=False
-    )
-    
-    for transaction in buyer_verification_timeout_transactions:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                seller_wallet, _ = Wallet.objects.get_or_create(user=transaction.seller)
-                
-                # Release escrow based on listing type
-                release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet)
-                
-                transaction.status = 'completed'
-                transaction.completed_at = now
-                transaction.escrow_released = True
-                transaction.escrow_released_at = now
-                transaction.buyer_verified = True  # Assume satisfied if no response
-                transaction.save()
-                
-                create_notification(
-                    user=transaction.buyer,
-                    notification_type='P2P_SERVICE_COMPLETED',
-                    title='Transaction Auto-Completed',
-                    message=f'Transaction {transaction.reference} was auto-completed because you didn\'t verify within {BUYER_VERIFICATION_DEADLINE_MINUTES} minutes. Funds {"refunded" if transaction.listing.listing_type == "buy" else "released to seller"}.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                create_notification(
-                    user=transaction.seller,
-                    notification_type='P2P_SERVICE_COMPLETED',
-                    title='Transaction Completed',
-                    message=f'Transaction {transaction.reference} was auto-completed due to buyer verification timeout.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                processed['buyer_verification_timeout'] += 1
-                logger.info(f"Auto-completed transaction {transaction.reference} due to buyer verification timeout")
-                
-        except Exception as e:
-            logger.error(f"Error processing buyer verification timeout for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
-    
-    # 5. Auto-release: After buyer verification (15 minutes delay)
-    auto_release_transactions = P2PServiceTransaction.objects.filter(
-        status='verifying',
-        auto_release_at__lte=now,
-        auto_release_at__isnull=False,
-        buyer_verified=True,
-        escrow_released=False
-    )
-    
-    for transaction in auto_release_transactions:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                seller_wallet, _ = Wallet.objects.get_or_create(user=transaction.seller)
-                
-                # Release escrow based on listing type
-                release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet)
-                
-                transaction.status = 'completed'
-                transaction.completed_at = now
-                transaction.escrow_released = True
-                transaction.escrow_released_at = now
-                transaction.save()
-                
-                create_notification(
-                    user=transaction.buyer,
-                    notification_type='P2P_SERVICE_COMPLETED',
-                    title='Transaction Completed',
-                    message=f'Transaction {transaction.reference} has been completed. Escrow {"refunded" if transaction.listing.listing_type == "buy" else "released to seller"}.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                create_notification(
-                    user=transaction.seller,
-                    notification_type='P2P_SERVICE_COMPLETED',
-                    title='Transaction Completed',
-                    message=f'Transaction {transaction.reference} has been completed.',
-                    related_object_type='p2p_service_transaction',
-                    related_object_id=transaction.id,
-                )
-                
-                processed['auto_released'] += 1
-                logger.info(f"Auto-released escrow for transaction {transaction.reference}")
-                
-        except Exception as e:
-            logger.error(f"Error auto-releasing escrow for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
-    
-    # 6. Safety net: Completed transactions with unreleased escrow
-    completed_unreleased = P2PServiceTransaction.objects.filter(
-        status='completed',
-        escrow_released=False,
-        escrow_amount_cedis__gt=0
-    )
-    
-    for transaction in completed_unreleased:
-        try:
-            with db_transaction.atomic():
-                buyer_wallet, _ = Wallet.objects.get_or_create(user=transaction.buyer)
-                seller_wallet, _ = Wallet.objects.get_or_create(user=transaction.seller)
-                
-                # Release escrow based on listing type
-                release_escrow_for_buy_listing(transaction, buyer_wallet, seller_wallet)
-                
-                transaction.escrow_released = True
-                transaction.escrow_released_at = now
-                transaction.save(update_fields=['escrow_released', 'escrow_released_at'])
-                
-                log_p2p_transaction_action(
-                    transaction=transaction,
-                    action='auto_released',
-                    performed_by=None,
-                    notes=f'Escrow automatically released for completed transaction (safety net). Amount: ₵{transaction.escrow_amount_cedis}'
-                )
-                
-                processed['safety_net_releases'] += 1
-                logger.info(f"Safety net: Released escrow for completed transaction {transaction.reference}")
-                
-        except Exception as e:
-            logger.error(f"Error in safety net release for {transaction.reference}: {str(e)}", exc_info=True)
-            continue
+    # Rows are claimed a chunk at a time, each chunk in its own transaction, so transaction and
+    # wallet row locks are held for one chunk rather than the whole run. Each row runs in its own
+    # savepoint together with its ledger rows and listing restore, so a failed insert (e.g. a
+    # clashing ledger reference) only skips that row
+    claimed = 0
+    last_id = 0
+    while claimed < AUTO_ACTION_BATCH_SIZE:
+        notifications = []  # create_notifications_bulk event tuples
+        action_logs = []  # (transaction, notes) for 'auto_released' P2P action logs
+        with db_transaction.atomic():
+            # Lock only the transaction rows; SKIP LOCKED lets overlapping runs claim
+            # disjoint chunks instead of releasing the same escrow twice
+            transactions = list(
+                P2PServiceTransaction.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('buyer', 'seller', 'listing')
+                .only(*_AUTO_ACTION_FIELDS)
+                .filter(reduce(operator.or_, (condition for _, condition in branches)), id__gt=last_id)
+                .annotate(branch=Case(
+                    *[When(condition, then=Value(branch)) for branch, condition in branches],
+                    output_field=CharField(),
+                ))
+                .order_by('id')[:min(AUTO_ACTION_CHUNK_SIZE, AUTO_ACTION_BATCH_SIZE - claimed)]
+            )
+            if not transactions:
+                break
+            wallets = _wallets_by_user(
+                {t.buyer_id for t in transactions}
+                | {t.seller_id for t in transactions if t.branch not in _CANCEL_BRANCHES}
+            )
+            
+            for transaction in transactions:
+                branch = transaction.branch
+                ref = transaction.reference
+                esc = transaction.escrow_amount_cedis
+                row_wallets = [wallets[transaction.buyer_id]]
+                if branch not in _CANCEL_BRANCHES:
+                    row_wallets.append(wallets[transaction.seller_id])
+                try:
+                    with db_transaction.atomic():
+                        buyer_wallet = wallets[transaction.buyer_id]
+                        row_txns = []
+                        
+                        if branch in _CANCEL_BRANCHES:
+                            suffix, ledger_reason, buyer_reason, seller_reason = _CANCEL_BRANCHES[branch]
+                            balance_before = buyer_wallet.balance_cedis
+                            
+                            buyer_wallet.release_cedis_from_escrow(esc)
+                            
+                            row_txns.append(WalletTransaction(
+                                wallet=buyer_wallet,
+                                transaction_type='escrow_release',
+                                amount=esc,
+                                currency='cedis',
+                                status='completed',
+                                reference=f"{ref}-{suffix}",
+                                description=f"Auto-cancelled: {ledger_reason}. Escrow refunded. Ref: {ref}",
+                                balance_before=balance_before,
+                                balance_after=buyer_wallet.balance_cedis
+                            ))
+                            
+                            transaction.status = 'cancelled'
+                            transaction.cancelled_at = now
+                            transaction.save(update_fields=['status', 'cancelled_at', 'updated_at'])
+                            
+                            notifications.append((
+                                transaction.buyer_id,
+                                'P2P_SERVICE_CANCELLED',
+                                'Transaction Auto-Cancelled',
+                                f'Transaction {ref} was auto-cancelled because {buyer_reason}. Your payment has been refunded.',
+                                'p2p_service_transaction',
+                                transaction.id,
+                            ))
+                            if seller_reason:
+                                notifications.append((
+                                    transaction.seller_id,
+                                    'P2P_SERVICE_CANCELLED',
+                                    'Transaction Auto-Cancelled',
+                                    f'Transaction {ref} was auto-cancelled because {seller_reason}.',
+                                    'p2p_service_transaction',
+                                    transaction.id,
+                                ))
+                            
+                            if transaction.listing.listing_type == 'sell':
+                                _restore_listing(transaction.listing_id, transaction.amount_usd)
+                            logger.info("Auto-cancelled transaction %s due to %s", ref, branch.replace('_', ' '))
+                        
+                        else:
+                            # Release escrow based on listing type
+                            release_escrow_for_buy_listing(
+                                transaction, buyer_wallet, wallets[transaction.seller_id], wallet_txns=row_txns
+                            )
+                            transaction.escrow_released = True
+                            transaction.escrow_released_at = now
+                            
+                            if branch == 'safety_net_releases':
+                                transaction.save(update_fields=['escrow_released', 'escrow_released_at'])
+                                
+                                action_logs.append((
+                                    transaction,
+                                    f'Escrow automatically released for completed transaction (safety net). Amount: ₵{esc}',
+                                ))
+                                logger.info("Safety net: Released escrow for completed transaction %s", ref)
+                            
+                            else:
+                                outcome = "refunded" if transaction.listing.listing_type == "buy" else "released to seller"
+                                transaction.status = 'completed'
+                                transaction.completed_at = now
+                                update_fields = ['status', 'completed_at', 'escrow_released', 'escrow_released_at', 'updated_at']
+                                if branch == 'buyer_verification_timeout':
+                                    transaction.buyer_verified = True  # Assume satisfied if no response
+                                    update_fields.append('buyer_verified')
+                                transaction.save(update_fields=update_fields)
+                                
+                                if branch == 'buyer_verification_timeout':
+                                    notifications.append((
+                                        transaction.buyer_id,
+                                        'P2P_SERVICE_COMPLETED',
+                                        'Transaction Auto-Completed',
+                                        f'Transaction {ref} was auto-completed because you didn\'t verify within {BUYER_VERIFICATION_DEADLINE_MINUTES} minutes. Funds {outcome}.',
+                                        'p2p_service_transaction',
+                                        transaction.id,
+                                    ))
+                                    notifications.append((
+                                        transaction.seller_id,
+                                        'P2P_SERVICE_COMPLETED',
+                                        'Transaction Completed',
+                                        f'Transaction {ref} was auto-completed due to buyer verification timeout.',
+                                        'p2p_service_transaction',
+                                        transaction.id,
+                                    ))
+                                    logger.info("Auto-completed transaction %s due to buyer verification timeout", ref)
+                                else:
+                                    notifications.append((
+                                        transaction.buyer_id,
+                                        'P2P_SERVICE_COMPLETED',
+                                        'Transaction Completed',
+                                        f'Transaction {ref} has been completed. Escrow {outcome}.',
+                                        'p2p_service_transaction',
+                                        transaction.id,
+                                    ))
+                                    notifications.append((
+                                        transaction.seller_id,
+                                        'P2P_SERVICE_COMPLETED',
+                                        'Transaction Completed',
+                                        f'Transaction {ref} has been completed.',
+                                        'p2p_service_transaction',
+                                        transaction.id,
+                                    ))
+                                    logger.info("Auto-released escrow for transaction %s", ref)
+                        
+                        WalletTransaction.objects.bulk_create(row_txns)
+                        processed[branch] += 1
+                        
+                except Exception as e:
+                    logger.error("Error processing %s for %s: %s", branch.replace('_', ' '), ref, e, exc_info=True)
+                    # The savepoint rolled the wallet rows back; reload them so the next row for
+                    # the same user doesn't start from this row's balances and version
+                    for wallet in row_wallets:
+                        wallet.refresh_from_db(fields=['balance_cedis', 'escrow_balance', 'version'])
+                    continue
+            
+            # Notifications and action logs are not part of the money movement; write them only
+            # after the escrow changes commit so the row locks are not held across their inserts
+            db_transaction.on_commit(partial(_record_auto_actions, notifications, action_logs))
+        
+        claimed += len(transactions)
+        # Failed rows stay due; moving past them keeps the run from claiming them again
+        last_id = transactions[-1].id
     
+    if claimed:
+        logger.info("P2P auto-actions processed: %s", processed)
     return processed
-
@@ -2,9 +2,10 @@
 Peer-to-Peer (P2P) service models for PayPal, CashApp, and Zelle
 Following the same pattern as GiftCardListing/GiftCardTransaction
 """
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.conf import settings
 from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
 import uuid
 import hashlib
@@ -12,6 +13,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Characters str.strip() removes from ASCII text (bytes.strip() alone misses \x1c-\x1f)
+_ASCII_WHITESPACE = bytes(c for c in range(128) if chr(c).isspace())
+
 
 class SellerApplication(models.Model):
     """
@@ -46,6 +50,11 @@ class SellerApplication(models.Model):
         db_index=True,
         help_text="Perceptual hash of proof of funds image for duplicate detection"
     )
+    # proof_of_funds_hash split into 16-bit bands for indexed similarity lookups (image_utils.phash_band_fields)
+    proof_of_funds_hash_band0 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_of_funds_hash_band1 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_of_funds_hash_band2 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_of_funds_hash_band3 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
     
     # Status tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -197,8 +206,14 @@ class P2PServiceListing(models.Model):
     proof_notes = models.TextField(blank=True, help_text="Additional notes about the service")
     
     # Duplicate protection - hashing
-    service_identifier_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA256 hash of service identifier (email/tag) for duplicate detection")
+    service_identifier_hash = models.CharField(max_length=64, blank=True, help_text="SHA256 hash of service identifier (email/tag) for duplicate detection")
     proof_image_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="Perceptual hash (pHash) of proof image for duplicate detection")
+    # proof_image_hash split into 16-bit bands for indexed similarity lookups (image_utils.phash_band_fields)
+    proof_image_hash_band0 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_image_hash_band1 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_image_hash_band2 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_image_hash_band3 = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    proof_image_processed_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="When process_proof_image last ran on the current proof image (set even if it couldn't be hashed)")
     
     # Status and metadata
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='under_review')
@@ -226,9 +241,21 @@ class P2PServiceListing(models.Model):
         verbose_name_plural = 'P2P Service Listings'
         db_table = 'p2p_service_listings'
         indexes = [
-            models.Index(fields=['service_type', 'status']),
+            # Covers the public listing feed (filtered by type/status, showing rates)
+            # so Postgres can answer it with an index-only scan
+            models.Index(
+                fields=['service_type', 'status', 'listing_type'],
+                include=['rate_cedis_per_usd', 'max_rate_cedis_per_usd', 'seller', 'available_amount_usd'],
+                name='p2p_listing_feed_cov',
+            ),
             models.Index(fields=['seller', 'status']),
-            models.Index(fields=['service_identifier_hash']),
+            # Backs the duplicate-identifier check on listing create/update, which
+            # only compares a seller's live listings that have an identifier
+            models.Index(
+                fields=['service_identifier_hash', 'service_type', 'seller'],
+                condition=models.Q(status__in=['active', 'under_review']) & ~models.Q(service_identifier_hash=''),
+                name='p2p_listing_live_ident_idx',
+            ),
         ]
 
     def __str__(self):
@@ -238,15 +265,17 @@ class P2PServiceListing(models.Model):
             identifier = self.get_service_identifier()
             return f"{self.reference} - {self.get_service_type_display()} SELL ({identifier}) - Rate: ₵{self.rate_cedis_per_usd}/USD by {self.seller.email}"
 
+    # Identifier field per service type; list querysets using only() must load these
+    _IDENTIFIER_FIELD = {
+        'paypal': 'paypal_email',
+        'cashapp': 'cashapp_tag',
+        'zelle': 'zelle_email',
+    }
+
     def get_service_identifier(self):
         """Get the service-specific identifier based on service type"""
-        if self.service_type == 'paypal':
-            return self.paypal_email or 'N/A'
-        elif self.service_type == 'cashapp':
-            return self.cashapp_tag or 'N/A'
-        elif self.service_type == 'zelle':
-            return self.zelle_email or 'N/A'
-        return 'N/A'
+        field = self._IDENTIFIER_FIELD.get(self.service_type)
+        return (getattr(self, field) if field else None) or 'N/A'
 
     @classmethod
     def generate_reference(cls, service_type='paypal', listing_type='sell'):
@@ -265,7 +294,12 @@ class P2PServiceListing(models.Model):
         """Hash service identifier (email or tag) for duplicate detection"""
         if not identifier:
             return ''
-        return hashlib.sha256(identifier.lower().strip().encode('utf-8')).hexdigest()
+        if identifier.isascii():
+            # Normalize on the encoded bytes: same result for ASCII, without the temporary strings
+            data = identifier.encode('ascii').strip(_ASCII_WHITESPACE).lower()
+        else:
+            data = identifier.lower().strip().encode('utf-8')
+        return hashlib.sha256(data, usedforsecurity=False).hexdigest()
     
     def calculate_price_cedis(self, amount_usd, seller_rate=None):
         """
@@ -282,32 +316,75 @@ class P2PServiceListing(models.Model):
             rate = self.rate_cedis_per_usd
         return amount_usd * rate
     
-    def check_buyer_qualification(self, buyer, selected_payment_method_details=None):
+    @cached_property
+    def _required_providers_set(self):
+        """required_payment_providers as a set for O(1) membership checks (cached per instance)"""
+        return frozenset(self.required_payment_providers or ())
+    
+    @cached_property
+    def accepted_methods_set(self):
+        """Method names from accepted_payment_methods, as a set (cached per instance)"""
+        return frozenset(m.get('method', '') for m in self.accepted_payment_methods or ())
+
+    # Buyer attributes read by check_buyer_qualification()
+    BUYER_FLAG_FIELDS = ('email_verified', 'kyc_status', 'completed_p2p_trades_count')
+
+    @classmethod
+    def get_buyer_flags(cls, buyer):
+        """Load the buyer attributes the qualification checks need in a single query"""
+        from django.contrib.auth import get_user_model
+        return get_user_model().objects.values(*cls.BUYER_FLAG_FIELDS).get(pk=buyer.pk)
+
+    @classmethod
+    def check_buyer_qualifications(cls, listings, buyer, selected_payment_method_details=None, check_payment_providers=True):
+        """
+        Qualify one buyer against many listings, loading the buyer's flags once.
+        Returns {listing.pk: (qualified, reason)}
+        """
+        buyer_flags = cls.get_buyer_flags(buyer)
+        return {
+            listing.pk: listing.check_buyer_qualification(
+                buyer, selected_payment_method_details, buyer_flags=buyer_flags,
+                check_payment_providers=check_payment_providers,
+            )
+            for listing in listings
+        }
+
+    def check_buyer_qualification(self, buyer, selected_payment_method_details=None, buyer_flags=None,
+                                  check_payment_providers=True):
         """
         Check if a buyer qualifies to purchase from this listing based on Binance-style requirements.
+        Pass buyer_flags (see get_buyer_flags) to skip reading attributes off the buyer, and
+        check_payment_providers=False to check only the buyer's account (e.g. before a payment method is chosen).
         Returns (qualified: bool, reason: str or None)
         """
         # Only check requirements for sell listings
         if self.listing_type != 'sell':
             return True, None
         
+        if buyer_flags is None:
+            buyer_flags = {field: getattr(buyer, field) for field in self.BUYER_FLAG_FIELDS}
+        
         # Check minimum completed trades
         if self.min_completed_trades > 0:
-            completed_trades = self._get_buyer_completed_trades_count(buyer)
+            completed_trades = buyer_flags['completed_p2p_trades_count']
             if completed_trades < self.min_completed_trades:
                 return False, f"Buyer must have at least {self.min_completed_trades} completed P2P trades. You have {completed_trades}."
         
         # Check verification requirements
         if self.buyer_must_be_verified:
-            if not buyer.email_verified:
+            if not buyer_flags['email_verified']:
                 return False, "Buyer must have verified email address"
         
         if self.buyer_must_be_kyc_verified:
-            if buyer.kyc_status != 'approved':
+            if buyer_flags['kyc_status'] != 'approved':
                 return False, "Buyer must have KYC approval"
         
         # Check payment provider requirements
-        if self.required_payment_providers and len(self.required_payment_providers) > 0:
+        if not check_payment_providers:
+            return True, None
+        required_providers = self._required_providers_set
+        if required_providers:
             if not selected_payment_method_details:
                 return False, f"Buyer must use one of the required payment providers: {', '.join(self.required_payment_providers)}"
             
@@ -316,112 +393,160 @@ class P2PServiceListing(models.Model):
             
             # For MoMo, check provider
             if payment_method == 'momo':
-                if provider not in self.required_payment_providers:
+                if provider not in required_providers:
                     return False, f"Buyer must use one of these MoMo providers: {', '.join(self.required_payment_providers)}"
             # For bank, check if 'Bank' is in required providers
             elif payment_method == 'bank':
-                if 'Bank' not in self.required_payment_providers:
+                if 'Bank' not in required_providers:
                     return False, f"Buyer must use one of these payment providers: {', '.join(self.required_payment_providers)}"
             # For other methods, check if 'Other' is in required providers
             else:
-                if 'Other' not in self.required_payment_providers:
+                if 'Other' not in required_providers:
                     return False, f"Buyer must use one of these payment providers: {', '.join(self.required_payment_providers)}"
         
         return True, None
     
-    def _get_buyer_completed_trades_count(self, buyer):
-        """Get count of completed P2P service transactions for a buyer"""
-        return P2PServiceTransaction.objects.filter(
-            buyer=buyer,
-            status='completed'
-        ).count()
-
     @staticmethod
     def compute_proof_image_hash(image_file):
         """Compute perceptual hash for proof image"""
         try:
             import imagehash
-            from PIL import Image
+            from orders.image_utils import open_for_phash
             
-            image_file.seek(0)
-            img = Image.open(image_file)
-            hash_value = imagehash.phash(img)
+            hash_value = imagehash.phash(open_for_phash(image_file))
             return str(hash_value)
         except Exception as e:
             logger.error(f"Error computing image hash: {str(e)}")
             return None
 
-    def save(self, *args, **kwargs):
-        logger.info(f"[MODEL SAVE] Starting save for P2PServiceListing")
-        logger.info(f"[MODEL SAVE] listing_type: {self.listing_type}, service_type: {self.service_type}")
-        logger.info(f"[MODEL SAVE] pk: {self.pk}, is_new: {not hasattr(self, '_state') or self._state.adding}")
+    @classmethod
+    def batch_hash_images(cls, image_files):
+        """
+        Perceptual hashes for many images at once, for the hash_proof_images backfill command.
+        Matches compute_proof_image_hash bit for bit, but runs one DCT over the whole
+        batch instead of one per image. Returns a hash or None per input, in order.
+        """
+        import numpy as np
+        from PIL import Image
+        from scipy.fft import dctn
+        from orders.image_utils import open_for_phash
+        
+        # Same 32x32 greyscale thumbnail imagehash.phash builds
+        thumbnails, hashes = [], []
+        for image_file in image_files:
+            try:
+                img = open_for_phash(image_file).convert('L').resize((32, 32), Image.LANCZOS)
+                thumbnails.append(np.asarray(img))
+                hashes.append('')
+            except Exception as e:
+                logger.error(f"Error computing image hash: {str(e)}")
+                hashes.append(None)
+        if not thumbnails:
+            return hashes
         
+        lowfreq = dctn(np.stack(thumbnails).astype(np.float64), axes=(1, 2), workers=-1)[:, :8, :8]
+        lowfreq = lowfreq.reshape(len(thumbnails), -1)
+        bits = lowfreq > np.median(lowfreq, axis=1)[:, None]
+        packed = iter(np.packbits(bits, axis=1))
+        return [next(packed).tobytes().hex() if h is not None else None for h in hashes]
+
+    # Fields service_identifier_hash is derived from
+    _IDENTIFIER_SOURCE_FIELDS = ('listing_type', 'service_type', *_IDENTIFIER_FIELD.values())
+
+    def _identifier_source(self):
+        return tuple(getattr(self, field) for field in self._IDENTIFIER_SOURCE_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the stored identifier hash was computed from so save() can skip rehashing
+        if all(field in field_names for field in cls._IDENTIFIER_SOURCE_FIELDS):
+            instance._loaded_identifier_source = instance._identifier_source()
+        return instance
+
+    def save(self, *args, **kwargs):
         # Ensure listing_type has a default value
         if not self.listing_type:
             self.listing_type = 'sell'
-            logger.info("[MODEL SAVE] Set default listing_type to 'sell'")
+            logger.debug("[MODEL SAVE] Set default listing_type to 'sell'")
         
         # Ensure service_type is set (should always be set, but safety check)
         if not self.service_type:
             error_msg = "service_type is required for P2PServiceListing"
-            logger.error(f"[MODEL SAVE] {error_msg}")
+            logger.error("[MODEL SAVE] %s", error_msg)
             raise ValueError(error_msg)
         
         if not self.reference:
             self.reference = self.generate_reference(self.service_type, self.listing_type)
-            logger.info(f"[MODEL SAVE] Generated reference: {self.reference}")
+            logger.debug("[MODEL SAVE] Generated reference: %s", self.reference)
         
-        # For sell listings: Hash service identifier for duplicate detection
-        # For buy listings: No service identifier to hash (buyer doesn't have service yet)
-        if self.listing_type == 'sell':
-            identifier = self.get_service_identifier()
-            if identifier and identifier != 'N/A':
-                self.service_identifier_hash = self.hash_service_identifier(identifier)
-        else:
-            # Buy listings don't have service identifiers - leave hash empty/blank
-            if not self.service_identifier_hash:
-                self.service_identifier_hash = ''
+        # Only rehash the service identifier when the fields it derives from change
+        update_fields = kwargs.get('update_fields')
+        identifier_source = self._identifier_source()
+        rehash_identifier = identifier_source != getattr(self, '_loaded_identifier_source', None) and (
+            update_fields is None or not set(update_fields).isdisjoint(self._IDENTIFIER_SOURCE_FIELDS)
+        )
+        if rehash_identifier:
+            # For sell listings: Hash service identifier for duplicate detection
+            # For buy listings: No service identifier to hash (buyer doesn't have service yet)
+            if self.listing_type == 'sell':
+                identifier = self.get_service_identifier()
+                if identifier and identifier != 'N/A':
+                    self.service_identifier_hash = self.hash_service_identifier(identifier)
+            else:
+                # Buy listings don't have service identifiers - leave hash empty/blank
+                if not self.service_identifier_hash:
+                    self.service_identifier_hash = ''
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'service_identifier_hash'}
         
-        # Hash proof image if provided (only for sell listings typically)
-        # Skip image hashing during initial save - it will be hashed on update after image is stored
-        # This prevents errors when the image file hasn't been saved to disk yet
-        # Only attempt to hash if the object already exists in the database
-        if self.proof_image and self.pk and hasattr(self, '_state') and not self._state.adding:
-            try:
-                # For saved ImageFieldFile, access the underlying file
-                if hasattr(self.proof_image, 'file'):
-                    try:
-                        file_obj = self.proof_image.file
-                        file_obj.seek(0)
-                        image_hash = self.compute_proof_image_hash(file_obj)
-                        if image_hash:
-                            self.proof_image_hash = image_hash
-                    except (AttributeError, IOError, ValueError, OSError) as e:
-                        logger.warning(f"Could not hash proof image (may be new upload): {str(e)}")
-            except Exception as e:
-                logger.error(f"Error hashing proof image: {str(e)}")
+        # Proof image hashing, duplicate checks and watermarking run in a Celery task once
+        # the file is stored (see below); a newly uploaded image invalidates the previous hash until then
+        new_proof_image = bool(self.proof_image) and not self.proof_image._committed and (
+            update_fields is None or 'proof_image' in update_fields
+        )
+        if new_proof_image:
+            from orders.image_utils import phash_band_fields
+            band_fields = phash_band_fields('proof_image_hash', '')
+            self.proof_image_hash = ''
+            self.proof_image_processed_at = None
+            for band_field, band in band_fields.items():
+                setattr(self, band_field, band)
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'proof_image_hash', 'proof_image_processed_at', *band_fields
+                }
         
         # For buy listings, set max_rate if not set (use rate_cedis_per_usd as default)
         if self.listing_type == 'buy' and not self.max_rate_cedis_per_usd:
             self.max_rate_cedis_per_usd = self.rate_cedis_per_usd
         
         try:
-            logger.info("[MODEL SAVE] Calling super().save()...")
+            logger.debug("[MODEL SAVE] Calling super().save()...")
             super().save(*args, **kwargs)
-            logger.info(f"[MODEL SAVE] Successfully saved! ID: {self.pk}")
+            logger.debug("[MODEL SAVE] Successfully saved! ID: %s", self.pk)
+            if rehash_identifier:
+                self._loaded_identifier_source = identifier_source
+            # Only a new upload is queued; legacy unhashed images are left to the hash_proof_images command
+            if new_proof_image:
+                from .tasks import process_proof_image
+                listing_id = self.pk
+                db_transaction.on_commit(lambda: process_proof_image.delay(listing_id))
         except Exception as e:
-            logger.error("=" * 80)
-            logger.error("[MODEL SAVE] ERROR SAVING P2PServiceListing")
-            logger.error(f"Error type: {type(e).__name__}")
-            logger.error(f"Error message: {str(e)}")
-            logger.error(f"listing_type: {self.listing_type}")
-            logger.error(f"service_type: {self.service_type}")
-            logger.error(f"reference: {self.reference}")
-            logger.error("Full traceback:", exc_info=True)
-            logger.error("=" * 80)
+            logger.error(
+                "[MODEL SAVE] ERROR SAVING P2PServiceListing: %s: %s (listing_type=%s, service_type=%s, reference=%s)",
+                type(e).__name__, e, self.listing_type, self.service_type, self.reference,
+                exc_info=True
+            )
             raise
 
 
+class P2PServiceTransactionQuerySet(models.QuerySet):
+    def with_related(self):
+        """Join the listing and both parties, which __str__ and the serializers read on every row"""
+        return self.select_related('listing', 'buyer', 'seller')
+
+
 class P2PServiceTransaction(models.Model):
     """
     Transactions between users for P2P service purchases with escrow system
@@ -455,6 +580,7 @@ class P2PServiceTransaction(models.Model):
     # Payment method selected by buyer
     selected_payment_method = models.CharField(max_length=20, blank=True, help_text="Payment method buyer selected (momo, bank, other)")
     payment_method_details = models.JSONField(default=dict, blank=True, help_text="Details for selected payment method (provider, number, account, etc.)")
+    selected_payment_provider = models.CharField(max_length=50, blank=True, db_index=True, help_text="Provider from payment_method_details, kept as a column for filtering and reporting")
     
     # Binance-style: Payment confirmation flow
     buyer_marked_paid = models.BooleanField(default=False, help_text="Buyer has marked payment as complete")
@@ -514,6 +640,8 @@ class P2PServiceTransaction(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     cancelled_at = models.DateTimeField(null=True, blank=True)
 
+    objects = P2PServiceTransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'P2P Service Transaction'
@@ -523,6 +651,43 @@ class P2PServiceTransaction(models.Model):
             models.Index(fields=['buyer', 'status']),
             models.Index(fields=['seller', 'status']),
             models.Index(fields=['listing', 'status']),
+            # Per-user completed-trade counts only ever look at completed rows
+            models.Index(fields=['buyer'], condition=models.Q(status='completed'), name='p2ptx_buyer_completed_partial'),
+            models.Index(fields=['seller'], condition=models.Q(status='completed'), name='p2ptx_seller_completed_partial'),
+            # Partial indexes for the auto-action deadline checks; only open
+            # transactions with escrow still held are indexed, so they stay small
+            models.Index(
+                fields=['payment_deadline'],
+                condition=models.Q(status='payment_received', escrow_released=False),
+                name='p2p_pymt_dl_pend_idx',
+            ),
+            models.Index(
+                fields=['seller_confirmation_deadline'],
+                condition=models.Q(status='buyer_marked_paid', escrow_released=False),
+                name='p2p_sconf_dl_pend_idx',
+            ),
+            models.Index(
+                fields=['seller_response_deadline'],
+                condition=models.Q(
+                    status__in=['payment_received', 'seller_confirmed_payment'], escrow_released=False
+                ),
+                name='p2p_sresp_dl_pend_idx',
+            ),
+            models.Index(
+                fields=['buyer_verification_deadline'],
+                condition=models.Q(status='service_provided', escrow_released=False),
+                name='p2p_bver_dl_pend_idx',
+            ),
+            models.Index(
+                fields=['auto_release_at'],
+                condition=models.Q(status='verifying', escrow_released=False),
+                name='p2p_autorel_pend_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status='completed', escrow_released=False),
+                name='p2p_done_unreleased_idx',
+            ),
         ]
 
     def __str__(self):
@@ -540,20 +705,49 @@ class P2PServiceTransaction(models.Model):
         return f"{prefix}-{uuid.uuid4().hex[:12].upper()}"
 
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Mirror the provider out of payment_method_details whenever the details are written
+        if 'payment_method_details' not in self.get_deferred_fields() and (
+            update_fields is None or 'payment_method_details' in update_fields
+        ):
+            details = self.payment_method_details
+            provider = details.get('provider') if isinstance(details, dict) else None
+            self.selected_payment_provider = str(provider or '')[:50]
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'selected_payment_provider'}
+
+        # Partial updates that leave status alone can't cause a transition, so skip the bookkeeping
+        if self.pk and update_fields is not None and 'status' not in update_fields:
+            return super().save(*args, **kwargs)
+
         if not self.reference:
             self.reference = self.generate_reference(self.listing.service_type)
-        
-        # Track if status is changing to completed
-        if self.pk:
+
+        with db_transaction.atomic():
+            # Track if status is changing to completed. The row is locked and re-read rather than
+            # trusting this instance: one loaded before another path completed the row would
+            # otherwise count the completion twice
+            if self._state.adding:
+                old_status, old_escrow_released = None, False
+            else:
+                old_status, old_escrow_released = P2PServiceTransaction.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('status', 'escrow_released').first() or (None, False)
+            
+            # Hand the stored values to the pre_save escrow receiver so it doesn't read the row again
+            self._stored_status = (old_status, old_escrow_released)
             try:
-                old_instance = P2PServiceTransaction.objects.get(pk=self.pk)
-                old_status = old_instance.status
-            except P2PServiceTransaction.DoesNotExist:
-                old_status = None
-        else:
-            old_status = None
-        
-        super().save(*args, **kwargs)
+                super().save(*args, **kwargs)
+            finally:
+                del self._stored_status
+            
+            # Keep the buyer's denormalized completed-trade count in step with status transitions
+            if (self.status == 'completed') != (old_status == 'completed'):
+                from django.contrib.auth import get_user_model
+                delta = 1 if self.status == 'completed' else -1
+                get_user_model().objects.filter(pk=self.buyer_id).update(
+                    completed_p2p_trades_count=models.F('completed_p2p_trades_count') + delta
+                )
         
         # If status changed to completed and escrow hasn't been released, trigger release
         if self.status == 'completed' and not self.escrow_released and self.escrow_amount_cedis > 0:
@@ -3,9 +3,15 @@ Serializers for P2P service models (PayPal, CashApp, Zelle)
 Binance-style: Sellers set their own rates and specify payment methods they accept
 """
 from rest_framework import serializers
+from django.core.cache import cache
+from django.db import models
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
+from functools import lru_cache
+import json
+import logging
+import re
 from .p2p_models import (
     P2PServiceListing,
     P2PServiceTransaction,
@@ -16,19 +22,113 @@ from .p2p_models import (
     SellerApplication,
 )
 
+logger = logging.getLogger(__name__)
+
+
+SELLER_RATING_STATS_TTL = 3600  # Also invalidated on every rating write (orders.signals)
+
+
+def seller_rating_stats_cache_key(seller_id):
+    return f"p2p:seller_stats:{seller_id}:v1"
+
+
+def fetch_seller_rating_stats(seller_ids):
+    """
+    Rating statistics for several sellers, keyed by seller id.
+    Read from the cache in one get_many; misses are computed with one grouped query.
+    """
+    keys = {seller_rating_stats_cache_key(seller_id): seller_id for seller_id in set(seller_ids)}
+    stats = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+    missing = set(keys.values()) - stats.keys()
+    if missing:
+        fresh = {seller_id: {'average_rating': 0, 'total_ratings': 0} for seller_id in missing}
+        rows = P2PServiceTransactionRating.objects.filter(rated_user_id__in=missing).values('rated_user_id').annotate(
+            total=models.Count('id'), avg_rating=models.Avg('rating', output_field=models.FloatField())
+        ).order_by()
+        for row in rows:
+            fresh[row['rated_user_id']] = {
+                'average_rating': round(row['avg_rating'], 2),
+                'total_ratings': row['total']
+            }
+        cache.set_many(
+            {seller_rating_stats_cache_key(seller_id): value for seller_id, value in fresh.items()},
+            SELLER_RATING_STATS_TTL
+        )
+        stats.update(fresh)
+    return stats
+
+
+# Listing duplicate check: rates closer than _RATE_EPSILON are the same rate; a listing
+# on the same identifier needs at least _MEANINGFUL_DIFF between rates to count as different
+_RATE_EPSILON = Decimal('0.01')
+_MEANINGFUL_DIFF = Decimal('0.1')
+
+# Payment method names buyers can pay with; the list keeps error messages in a stable order
+_PAYMENT_METHOD_NAMES = ['momo', 'bank', 'other']
+_VALID_PAYMENT_METHODS = frozenset(_PAYMENT_METHOD_NAMES)
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def _payment_method_key(method):
+    return (method.get('method', ''), method.get('provider', ''), method.get('bank_name', ''))
+
+
+@lru_cache(maxsize=1024)
+def _normalized_payment_methods(methods_json):
+    """
+    Sorted (method, provider, bank_name) tuples for a canonical JSON payment methods list.
+    Keyed on the JSON so a listing's methods are only normalized once across requests.
+    """
+    methods = json.loads(methods_json)
+    if not isinstance(methods, list):
+        return ()
+    return tuple(sorted(_payment_method_key(method) for method in methods if isinstance(method, dict)))
+
+
+def normalize_payment_methods(methods):
+    """Normalize a payment methods list for comparison, ignoring order and extra keys"""
+    if isinstance(methods, list) and len(methods) <= 1:
+        # Most listings accept a single method: nothing to sort, so skip the JSON key and cache
+        return tuple(_payment_method_key(method) for method in methods if isinstance(method, dict))
+    return _normalized_payment_methods(json.dumps(methods, sort_keys=True, default=str))
+
+
+class P2PServiceListingListSerializer(serializers.ListSerializer):
+    """Fetches seller rating stats and the requesting buyer's qualifications for a whole page of listings at once"""
+
+    def to_representation(self, data):
+        listings = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context['seller_rating_stats'] = fetch_seller_rating_stats(
+            listing.seller_id for listing in listings
+        )
+        request = self.context.get('request')
+        if request and request.user.is_authenticated and listings:
+            # Payment providers are checked once the buyer picks a method, when the transaction is created
+            self.context['buyer_qualifications'] = P2PServiceListing.check_buyer_qualifications(
+                listings, request.user, check_payment_providers=False
+            )
+        return super().to_representation(listings)
+
 
 class P2PServiceListingSerializer(serializers.ModelSerializer):
-    """Serializer for P2P service listings"""
+    """
+    Serializer for P2P service listings.
+    Querysets passed to it should select_related('seller', 'reviewed_by'),
+    as P2PServiceListingViewSet.get_queryset does.
+    """
     seller_email = serializers.EmailField(source='seller.email', read_only=True)
     seller_name = serializers.SerializerMethodField()
     seller_trust_score = serializers.SerializerMethodField()
     seller_rating_stats = serializers.SerializerMethodField()
+    buyer_qualification = serializers.SerializerMethodField()
     proof_image_url = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
     service_identifier = serializers.SerializerMethodField()
     
     class Meta:
         model = P2PServiceListing
+        list_serializer_class = P2PServiceListingListSerializer
         fields = (
             'id', 'reference', 'listing_type', 'seller', 'seller_email', 'seller_name', 'seller_trust_score', 'seller_rating_stats',
             'service_type', 'paypal_email', 'cashapp_tag', 'zelle_email', 'service_identifier',
@@ -39,31 +139,45 @@ class P2PServiceListingSerializer(serializers.ModelSerializer):
             'min_completed_trades', 'buyer_must_be_verified', 'buyer_must_be_kyc_verified', 'required_payment_providers',
             'status', 'views_count', 'expires_at',
             'admin_notes', 'reviewed_by', 'reviewed_at',
-            'is_owner', 'created_at', 'updated_at'
+            'is_owner', 'buyer_qualification', 'created_at', 'updated_at'
         )
         read_only_fields = (
             'id', 'reference', 'seller', 'seller_email', 'seller_name', 'seller_trust_score', 'seller_rating_stats',
             'status', 'views_count', 'reviewed_by', 'reviewed_at',
-            'created_at', 'updated_at', 'is_owner', 'service_identifier'
+            'created_at', 'updated_at', 'is_owner', 'buyer_qualification', 'service_identifier'
         )
     
     def get_seller_name(self, obj):
-        return obj.seller.get_full_name() or obj.seller.email
+        full_name = getattr(obj, 'seller_full_name', None)
+        if full_name is None:
+            full_name = obj.seller.get_full_name()
+        return full_name or obj.seller.email
     
     def get_seller_trust_score(self, obj):
-        return obj.seller.get_effective_trust_score()
+        # Computed once per seller per response; a page often lists several of a seller's listings
+        scores = self.context.setdefault('seller_trust_scores', {})
+        if obj.seller_id not in scores:
+            scores[obj.seller_id] = obj.seller.get_effective_trust_score()
+        return scores[obj.seller_id]
     
     def get_seller_rating_stats(self, obj):
-        """Get seller's rating statistics"""
-        from .p2p_models import P2PServiceTransactionRating
-        ratings = P2PServiceTransactionRating.objects.filter(rated_user=obj.seller)
-        if ratings.exists():
-            avg_rating = sum(r.rating for r in ratings) / ratings.count()
-            return {
-                'average_rating': round(avg_rating, 2),
-                'total_ratings': ratings.count()
-            }
-        return {'average_rating': 0, 'total_ratings': 0}
+        """Get seller's rating statistics (prefetched per page by P2PServiceListingListSerializer)"""
+        stats = self.context.get('seller_rating_stats') or {}
+        if obj.seller_id not in stats:
+            stats = fetch_seller_rating_stats([obj.seller_id])
+        return stats[obj.seller_id]
+    
+    def get_buyer_qualification(self, obj):
+        """Whether the requesting user meets the listing's buyer requirements (batched per page by P2PServiceListingListSerializer)"""
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return None
+        qualifications = self.context.get('buyer_qualifications') or {}
+        if obj.pk in qualifications:
+            qualified, reason = qualifications[obj.pk]
+        else:
+            qualified, reason = obj.check_buyer_qualification(request.user, check_payment_providers=False)
+        return {'qualified': qualified, 'reason': reason}
     
     def get_proof_image_url(self, obj):
         if obj.proof_image:
@@ -76,7 +190,7 @@ class P2PServiceListingSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.seller == request.user
+            return obj.seller_id == request.user.id
         return False
     
     def get_service_identifier(self, obj):
@@ -84,6 +198,24 @@ class P2PServiceListingSerializer(serializers.ModelSerializer):
         return obj.get_service_identifier()
 
 
+class P2PServiceListingCardSerializer(P2PServiceListingSerializer):
+    """
+    Slim listing serializer for the public listing feed.
+    Leaves out notes and review fields; deferred_fields can be deferred on the queryset.
+    """
+    deferred_fields = (
+        'admin_notes', 'terms_notes', 'proof_notes', 'required_payment_providers',
+        'reviewed_by', 'reviewed_at', 'service_identifier_hash', 'proof_image_hash',
+        'proof_image_hash_band0', 'proof_image_hash_band1', 'proof_image_hash_band2', 'proof_image_hash_band3',
+    )
+
+    class Meta(P2PServiceListingSerializer.Meta):
+        fields = tuple(
+            field for field in P2PServiceListingSerializer.Meta.fields
+            if field not in ('admin_notes', 'terms_notes', 'proof_notes', 'required_payment_providers', 'reviewed_by', 'reviewed_at')
+        )
+
+
 class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating P2P service listings - Binance-style with seller rates or buy orders"""
     
@@ -100,24 +232,14 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """Create listing with proper defaults"""
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info("[SERIALIZER] Creating P2P listing...")
-        logger.info(f"[SERIALIZER] Validated data keys: {list(validated_data.keys())}")
-        
         # Ensure listing_type has a default
         if 'listing_type' not in validated_data or not validated_data['listing_type']:
             validated_data['listing_type'] = 'sell'
-            logger.info("[SERIALIZER] Set default listing_type to 'sell'")
         
         try:
-            logger.info("[SERIALIZER] Calling super().create()...")
-            instance = super().create(validated_data)
-            logger.info(f"[SERIALIZER] Listing created successfully! ID: {instance.id}")
-            return instance
+            return super().create(validated_data)
         except Exception as e:
-            logger.error(f"[SERIALIZER] Error in create(): {str(e)}", exc_info=True)
+            logger.error("[SERIALIZER] Error in create(): %s", e, exc_info=True)
             raise
     
     def validate_rate_cedis_per_usd(self, value):
@@ -149,14 +271,15 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user:
             seller = request.user
-            max_value = seller.get_max_gift_card_value_cedis()  # Reuse gift card limit logic
+            trust_score = seller.get_effective_trust_score()
+            max_value = seller.get_max_gift_card_value_cedis(trust_score)  # Reuse gift card limit logic
             if max_value is not None:
                 # Convert to USD (rough estimate, assuming rate around 12-15)
                 max_usd = max_value / 12  # Conservative estimate
                 if value > max_usd:
                     raise serializers.ValidationError(
                         f"New sellers (trust score < 3) cannot list services above ${max_usd:.2f} USD. "
-                        f"Your current trust score is {seller.get_effective_trust_score()}. "
+                        f"Your current trust score is {trust_score}. "
                         "Complete successful trades to increase your limit."
                     )
         
@@ -176,14 +299,13 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
         if listing_type == 'buy' and len(value) > 1:
             raise serializers.ValidationError("Buy listings can only specify one payment method (the method you will use to pay).")
         
-        valid_methods = ['momo', 'bank', 'other']
         for method_data in value:
             if not isinstance(method_data, dict):
                 raise serializers.ValidationError("Each payment method must be an object.")
             
             method = method_data.get('method')
-            if method not in valid_methods:
-                raise serializers.ValidationError(f"Invalid payment method: {method}. Must be one of {valid_methods}.")
+            if method not in _VALID_PAYMENT_METHODS:
+                raise serializers.ValidationError(f"Invalid payment method: {method}. Must be one of {_PAYMENT_METHOD_NAMES}.")
             
             # Validate method-specific fields
             if method == 'momo':
@@ -202,7 +324,6 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
         paypal_email = attrs.get('paypal_email', '').strip() if attrs.get('paypal_email') else ''
         cashapp_tag = attrs.get('cashapp_tag', '').strip() if attrs.get('cashapp_tag') else ''
         zelle_email = attrs.get('zelle_email', '').strip() if attrs.get('zelle_email') else ''
-        proof_image = attrs.get('proof_image')
         max_rate = attrs.get('max_rate_cedis_per_usd')
         rate = attrs.get('rate_cedis_per_usd')
         
@@ -215,33 +336,35 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
         
         # Check seller verification for sell listings
         if listing_type == 'sell':
-            # Refresh user from database to get latest seller status
-            user.refresh_from_db()
-            
-            # Also check if user has an approved seller application (fallback check)
+            # Read the latest seller status from the database, together with whether the
+            # user has an approved seller application (fallback check), in one query
             # Use fully qualified import to avoid scoping issues
+            from django.contrib.auth import get_user_model
+            from django.db.models import Exists, OuterRef
             from orders.p2p_models import SellerApplication
-            has_approved_application = SellerApplication.objects.filter(
-                user=user,
-                status='approved'
-            ).exists()
+            seller = get_user_model().objects.filter(pk=user.pk).annotate(
+                has_approved_application=Exists(
+                    SellerApplication.objects.filter(user=OuterRef('pk'), status='approved')
+                )
+            ).values('can_sell_p2p', 'seller_status', 'has_approved_application').get()
+            seller_status = seller['seller_status']
             
             # Allow if can_sell_p2p is True OR seller_status is 'approved' OR has approved application
             # (multiple checks handle cases where user fields haven't been updated yet)
-            if not user.can_sell_p2p and user.seller_status != 'approved' and not has_approved_application:
-                if user.seller_status == 'not_applied':
+            if not seller['can_sell_p2p'] and seller_status != 'approved' and not seller['has_approved_application']:
+                if seller_status == 'not_applied':
                     raise serializers.ValidationError({
                         'listing_type': 'You must apply to become a seller before creating sell listings. Please submit a seller application first.'
                     })
-                elif user.seller_status == 'pending':
+                elif seller_status == 'pending':
                     raise serializers.ValidationError({
                         'listing_type': 'Your seller application is pending review. You will be able to create listings once approved.'
                     })
-                elif user.seller_status == 'rejected':
+                elif seller_status == 'rejected':
                     raise serializers.ValidationError({
                         'listing_type': 'Your seller application was rejected. Please contact support if you believe this is an error.'
                     })
-                elif user.seller_status == 'revoked':
+                elif seller_status == 'revoked':
                     raise serializers.ValidationError({
                         'listing_type': 'Your seller privileges have been revoked. Please contact support for more information.'
                     })
@@ -289,27 +412,10 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
             current_available_amount = attrs.get('available_amount_usd')
             current_payment_methods = attrs.get('accepted_payment_methods', [])
             
-            # Normalize payment methods for comparison (sort by method and provider/bank)
-            def normalize_payment_methods(methods):
-                """Normalize payment methods list for comparison"""
-                if not isinstance(methods, list):
-                    return []
-                normalized = []
-                for method in methods:
-                    if isinstance(method, dict):
-                        normalized.append({
-                            'method': method.get('method', ''),
-                            'provider': method.get('provider', ''),
-                            'bank_name': method.get('bank_name', ''),
-                        })
-                # Sort for consistent comparison
-                normalized.sort(key=lambda x: (x['method'], x.get('provider', ''), x.get('bank_name', '')))
-                return normalized
-            
             normalized_current_payment_methods = normalize_payment_methods(current_payment_methods)
             
             # Find existing active listings with same service identifier from same user
-            existing_listings = P2PServiceListing.objects.filter(
+            live_listings = P2PServiceListing.objects.filter(
                 service_identifier_hash=identifier_hash,
                 service_type=service_type,
                 seller=user,
@@ -317,109 +423,77 @@ class P2PServiceListingCreateSerializer(serializers.ModelSerializer):
             )
             
             if self.instance:
-                existing_listings = existing_listings.exclude(id=self.instance.id)
+                live_listings = live_listings.exclude(id=self.instance.id)
             
-            # Check for exact duplicates
-            for existing in existing_listings:
-                # Check if rate is the same (within 0.01 GHS tolerance)
-                rate_diff = abs(float(existing.rate_cedis_per_usd) - float(current_rate))
-                if rate_diff < Decimal('0.01'):
-                    # Check if amounts are the same
-                    if (existing.min_amount_usd == current_min_amount and 
-                        existing.max_amount_usd == current_max_amount and
-                        existing.available_amount_usd == current_available_amount):
-                        # Check if payment methods are the same
-                        existing_payment_methods = normalize_payment_methods(existing.accepted_payment_methods)
-                        if normalized_current_payment_methods == existing_payment_methods:
-                            # This is an exact duplicate!
-                            raise serializers.ValidationError({
-                                'rate_cedis_per_usd': f"You already have an active listing with the same rate (₵{existing.rate_cedis_per_usd}/USD), amount range (${existing.min_amount_usd}-${existing.max_amount_usd or 'unlimited'}), and payment methods. Please modify at least one of these to create a new listing."
-                            })
+            # Listings whose rate is _MEANINGFUL_DIFF or more away already differ meaningfully,
+            # so only the rate window around the new rate needs comparing row by row
+            existing_listings = live_listings
+            if current_rate is not None:
+                existing_listings = live_listings.filter(
+                    rate_cedis_per_usd__gt=current_rate - _MEANINGFUL_DIFF,
+                    rate_cedis_per_usd__lt=current_rate + _MEANINGFUL_DIFF,
+                )
+            
+            # Only the compared columns, fetched once as plain dicts: values() already narrows the
+            # SELECT list the way only() would, without building model instances
+            existing_listings = list(existing_listings.values(
+                'id', 'rate_cedis_per_usd', 'min_amount_usd', 'max_amount_usd',
+                'available_amount_usd', 'accepted_payment_methods',
+            ))
             
-            # Check for listings without meaningful differences
-            # A listing must have at least ONE of these differences compared to existing listings:
-            # 1. Rate difference >= 0.1 GHS
-            # 2. Different amount ranges (min or max differs)
-            # 3. Different payment methods
-            if existing_listings.exists():
-                similar_listings = []
-                has_meaningful_difference = False
+            # Single pass over the existing listings:
+            # - an exact duplicate (same rate within 0.01 GHS, same amounts, same payment methods)
+            #   is rejected outright
+            # - otherwise a listing must have at least ONE meaningful difference compared to them:
+            #   1. Rate difference >= 0.1 GHS
+            #   2. Different amount ranges (min or max differs)
+            #   3. Different payment methods
+            #   Listings up to the first one that differs meaningfully count as similar
+            similar_listings = []
+            has_meaningful_difference = False
+            
+            for existing in existing_listings:
+                rate_diff = abs(existing['rate_cedis_per_usd'] - current_rate)
+                same_amounts = (existing['min_amount_usd'] == current_min_amount and 
+                                existing['max_amount_usd'] == current_max_amount and
+                                existing['available_amount_usd'] == current_available_amount)
                 
-                for existing in existing_listings:
-                    # Check rate difference
-                    rate_diff = abs(float(existing.rate_cedis_per_usd) - float(current_rate))
-                    if rate_diff >= 0.1:
-                        has_meaningful_difference = True
-                        break
-                    
-                    # Check amount differences
-                    if (existing.min_amount_usd != current_min_amount or 
-                        existing.max_amount_usd != current_max_amount or
-                        existing.available_amount_usd != current_available_amount):
-                        has_meaningful_difference = True
-                        break
-                    
-                    # Check payment method differences
-                    existing_payment_methods = normalize_payment_methods(existing.accepted_payment_methods)
-                    if normalized_current_payment_methods != existing_payment_methods:
-                        has_meaningful_difference = True
-                        break
-                    
-                    # If we get here, this listing is too similar to this existing one
-                    similar_listings.append(existing)
+                # Payment methods only matter when rate and amounts are too close to tell apart
+                same_payment_methods = False
+                if rate_diff < _MEANINGFUL_DIFF and same_amounts:
+                    existing_payment_methods = normalize_payment_methods(existing['accepted_payment_methods'])
+                    same_payment_methods = normalized_current_payment_methods == existing_payment_methods
                 
-                # If we have similar listings but no meaningful difference, warn user
-                if similar_listings and not has_meaningful_difference:
-                    similar_count = len(similar_listings)
+                if same_payment_methods and rate_diff < _RATE_EPSILON:
+                    # This is an exact duplicate!
                     raise serializers.ValidationError({
-                        'rate_cedis_per_usd': f"You have {similar_count} similar active listing(s) with the same service identifier. To create a new listing, please ensure it has at least one meaningful difference: (1) Rate difference of at least ₵0.10, (2) Different amount ranges, or (3) Different payment methods."
+                        'rate_cedis_per_usd': f"You already have an active listing with the same rate (₵{existing['rate_cedis_per_usd']}/USD), amount range (${existing['min_amount_usd']}-${existing['max_amount_usd'] or 'unlimited'}), and payment methods. Please modify at least one of these to create a new listing."
                     })
-        
-        # Check for duplicate proof image if provided (only for sell listings)
-        if proof_image and listing_type == 'sell':
-            try:
-                from orders.image_utils import compute_image_hash, check_image_duplicate
-                
-                # Compute perceptual hash
-                proof_image.seek(0)  # Reset file pointer
-                image_hash = compute_image_hash(proof_image)
                 
-                if image_hash:
-                    # Collect all existing hashes from listings and seller applications
-                    existing_hashes = []
-                    
-                    # From P2P listings
-                    existing_listings = P2PServiceListing.objects.filter(
-                        proof_image_hash__isnull=False
-                    ).exclude(id=self.instance.id if self.instance else -1)
-                    existing_hashes.extend([l.proof_image_hash for l in existing_listings if l.proof_image_hash])
-                    
-                    # From seller applications
-                    from orders.p2p_models import SellerApplication
-                    existing_applications = SellerApplication.objects.filter(
-                        proof_of_funds_hash__isnull=False
-                    )
-                    existing_hashes.extend([a.proof_of_funds_hash for a in existing_applications if a.proof_of_funds_hash])
-                    
-                    # Check for duplicates
-                    proof_image.seek(0)
-                    if check_image_duplicate(proof_image, existing_hashes, threshold=85):
-                        raise serializers.ValidationError({
-                            'proof_image': "This proof image has been used before. Please upload a different image."
-                        })
-                    
-                    # Store hash for later
-                    attrs['proof_image_hash'] = image_hash
-                    
-                    # Add watermark to image
-                    from orders.image_utils import process_uploaded_image
-                    proof_image.seek(0)
-                    attrs['proof_image'] = process_uploaded_image(proof_image, add_watermark_flag=True)
-            except Exception as e:
-                # If image processing fails, log but don't block listing creation
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error processing proof image: {str(e)}")
+                if not has_meaningful_difference:
+                    if same_payment_methods:
+                        # This listing is too similar to this existing one
+                        similar_listings.append(existing)
+                    else:
+                        has_meaningful_difference = True
+            
+            # A listing outside the rate window is a meaningful difference too; only looked up
+            # when every listing inside it is similar
+            if similar_listings and not has_meaningful_difference and current_rate is not None:
+                has_meaningful_difference = live_listings.filter(
+                    models.Q(rate_cedis_per_usd__lte=current_rate - _MEANINGFUL_DIFF)
+                    | models.Q(rate_cedis_per_usd__gte=current_rate + _MEANINGFUL_DIFF)
+                ).exists()
+            
+            # If we have similar listings but no meaningful difference, warn user
+            if similar_listings and not has_meaningful_difference:
+                similar_count = len(similar_listings)
+                raise serializers.ValidationError({
+                    'rate_cedis_per_usd': f"You have {similar_count} similar active listing(s) with the same service identifier. To create a new listing, please ensure it has at least one meaningful difference: (1) Rate difference of at least ₵0.10, (2) Different amount ranges, or (3) Different payment methods."
+                })
+        
+        # Proof images are hashed, checked for reuse and watermarked by the
+        # process_proof_image task after the listing is saved, off the request thread
         
         return attrs
 
@@ -465,42 +539,74 @@ class P2PServiceTransactionSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'completed_at', 'cancelled_at'
         )
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Scheme and host for image links, resolved once; with many=True this runs once per page
+        request = self._context.get('request')
+        self._abs_prefix = request.build_absolute_uri('/').rstrip('/') if request else None
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join and annotate everything this serializer reads per row"""
+        from django.db.models import Exists, OuterRef, Value
+        from django.db.models.functions import Concat, Trim
+        return queryset.with_related().annotate(
+            has_rating=Exists(P2PServiceTransactionRating.objects.filter(transaction=OuterRef('pk'))),
+            # Same as User.get_full_name()
+            buyer_full_name=Trim(Concat('buyer__first_name', Value(' '), 'buyer__last_name')),
+            seller_full_name=Trim(Concat('seller__first_name', Value(' '), 'seller__last_name')),
+        )
+    
     def get_buyer_name(self, obj):
-        return obj.buyer.get_full_name() or obj.buyer.email
+        full_name = getattr(obj, 'buyer_full_name', None)
+        if full_name is None:
+            full_name = obj.buyer.get_full_name()
+        return full_name or obj.buyer.email
     
     def get_seller_name(self, obj):
-        return obj.seller.get_full_name() or obj.seller.email
+        full_name = getattr(obj, 'seller_full_name', None)
+        if full_name is None:
+            full_name = obj.seller.get_full_name()
+        return full_name or obj.seller.email
+    
+    def _viewer_id(self):
+        """Id of the requesting user (None if anonymous), resolved once per response"""
+        if 'viewer_id' not in self.context:
+            request = self.context.get('request')
+            self.context['viewer_id'] = request.user.id if request and request.user.is_authenticated else None
+        return self.context['viewer_id']
     
     def get_is_buyer(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.buyer == request.user
-        return False
+        viewer_id = self._viewer_id()
+        return viewer_id is not None and obj.buyer_id == viewer_id
     
     def get_is_seller(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.seller == request.user
-        return False
+        viewer_id = self._viewer_id()
+        return viewer_id is not None and obj.seller_id == viewer_id
+    
+    def _absolute_url(self, url):
+        """Absolute form of a media URL (storage URLs that are already absolute pass through)"""
+        if self._abs_prefix is None or not url.startswith('/'):
+            return url
+        if url.startswith('//'):
+            return self.context['request'].build_absolute_uri(url)
+        return f"{self._abs_prefix}{url}"
     
     def get_service_proof_image_url(self, obj):
         if obj.service_proof_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.service_proof_image.url)
-            return obj.service_proof_image.url
+            return self._absolute_url(obj.service_proof_image.url)
         return None
     
     def get_payment_screenshot_url(self, obj):
         if obj.payment_screenshot:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.payment_screenshot.url)
-            return obj.payment_screenshot.url
+            return self._absolute_url(obj.payment_screenshot.url)
         return None
     
     def get_has_rating(self, obj):
         """Check if transaction has been rated"""
+        has_rating = getattr(obj, 'has_rating', None)
+        if has_rating is not None:
+            return has_rating
         return hasattr(obj, 'rating') and obj.rating is not None
 
 
@@ -514,11 +620,13 @@ class P2PServiceTransactionCreateSerializer(serializers.Serializer):
     
     def validate_listing_id(self, value):
         try:
-            listing = P2PServiceListing.objects.get(id=value)
+            listing = P2PServiceListing.objects.select_related('seller').get(id=value)
             if listing.status != 'active':
                 raise serializers.ValidationError("This listing is not available for purchase.")
-            if listing.seller == self.context['request'].user:
+            if listing.seller_id == self.context['request'].user.id:
                 raise serializers.ValidationError("You cannot purchase your own listing.")
+            # Reused by validate() and handed to the view as validated_data['listing']
+            self._listing = listing
             return value
         except P2PServiceListing.DoesNotExist:
             raise serializers.ValidationError("Listing not found.")
@@ -529,30 +637,24 @@ class P2PServiceTransactionCreateSerializer(serializers.Serializer):
         return value
     
     def validate_selected_payment_method(self, value):
-        valid_methods = ['momo', 'bank', 'other']
-        if value not in valid_methods:
-            raise serializers.ValidationError(f"Invalid payment method. Must be one of {valid_methods}.")
+        if value not in _VALID_PAYMENT_METHODS:
+            raise serializers.ValidationError(f"Invalid payment method. Must be one of {_PAYMENT_METHOD_NAMES}.")
         return value
     
     def validate(self, attrs):
         """Validate amount is within listing limits, payment method is accepted, and buyer service identifier for BUY listings"""
-        listing_id = attrs.get('listing_id')
         amount_usd = attrs.get('amount_usd')
         selected_payment_method = attrs.get('selected_payment_method')
         
-        try:
-            listing = P2PServiceListing.objects.get(id=listing_id)
-        except P2PServiceListing.DoesNotExist:
-            raise serializers.ValidationError("Listing not found.")
+        listing = self._listing
+        attrs['listing'] = listing
         
         # For BUY listings, payment method validation is skipped (not needed - funds are in wallet)
         # For SELL listings, validate payment method
         if listing.listing_type == 'sell':
             # Check payment method is accepted
-            accepted_methods = listing.accepted_payment_methods or []
-            method_found = any(m.get('method') == selected_payment_method for m in accepted_methods)
-            
-            if not method_found:
+            if selected_payment_method not in listing.accepted_methods_set:
+                accepted_methods = listing.accepted_payment_methods or []
                 raise serializers.ValidationError({
                     'selected_payment_method': f"This seller does not accept {selected_payment_method} payments. Accepted methods: {', '.join([m.get('method') for m in accepted_methods])}."
                 })
@@ -566,15 +668,13 @@ class P2PServiceTransactionCreateSerializer(serializers.Serializer):
                 })
             
             # Validate format based on service type
-            import re
             if listing.service_type == 'paypal' or listing.service_type == 'zelle':
                 # Must be a valid email
                 if '@' not in buyer_service_identifier:
                     raise serializers.ValidationError({
                         'buyer_service_identifier': f'Valid email address is required for {listing.get_service_type_display()}.'
                     })
-                email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-                if not re.match(email_pattern, buyer_service_identifier):
+                if not _EMAIL_RE.match(buyer_service_identifier):
                     raise serializers.ValidationError({
                         'buyer_service_identifier': 'Invalid email format.'
                     })
@@ -670,6 +770,13 @@ class P2PServiceTransactionRatingSerializer(serializers.ModelSerializer):
 
 class P2PServiceTransactionRatingCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating P2P service transaction ratings"""
+    # Declared so the transaction is loaded with its seller and an already-rated flag in one query
+    # (this also replaces the generic unique validator for the one-to-one)
+    transaction = serializers.PrimaryKeyRelatedField(
+        queryset=P2PServiceTransaction.objects.select_related('seller').annotate(
+            has_rating=models.Exists(P2PServiceTransactionRating.objects.filter(transaction=models.OuterRef('pk')))
+        )
+    )
     
     class Meta:
         model = P2PServiceTransactionRating
@@ -679,15 +786,14 @@ class P2PServiceTransactionRatingCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user:
             # Ensure user is the buyer
-            if value.buyer != request.user:
+            if value.buyer_id != request.user.id:
                 raise serializers.ValidationError("Only the buyer can rate this transaction.")
             # Ensure transaction is completed
             if value.status != 'completed':
                 raise serializers.ValidationError("You can only rate completed transactions.")
-            # Ensure transaction hasn't been rated
-            # Check if rating already exists (OneToOneField means hasattr always returns True, so check if it's not None)
-            if hasattr(value, 'rating') and value.rating is not None:
-                raise serializers.ValidationError("This transaction has already been rated.")
+        # Ensure transaction hasn't been rated
+        if value.has_rating:
+            raise serializers.ValidationError("This transaction has already been rated.")
         return value
     
     def validate_rating(self, value):
@@ -737,8 +843,21 @@ class SellerApplicationSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         )
     
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the applicant and reviewer, and annotate the applicant's name"""
+        from django.db.models import Value
+        from django.db.models.functions import Concat, Trim
+        return queryset.select_related('user', 'reviewed_by').annotate(
+            # Same as User.get_full_name()
+            user_full_name=Trim(Concat('user__first_name', Value(' '), 'user__last_name')),
+        )
+    
     def get_user_name(self, obj):
-        return obj.user.get_full_name() or obj.user.email
+        full_name = getattr(obj, 'user_full_name', None)
+        if full_name is None:
+            full_name = obj.user.get_full_name()
+        return full_name or obj.user.email
     
     def get_reviewer_name(self, obj):
         if obj.reviewed_by:
@@ -811,68 +930,8 @@ class SellerApplicationCreateSerializer(serializers.ModelSerializer):
         # Calculate current trust score
         current_trust_score = user.get_effective_trust_score()
         
-        # Check for duplicate images if proof of funds is provided
-        if proof_of_funds_image:
-            try:
-                from PIL import Image
-                import imagehash
-                
-                # Compute hash
-                proof_of_funds_image.seek(0)
-                img = Image.open(proof_of_funds_image)
-                image_hash = str(imagehash.phash(img))
-                
-                # Check against all existing proof of funds images
-                existing_applications = SellerApplication.objects.filter(
-                    proof_of_funds_hash__isnull=False
-                ).exclude(user=user)
-                
-                for existing in existing_applications:
-                    if existing.proof_of_funds_hash:
-                        try:
-                            existing_hash = imagehash.hex_to_hash(existing.proof_of_funds_hash)
-                            current_hash = imagehash.hex_to_hash(image_hash)
-                            distance = current_hash - existing_hash
-                            similarity = ((64 - distance) / 64) * 100
-                            
-                            if similarity > 85:
-                                raise serializers.ValidationError({
-                                    'proof_of_funds_image': "This image has been used before. Please upload a different proof of funds image."
-                                })
-                        except Exception:
-                            continue
-                
-                # Also check against P2P listing proof images
-                from orders.p2p_models import P2PServiceListing
-                existing_listings = P2PServiceListing.objects.filter(
-                    proof_image_hash__isnull=False
-                )
-                
-                for listing in existing_listings:
-                    if listing.proof_image_hash:
-                        try:
-                            existing_hash = imagehash.hex_to_hash(listing.proof_image_hash)
-                            current_hash = imagehash.hex_to_hash(image_hash)
-                            distance = current_hash - existing_hash
-                            similarity = ((64 - distance) / 64) * 100
-                            
-                            if similarity > 85:
-                                raise serializers.ValidationError({
-                                    'proof_of_funds_image': "This image has been used in a listing before. Please upload a different proof of funds image."
-                                })
-                        except Exception:
-                            continue
-                
-                # Store hash for later use
-                validated_data['proof_of_funds_hash'] = image_hash
-            except ImportError:
-                # imagehash not available, skip duplicate check
-                pass
-            except Exception as e:
-                # Log but don't block if image processing fails
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error checking proof of funds image: {str(e)}")
+        # Proof of funds images are hashed and checked for reuse by the scan_proof_of_funds
+        # task after the application is saved, off the request thread
         
         if not user.email_verified:
             requirements_errors.append("Email verification is required.")
@@ -915,9 +974,10 @@ class SellerApplicationCreateSerializer(serializers.ModelSerializer):
         # Save the application
         application = super().create(validated_data)
         
-        # If proof of funds hash was computed, save it
-        if 'proof_of_funds_hash' in validated_data:
-            application.proof_of_funds_hash = validated_data['proof_of_funds_hash']
-            application.save(update_fields=['proof_of_funds_hash'])
+        if application.proof_of_funds_image:
+            from django.db import transaction as db_transaction
+            from .tasks import scan_proof_of_funds
+            application_id = application.pk
+            db_transaction.on_commit(lambda: scan_proof_of_funds.delay(application_id))
         
         return application
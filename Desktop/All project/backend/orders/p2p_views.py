@@ -28,19 +28,6 @@ from wallets.models import Wallet, WalletTransaction
 from wallets.views import log_wallet_activity
 from notifications.utils import create_notification
 from orders.security import calculate_risk_score, get_client_ip
-
-def calculate_transaction_risk_score(user, request, transaction_type='p2p_service_transaction'):
-    """Wrapper for calculate_risk_score to match gift card pattern"""
-    risk_score, risk_factors = calculate_risk_score(user, request)
-    device_fingerprint = None  # Can be added later if needed
-    return risk_score, risk_factors, device_fingerprint
-    """Extract client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-    return ip
 from authentication.models import BannedIP
 from .p2p_models import (
     P2PServiceListing,
@@ -53,6 +40,7 @@ from .p2p_models import (
 )
 from .p2p_serializers import (
     P2PServiceListingSerializer,
+    P2PServiceListingCardSerializer,
     P2PServiceListingCreateSerializer,
     P2PServiceTransactionSerializer,
     P2PServiceTransactionCreateSerializer,
@@ -102,9 +90,23 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'rate_cedis_per_usd', 'max_rate_cedis_per_usd', 'views_count']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
+    def _is_public_feed(self):
+        """Public listing feed: list action, not the user's own listings, not an admin"""
+        return (
+            self.action == 'list'
+            and not (self.request.query_params.get('my_listings') == 'true' and self.request.user.is_authenticated)
+            and not self.request.user.is_staff
+        )
+
     def get_queryset(self):
         """Return active listings for non-admin users, all for admin"""
-        queryset = P2PServiceListing.objects.select_related('seller', 'reviewed_by').all()
+        if self._is_public_feed():
+            # Card view: skip the wide notes/review columns the card serializer leaves out
+            queryset = P2PServiceListing.objects.select_related('seller').defer(
+                *P2PServiceListingCardSerializer.deferred_fields
+            )
+        else:
+            queryset = P2PServiceListing.objects.select_related('seller', 'reviewed_by').all()
         if self.action == 'list':
             if self.request.query_params.get('my_listings') == 'true' and self.request.user.is_authenticated:
                 queryset = queryset.filter(seller=self.request.user)
@@ -112,7 +114,10 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(status='active')
         # Order by trust score (higher first), then by creation date
         from django.db.models import F, Case, When, Value, IntegerField
+        from django.db.models.functions import Concat, Trim
         queryset = queryset.annotate(
+            # Same as User.get_full_name(), read by the serializer's seller_name
+            seller_full_name=Trim(Concat('seller__first_name', Value(' '), 'seller__last_name')),
             effective_trust_score=Case(
                 When(seller__trust_score_override__isnull=False, then=F('seller__trust_score_override')),
                 default=F('seller__trust_score'),
@@ -124,6 +129,8 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return P2PServiceListingCreateSerializer
+        if self._is_public_feed():
+            return P2PServiceListingCardSerializer
         return P2PServiceListingSerializer
 
     def get_permissions(self):
@@ -138,46 +145,6 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         """Create listing with rate limiting and email alerts"""
-        # Force immediate output to both stdout and stderr
-        import sys
-        try:
-            sys.stdout.write("\n" + "=" * 80 + "\n")
-            sys.stdout.write("P2P LISTING CREATE REQUEST - STDOUT\n")
-            sys.stdout.flush()
-            sys.stderr.write("\n" + "=" * 80 + "\n")
-            sys.stderr.write("P2P LISTING CREATE REQUEST - STDERR\n")
-            sys.stderr.flush()
-        except:
-            pass
-        
-        try:
-            print("=" * 80)
-            print("P2P LISTING CREATE REQUEST - PRINT STATEMENT")
-            print(f"User: {request.user.email if request.user.is_authenticated else 'Anonymous'}")
-            print(f"Request method: {request.method}")
-            print(f"Content-Type: {request.content_type}")
-            try:
-                data_type = type(request.data)
-                print(f"Request data type: {data_type}")
-                if hasattr(request.data, 'keys'):
-                    keys = list(request.data.keys())
-                    print(f"Request data keys: {keys}")
-                else:
-                    print(f"Request data: {request.data}")
-            except Exception as data_error:
-                print(f"ERROR accessing request.data: {str(data_error)}")
-                print(f"Request.POST keys: {list(request.POST.keys()) if hasattr(request.POST, 'keys') else 'N/A'}")
-                print(f"Request.FILES keys: {list(request.FILES.keys()) if hasattr(request.FILES, 'keys') else 'N/A'}")
-            print("=" * 80)
-        except Exception as e:
-            print(f"ERROR in initial print block: {str(e)}")
-            import traceback
-            traceback.print_exc()
-        
-        # TEST: Try returning immediately to see if view is called
-        # Uncomment below to test
-        # return Response({'test': 'View is being called!'}, status=status.HTTP_200_OK)
-        
         try:
             client_ip = get_client_ip(request)
             if BannedIP.is_ip_banned(client_ip):
@@ -194,9 +161,6 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            logger.info("Getting serializer...")
-            print("Processing FormData...")
-            
             # Parse FormData - handle QueryDict and JSON strings
             # QueryDict.copy() returns a shallow copy, we need to convert to dict
             data = dict(request.data)
@@ -206,9 +170,6 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
                 if isinstance(data[key], list) and len(data[key]) > 0:
                     data[key] = data[key][0]
             
-            print(f"After QueryDict conversion, accepted_payment_methods: {data.get('accepted_payment_methods')}")
-            print(f"Type: {type(data.get('accepted_payment_methods'))}")
-            
             # Parse JSON string for accepted_payment_methods
             if 'accepted_payment_methods' in data:
                 payment_methods = data['accepted_payment_methods']
@@ -216,10 +177,7 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
                     try:
                         import json
                         data['accepted_payment_methods'] = json.loads(payment_methods)
-                        print(f"Parsed accepted_payment_methods from JSON string: {data['accepted_payment_methods']}")
-                        logger.info(f"Parsed accepted_payment_methods from JSON string")
                     except json.JSONDecodeError as e:
-                        print(f"JSON decode error: {str(e)}")
                         logger.error(f"Failed to parse accepted_payment_methods JSON: {str(e)}")
                         raise ValueError(f"Invalid JSON in accepted_payment_methods: {str(e)}")
             
@@ -234,48 +192,14 @@ class P2PServiceListingViewSet(viewsets.ModelViewSet):
                     if isinstance(value, str):
                         try:
                             data[field] = Decimal(value)
-                        except (ValueError, TypeError) as e:
-                            print(f"Error converting {field} to Decimal: {str(e)}")
+                        except (ValueError, TypeError):
                             pass
             
-            print(f"Processed data keys: {list(data.keys())}")
-            print(f"accepted_payment_methods type: {type(data.get('accepted_payment_methods'))}")
-            print(f"accepted_payment_methods value: {data.get('accepted_payment_methods')}")
-            
-            logger.info(f"Processed data keys: {list(data.keys())}")
-            logger.info(f"accepted_payment_methods type: {type(data.get('accepted_payment_methods'))}")
-            
             serializer = self.get_serializer(data=data)
-            logger.info("Validating serializer...")
             serializer.is_valid(raise_exception=True)
-            logger.info("Serializer is valid. Validated data:")
-            logger.info(f"  - listing_type: {serializer.validated_data.get('listing_type')}")
-            logger.info(f"  - service_type: {serializer.validated_data.get('service_type')}")
-            logger.info(f"  - rate_cedis_per_usd: {serializer.validated_data.get('rate_cedis_per_usd')}")
-            logger.info(f"  - available_amount_usd: {serializer.validated_data.get('available_amount_usd')}")
-            
-            logger.info("Saving listing...")
             listing = serializer.save(seller=request.user, status='under_review')
-            logger.info(f"Listing saved successfully! ID: {listing.id}, Reference: {listing.reference}")
         except Exception as e:
-            # Print statements always show up
-            print("=" * 80)
-            print("ERROR CREATING P2P LISTING - PRINT STATEMENT")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            print(f"Request data: {request.data}")
-            import traceback
-            print("Full traceback:")
-            traceback.print_exc()
-            print("=" * 80)
-            
-            logger.error("=" * 80)
-            logger.error("ERROR CREATING P2P LISTING")
-            logger.error(f"Error type: {type(e).__name__}")
-            logger.error(f"Error message: {str(e)}")
-            logger.error(f"Request data: {request.data}")
-            logger.error("Full traceback:", exc_info=True)
-            logger.error("=" * 80)
+            logger.error(f"Error creating P2P listing: {type(e).__name__}: {str(e)}", exc_info=True)
             return Response(
                 {'error': f'Failed to create listing: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -346,10 +270,7 @@ CryptoGhana Team
         except Exception as e:
             logger.warning(f"Failed to create notification: {str(e)}")
         
-        logger.info("=" * 80)
-        logger.info(f"P2P LISTING CREATED SUCCESSFULLY")
-        logger.info(f"Listing ID: {listing.id}, Reference: {listing.reference}")
-        logger.info("=" * 80)
+        logger.info(f"P2P listing created: ID {listing.id}, reference {listing.reference}")
         
         serializer_response = P2PServiceListingSerializer(listing, context={'request': request})
         headers = self.get_success_headers(serializer_response.data)
@@ -520,9 +441,7 @@ CryptoGhana Team
                     )
                 
                 # Calculate risk score
-                risk_score, risk_factors, device_fingerprint = calculate_transaction_risk_score(
-                    buy_listing.seller, request, transaction_type='p2p_service_transaction'
-                )
+                risk_score, risk_factors = calculate_risk_score(buy_listing.seller, request)
                 
                 # Set seller response deadline (24 hours)
                 seller_deadline = timezone.now() + timedelta(hours=24)
@@ -542,8 +461,7 @@ CryptoGhana Team
                     status='payment_received',
                     seller_response_deadline=seller_deadline,
                     risk_score=risk_score,
-                    risk_factors=risk_factors,
-                    device_fingerprint=device_fingerprint
+                    risk_factors=risk_factors
                 )
                 
                 # Mark buy listing as sold
@@ -664,19 +582,20 @@ class P2PServiceTransactionViewSet(viewsets.ModelViewSet):
     """
     serializer_class = P2PServiceTransactionSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['status', 'listing', 'buyer', 'seller']
+    filterset_fields = ['status', 'listing', 'buyer', 'seller', 'selected_payment_provider']
     ordering_fields = ['created_at', 'agreed_price_cedis']
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Users see their own transactions, admins see all"""
+        queryset = P2PServiceTransactionSerializer.setup_eager_loading(P2PServiceTransaction.objects.all())
         if self.request.user.is_staff:
-            return P2PServiceTransaction.objects.select_related('buyer', 'seller', 'listing').all()
+            return queryset
         # Use Q objects for proper OR query
         from django.db.models import Q
-        return P2PServiceTransaction.objects.filter(
+        return queryset.filter(
             Q(buyer=self.request.user) | Q(seller=self.request.user)
-        ).select_related('buyer', 'seller', 'listing')
+        )
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -693,27 +612,26 @@ class P2PServiceTransactionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        listing_id = serializer.validated_data['listing_id']
         amount_usd = serializer.validated_data['amount_usd']
         selected_payment_method = serializer.validated_data['selected_payment_method']
         payment_method_details = serializer.validated_data.get('payment_method_details', {})
         
-        listing = P2PServiceListing.objects.get(id=listing_id)
+        listing = serializer.validated_data['listing']
         buyer = request.user
         
         # Binance-style: Check if buyer has incomplete transactions (prevent multiple active transactions)
-        incomplete_transactions = P2PServiceTransaction.objects.filter(
+        # One query for the guard, the references and the count
+        incomplete_refs = list(P2PServiceTransaction.objects.filter(
             buyer=buyer,
             status__in=['pending_payment', 'payment_received', 'service_provided', 'verifying']
-        ).exclude(status='cancelled')
+        ).exclude(status='cancelled').values_list('reference', flat=True))
         
-        if incomplete_transactions.exists():
-            incomplete_refs = [txn.reference for txn in incomplete_transactions[:3]]
+        if incomplete_refs:
             return Response(
                 {
-                    'error': f'You have {incomplete_transactions.count()} incomplete transaction(s). Please complete or cancel them before starting a new one.',
-                    'incomplete_transactions': incomplete_refs,
-                    'count': incomplete_transactions.count()
+                    'error': f'You have {len(incomplete_refs)} incomplete transaction(s). Please complete or cancel them before starting a new one.',
+                    'incomplete_transactions': incomplete_refs[:3],
+                    'count': len(incomplete_refs)
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
@@ -776,9 +694,7 @@ class P2PServiceTransactionViewSet(viewsets.ModelViewSet):
                     )
                 
                 # Calculate risk score
-                risk_score, risk_factors, device_fingerprint = calculate_transaction_risk_score(
-                    buyer, request, transaction_type='p2p_service_transaction'
-                )
+                risk_score, risk_factors = calculate_risk_score(buyer, request)
                 
                 # Set deadlines based on listing type (Binance-style: 15 minutes for all deadlines)
                 from datetime import timedelta
@@ -811,8 +727,7 @@ class P2PServiceTransactionViewSet(viewsets.ModelViewSet):
                     payment_deadline=payment_deadline,
                     seller_response_deadline=seller_response_deadline,
                     risk_score=risk_score,
-                    risk_factors=risk_factors,
-                    device_fingerprint=device_fingerprint
+                    risk_factors=risk_factors
                 )
                 
                 # Log transaction creation
@@ -2039,7 +1954,14 @@ class P2PServiceTransactionRatingViewSet(viewsets.ModelViewSet):
             rated_user_id=seller_id
         )
         
-        total_ratings = ratings.count()
+        # Total, average and per-star counts in one aggregate query
+        stats = ratings.aggregate(
+            total=models.Count('id'),
+            avg=models.Avg('rating'),
+            **{f'stars_{star}': models.Count('id', filter=models.Q(rating=star)) for star in range(1, 6)}
+        )
+        
+        total_ratings = stats['total']
         if total_ratings == 0:
             return Response({
                 'total_ratings': 0,
@@ -2047,21 +1969,11 @@ class P2PServiceTransactionRatingViewSet(viewsets.ModelViewSet):
                 'rating_breakdown': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
             })
         
-        average_rating = ratings.aggregate(
-            avg=models.Avg('rating')
-        )['avg'] or 0
-        
-        rating_breakdown = {
-            1: ratings.filter(rating=1).count(),
-            2: ratings.filter(rating=2).count(),
-            3: ratings.filter(rating=3).count(),
-            4: ratings.filter(rating=4).count(),
-            5: ratings.filter(rating=5).count(),
-        }
+        rating_breakdown = {star: stats[f'stars_{star}'] for star in range(1, 6)}
         
         return Response({
             'total_ratings': total_ratings,
-            'average_rating': round(average_rating, 2),
+            'average_rating': round(stats['avg'] or 0, 2),
             'rating_breakdown': rating_breakdown
         })
 
@@ -2089,7 +2001,8 @@ class SellerApplicationViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Users can only see their own applications, admins can see all"""
-        queryset = SellerApplication.objects.select_related('user', 'reviewed_by').all()
+        from .p2p_serializers import SellerApplicationSerializer
+        queryset = SellerApplicationSerializer.setup_eager_loading(SellerApplication.objects.all())
         if not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
         return queryset
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.utils import timezone
 from datetime import timedelta
+import logging
 from .models import GiftCard, GiftCardOrder, Order, Trade, GiftCardListing, GiftCardTransaction, GiftCardDispute, GiftCardTransactionRating, GiftCardDisputeLog
+from .image_utils import process_uploaded_image, similar_hash_exists
+
+logger = logging.getLogger(__name__)
 
 
 class GiftCardSerializer(serializers.ModelSerializer):
@@ -146,21 +150,19 @@ class GiftCardListingSerializer(serializers.ModelSerializer):
     
     def get_seller_rating_stats(self, obj):
         """Get seller's rating statistics"""
-        from django.db.models import Avg
-        ratings = GiftCardTransactionRating.objects.filter(
-            rated_user=obj.seller,
+        from django.db.models import Avg, Count
+        stats = GiftCardTransactionRating.objects.filter(
+            rated_user_id=obj.seller_id,
             is_visible=True
-        )
-        total = ratings.count()
-        if total == 0:
+        ).aggregate(total=Count('id'), avg_rating=Avg('rating'))
+        if stats['total'] == 0:
             return {
                 'total_ratings': 0,
                 'average_rating': 0
             }
-        avg = ratings.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
         return {
-            'total_ratings': total,
-            'average_rating': round(avg, 2)
+            'total_ratings': stats['total'],
+            'average_rating': round(stats['avg_rating'] or 0, 2)
         }
     
     def get_card_image_url(self, obj):
@@ -221,11 +223,12 @@ class GiftCardListingCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user:
             seller = request.user
-            max_value = seller.get_max_gift_card_value_cedis()
+            trust_score = seller.get_effective_trust_score()
+            max_value = seller.get_max_gift_card_value_cedis(trust_score)
             if max_value is not None and value > max_value:
                 raise serializers.ValidationError(
                     f"New sellers (trust score < 3) cannot list gift cards above {max_value} cedis. "
-                    f"Your current trust score is {seller.get_effective_trust_score()}. "
+                    f"Your current trust score is {trust_score}. "
                     "Complete successful trades to increase your limit."
                 )
         
@@ -243,7 +246,6 @@ class GiftCardListingCreateSerializer(serializers.ModelSerializer):
             card_hash = GiftCardListing.compute_card_hash(gift_card_code, gift_card_pin)
             
             # Check if hash exists in active or disputed listings
-            from orders.models import GiftCardListing, GiftCardTransaction
             # Exclude current instance if updating
             existing_listing = GiftCardListing.objects.filter(
                 card_hash=card_hash,
@@ -269,65 +271,28 @@ class GiftCardListingCreateSerializer(serializers.ModelSerializer):
         
         # Check for duplicate proof image if provided
         if proof_image:
+            # Compute perceptual hash (None if the image can't be read; that doesn't block the listing)
+            image_hash = GiftCardListing.compute_proof_image_hash(proof_image)
+            
+            if image_hash and similar_hash_exists(
+                GiftCardListing.objects.exclude(id=self.instance.id if self.instance else -1),
+                'proof_image_hash', image_hash,
+            ):
+                raise serializers.ValidationError({
+                    'proof_image': "This proof image has been used before. Reused photos are not allowed. Please upload a unique image of your gift card."
+                })
+            
+            # Store image hash for future comparisons
+            attrs['proof_image_hash'] = image_hash or ''
+            
+            # Add watermark to image (users will see this in listings)
             try:
-                # Compute perceptual hash
-                proof_image.seek(0)  # Reset file pointer
-                image_hash = GiftCardListing.compute_proof_image_hash(proof_image)
-                
-                if image_hash:
-                    # Check for similar images
-                    from orders.models import GiftCardListing
-                    existing_listings = GiftCardListing.objects.filter(
-                        proof_image_hash__isnull=False
-                    ).exclude(id=self.instance.id if self.instance else -1)
-                    
-                    try:
-                        import imagehash
-                        current_hash = imagehash.hex_to_hash(image_hash)
-                        
-                        for listing in existing_listings:
-                            if not listing.proof_image_hash:
-                                continue
-                            
-                            try:
-                                existing_hash = imagehash.hex_to_hash(listing.proof_image_hash)
-                                distance = current_hash - existing_hash
-                                similarity = ((64 - distance) / 64) * 100
-                                
-                                if similarity > 85:
-                                    raise serializers.ValidationError({
-                                        'proof_image': f"This proof image has been used before (similarity: {similarity:.1f}%). Reused photos are not allowed. Please upload a unique image of your gift card."
-                                    })
-                            except (ValueError, TypeError):
-                                continue
-                    except ImportError:
-                        # Fallback: exact match if imagehash not available
-                        exact_match = existing_listings.filter(
-                            proof_image_hash=image_hash
-                        ).first()
-                        if exact_match:
-                            raise serializers.ValidationError({
-                                'proof_image': "This proof image has been used before. Reused photos are not allowed. Please upload a unique image of your gift card."
-                            })
-                
-                # Store image hash for future comparisons
-                proof_image.seek(0)  # Reset again for saving
-                attrs['proof_image_hash'] = image_hash
-                
-                # Add watermark to image (users will see this in listings)
-                try:
-                    from orders.image_utils import process_uploaded_image
-                    proof_image.seek(0)
-                    attrs['proof_image'] = process_uploaded_image(proof_image, add_watermark_flag=True, watermark_text="CryptoGhana.com")
-                except Exception as e:
-                    logger.warning(f"Failed to watermark gift card listing proof image: {str(e)}")
-                    # Continue with original image if watermarking fails
-                    proof_image.seek(0)
+                proof_image.seek(0)
+                attrs['proof_image'] = process_uploaded_image(proof_image, add_watermark_flag=True, watermark_text="CryptoGhana.com")
             except Exception as e:
-                # Don't block listing creation if image hash computation fails
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error computing image hash during listing validation: {str(e)}")
+                logger.warning(f"Failed to watermark gift card listing proof image: {str(e)}")
+                # Continue with original image if watermarking fails
+                proof_image.seek(0)
         
         return attrs
     
@@ -354,7 +319,6 @@ class GiftCardListingCreateSerializer(serializers.ModelSerializer):
                     "Please complete some successful trades to increase your trust score."
                 )
             else:
-                from orders.models import GiftCardListing
                 active_count = GiftCardListing.objects.filter(
                     seller=seller,
                     status='active'
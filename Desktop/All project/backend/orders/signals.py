@@ -1,14 +1,16 @@
 """
 Signals for orders app - handles escrow release and transaction completion
 """
-from django.db.models.signals import post_save, pre_save
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.db import transaction as db_transaction
 from django.utils import timezone
 from wallets.models import Wallet, WalletTransaction
 from wallets.views import log_wallet_activity
 from notifications.utils import create_notification
-from .p2p_models import P2PServiceTransaction
+from .p2p_models import P2PServiceTransaction, P2PServiceTransactionRating
+from .p2p_serializers import seller_rating_stats_cache_key
 # Import log function - defined in p2p_views
 try:
     from .p2p_views import log_p2p_transaction_action
@@ -31,16 +33,22 @@ def ensure_escrow_release_on_completion(sender, instance, **kwargs):
     if not instance.pk:
         return  # New instance, no old status to compare
     
+    # Partial saves that don't write status can't complete the transaction
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    
     # Skip if this is already being processed (prevent recursion)
     if hasattr(instance, '_releasing_escrow'):
         return
     
-    try:
-        old_instance = P2PServiceTransaction.objects.get(pk=instance.pk)
-        old_status = old_instance.status
-        old_escrow_released = old_instance.escrow_released
-    except P2PServiceTransaction.DoesNotExist:
+    # save() has already read the stored status under a row lock
+    stored = getattr(instance, '_stored_status', None)
+    if stored is None:
+        stored = P2PServiceTransaction.objects.filter(pk=instance.pk).values_list('status', 'escrow_released').first()
+    if stored is None or stored[0] is None:
         return
+    old_status, old_escrow_released = stored
     
     # Check if status is changing to 'completed'
     status_changing_to_completed = (old_status != 'completed' and instance.status == 'completed')
@@ -91,9 +99,9 @@ def ensure_escrow_release_on_completion(sender, instance, **kwargs):
                         instance.escrow_released = True
                         instance.escrow_released_at = timezone.now()
                         
-                        # Log transaction action (use old_instance to avoid recursion)
+                        # Log transaction action
                         log_p2p_transaction_action(
-                            transaction=old_instance,
+                            transaction=instance,
                             action='auto_released',
                             performed_by=None,
                             notes=f'Escrow automatically released via signal handler when status changed to completed. Amount: GHS {instance.escrow_amount_cedis}'
@@ -137,3 +145,20 @@ def ensure_escrow_release_on_completion(sender, instance, **kwargs):
 # Note: Notifications are handled by the auto-release command and view actions
 # This signal handler ensures escrow is released and trades are incremented when status changes to 'completed'
 
+
+@receiver(post_delete, sender=P2PServiceTransaction)
+def uncount_deleted_completed_transaction(sender, instance, **kwargs):
+    """Take a deleted completed transaction back out of the buyer's completed-trade count"""
+    if instance.status == 'completed':
+        from django.contrib.auth import get_user_model
+        from django.db.models import F
+        get_user_model().objects.filter(pk=instance.buyer_id, completed_p2p_trades_count__gt=0).update(
+            completed_p2p_trades_count=F('completed_p2p_trades_count') - 1
+        )
+
+
+@receiver(post_save, sender=P2PServiceTransactionRating)
+@receiver(post_delete, sender=P2PServiceTransactionRating)
+def invalidate_seller_rating_stats(sender, instance, **kwargs):
+    """Drop the rated seller's cached rating stats so listings show the new rating"""
+    cache.delete(seller_rating_stats_cache_key(instance.rated_user_id))
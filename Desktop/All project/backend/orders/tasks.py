@@ -4,12 +4,14 @@ Handles auto-cancellation and auto-release of transactions that exceed their dea
 """
 from celery import shared_task
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db import transaction as db_transaction
 from django.core.mail import send_mail
 from django.conf import settings
 from decimal import Decimal
 import logging
-from .models import GiftCardTransaction, P2PServiceTransaction
+import os
+from .models import GiftCardTransaction, P2PServiceTransaction, TransactionAuditLog
 from wallets.models import Wallet
 from notifications.models import Notification
 
@@ -281,3 +283,146 @@ def cleanup_expired_temp_data():
     except Exception as e:
         logger.error(f"Cleanup failed: {str(e)}", exc_info=True)
         raise
+
+
+@shared_task(bind=True, max_retries=3)
+def write_transaction_audit_log(self, payload):
+    """
+    Persist an audit log queued by TransactionAuditLog.queue_audit_log
+    Signing happens in TransactionAuditLog.save(), off the request thread
+    """
+    try:
+        if payload.get('timestamp'):
+            payload = {**payload, 'timestamp': parse_datetime(payload['timestamp'])}
+        TransactionAuditLog.objects.create(**payload)
+    except Exception as e:
+        logger.error(
+            f"Failed to write audit log for {payload.get('transaction_type')}#{payload.get('transaction_id')}: {str(e)}",
+            exc_info=True
+        )
+        raise self.retry(exc=e, countdown=5 ** self.request.retries)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_proof_image(self, listing_id):
+    """
+    Hash, duplicate-check and watermark a P2P listing's newly uploaded proof image
+    Queued by P2PServiceListing.save() so the image work stays off the request thread.
+    A proof image already on file puts an active listing back under review.
+    """
+    from django.db.models import Value
+    from django.db.models.functions import Concat
+    from .image_utils import phash_band_fields, process_uploaded_image, similar_hash_exists
+    from .p2p_models import P2PServiceListing, SellerApplication
+    try:
+        listing = P2PServiceListing.objects.only('proof_image', 'proof_image_processed_at').filter(pk=listing_id).first()
+        # Already processed (e.g. a retry after the UPDATE went through): never watermark twice
+        if not listing or not listing.proof_image or listing.proof_image_processed_at:
+            return
+        original_name = listing.proof_image.name
+        with listing.proof_image.open('rb') as image_file:
+            image_hash = P2PServiceListing.compute_proof_image_hash(image_file)
+            if not image_hash:
+                # Record the attempt so the image isn't picked up for hashing again
+                logger.warning(f"Proof image for P2P listing {listing_id} could not be hashed")
+                P2PServiceListing.objects.filter(pk=listing_id, proof_image=original_name).update(
+                    proof_image_processed_at=timezone.now()
+                )
+                return
+            
+            # Seller applications (at most one live per seller) are the smaller table, so scan them first
+            duplicate = (
+                similar_hash_exists(SellerApplication.objects.all(), 'proof_of_funds_hash', image_hash)
+                or similar_hash_exists(P2PServiceListing.objects.exclude(pk=listing_id), 'proof_image_hash', image_hash)
+            )
+            
+            # The watermarked copy is written last, so a retry after any earlier failure has no file to clean up
+            watermarked = process_uploaded_image(image_file, add_watermark_flag=True)
+            if watermarked is not image_file:
+                listing.proof_image.save(os.path.basename(original_name), watermarked, save=False)
+        new_name = listing.proof_image.name
+        
+        # Plain UPDATEs: no save() re-entry, and they don't clobber concurrent edits.
+        # Only the image this task read is replaced; a newer upload has its own task queued.
+        try:
+            with db_transaction.atomic():
+                listings = P2PServiceListing.objects.filter(pk=listing_id, proof_image=original_name)
+                updated = listings.update(
+                    proof_image=new_name,
+                    proof_image_hash=image_hash,
+                    proof_image_processed_at=timezone.now(),
+                    **phash_band_fields('proof_image_hash', image_hash),
+                )
+                if updated and duplicate:
+                    logger.warning(f"Proof image for P2P listing {listing_id} matches one already on file")
+                    listings = P2PServiceListing.objects.filter(pk=listing_id)
+                    listings.filter(status='active').update(status='under_review')
+                    listings.update(admin_notes=Concat(
+                        'admin_notes', Value('\nProof image matches one already used on another listing or seller application.')
+                    ))
+        except Exception:
+            if new_name != original_name:
+                listing.proof_image.storage.delete(new_name)
+            raise
+        if new_name != original_name:
+            # Drop whichever copy the listing no longer points at; the listing itself is done, so don't retry
+            stale_name = original_name if updated else new_name
+            try:
+                listing.proof_image.storage.delete(stale_name)
+            except Exception as e:
+                logger.warning(f"Failed to delete stale proof image {stale_name} for P2P listing {listing_id}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Failed to process proof image for P2P listing {listing_id}: {str(e)}", exc_info=True)
+        raise self.retry(exc=e, countdown=5 ** self.request.retries)
+
+
+@shared_task(bind=True, max_retries=3)
+def scan_proof_of_funds(self, application_id):
+    """
+    Hash a seller application's proof of funds image and check it for reuse
+    Queued by SellerApplicationCreateSerializer.create() so the image work stays off the request thread.
+    An image already on file for another applicant or a P2P listing rejects a pending application.
+    """
+    from notifications.utils import create_notification
+    from .image_utils import phash_band_fields, similar_hash_exists
+    from .p2p_models import P2PServiceListing, SellerApplication
+    try:
+        application = SellerApplication.objects.select_related('user').filter(pk=application_id).first()
+        if not application or not application.proof_of_funds_image:
+            return
+        with application.proof_of_funds_image.open('rb') as image_file:
+            image_hash = P2PServiceListing.compute_proof_image_hash(image_file)
+        if not image_hash:
+            return
+        SellerApplication.objects.filter(pk=application_id).update(
+            proof_of_funds_hash=image_hash, **phash_band_fields('proof_of_funds_hash', image_hash)
+        )
+        
+        other_applications = SellerApplication.objects.exclude(user_id=application.user_id)
+        if similar_hash_exists(other_applications, 'proof_of_funds_hash', image_hash):
+            reason = "This image has been used before. Please upload a different proof of funds image."
+        elif similar_hash_exists(P2PServiceListing.objects.all(), 'proof_image_hash', image_hash):
+            reason = "This image has been used in a listing before. Please upload a different proof of funds image."
+        else:
+            return
+        
+        # Re-read under a row lock: an admin may have reviewed the application while it was queued,
+        # or be approving it right now
+        with db_transaction.atomic():
+            application = SellerApplication.objects.select_for_update(of=('self',)).select_related('user').filter(
+                pk=application_id, status='pending'
+            ).first()
+            if not application:
+                return
+            logger.warning(f"Proof of funds for seller application {application_id} matches an image already on file")
+            application.reject(None, reason)
+        create_notification(
+            user=application.user,
+            notification_type='SELLER_APPLICATION_REJECTED',
+            title='Seller Application Rejected',
+            message=f'Your seller application was rejected. {reason}',
+            related_object_type='seller_application',
+        )
+    except Exception as e:
+        logger.error(f"Failed to scan proof of funds for seller application {application_id}: {str(e)}", exc_info=True)
+        raise self.retry(exc=e, countdown=5 ** self.request.retries)
@@ -1,7 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import CaptureQueriesContext
+from django.db import DatabaseError, connection, connections
+from django.contrib.admin.sites import AdminSite
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
-from .models import GiftCard, GiftCardOrder
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from PIL import Image
+from rest_framework.test import APIClient
+import tempfile
+import threading
+from notifications.models import Notification
+from wallets.models import Wallet, WalletTransaction
+from .image_utils import compute_image_hash, find_similar_hash, phash_band_fields, similar_hash_exists
+from .models import (
+    GiftCard, GiftCardListing, GiftCardOrder, P2PServiceListing, P2PServiceTransaction, P2PServiceTransactionLog,
+    P2PServiceTransactionRating, SellerApplication, TransactionAuditLog,
+)
+from .models_auditlog import AuditAction, TxnType
+from .p2p_admin import P2PServiceListingAdmin, P2PServiceTransactionLogAdmin
+from .p2p_binance_refactor import process_auto_actions_enhanced
+from .p2p_serializers import P2PServiceListingCreateSerializer, SellerApplicationCreateSerializer
+from .serializers import GiftCardListingCreateSerializer
 
 User = get_user_model()
 
@@ -89,4 +116,1296 @@ class GiftCardOrderModelTest(TestCase):
             amount=Decimal('100.00'),
             status='pending'
         )
-        self.assertEqual(sell_order.calculated_amount, Decimal('90.00'))  # 100 * 0.90
\ No newline at end of file
+        self.assertEqual(sell_order.calculated_amount, Decimal('90.00'))  # 100 * 0.90
+
+
+@override_settings(MEDIA_ROOT=tempfile.gettempdir())
+class GiftCardListingCreateSerializerTest(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', email='seller@example.com', password='testpass123')
+        self.card = GiftCard.objects.create(
+            name='Amazon $50 Gift Card', brand='Amazon', rate_buy=Decimal('0.95'), rate_sell=Decimal('0.90')
+        )
+        self.request = RequestFactory().post('/')
+        self.request.user = self.seller
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        self.image_bytes = buffer.getvalue()
+
+    def _serializer(self, **overrides):
+        data = {
+            'card': self.card.pk,
+            'gift_card_value': '10.00',
+            'asking_price_cedis': '100.00',
+            'proof_image': SimpleUploadedFile('proof.jpg', self.image_bytes, content_type='image/jpeg'),
+            **overrides,
+        }
+        return GiftCardListingCreateSerializer(data=data, context={'request': self.request})
+
+    def test_reused_proof_image_is_rejected(self):
+        """Test that a proof image already on another listing fails validation instead of being logged and ignored"""
+        GiftCardListing.objects.create(
+            seller=self.seller,
+            card=self.card,
+            gift_card_value=Decimal('10.00'),
+            asking_price_cedis=Decimal('100.00'),
+            proof_image_hash=compute_image_hash(BytesIO(self.image_bytes)),
+        )
+        serializer = self._serializer()
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('used before', str(serializer.errors['proof_image']))
+
+    def test_new_proof_image_without_card_code_is_hashed(self):
+        """Test that a listing with a fresh proof image and no gift card code validates and keeps the image hash"""
+        serializer = self._serializer()
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['proof_image_hash'], compute_image_hash(BytesIO(self.image_bytes)))
+
+
+class TransactionAuditLogModelTest(TestCase):
+    def test_signature_stored_as_raw_digest(self):
+        """Test that the HMAC signature is stored as 32 raw bytes"""
+        log = TransactionAuditLog.create_audit_log(
+            transaction_type='gift_card',
+            transaction_id=1,
+            action='created',
+        )
+        log.refresh_from_db()
+        self.assertEqual(len(bytes(log.signature)), 32)
+        self.assertEqual(len(log.signature_hex), 64)
+
+    def test_get_history_scoped_and_newest_first(self):
+        """Test that get_history returns only one transaction's logs, newest first"""
+        first = TransactionAuditLog.create_audit_log('gift_card', 1, 'created')
+        second = TransactionAuditLog.create_audit_log('gift_card', 1, 'payment_locked')
+        TransactionAuditLog.create_audit_log('gift_card', 2, 'created')
+        history = list(TransactionAuditLog.get_history('gift_card', 1))
+        self.assertEqual([log.id for log in history], [second.id, first.id])
+
+    def test_queue_audit_log_writes_after_commit(self):
+        """Test that queued audit logs are only written once the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            TransactionAuditLog.queue_audit_log('gift_card', 3, 'created', notes='queued')
+            self.assertFalse(TransactionAuditLog.objects.filter(transaction_id=3).exists())
+        self.assertEqual(len(callbacks), 1)
+        log = TransactionAuditLog.objects.get(transaction_id=3)
+        self.assertEqual(log.notes, 'queued')
+        self.assertEqual(len(bytes(log.signature)), 32)
+
+    def test_str_uses_performed_by_email_snapshot(self):
+        """Test that __str__ reads the email snapshot, not the live user row"""
+        user = User.objects.create_user(username='auditor', email='before@example.com', password='testpass123')
+        log = TransactionAuditLog.create_audit_log('gift_card', 4, 'cancelled', performed_by=user)
+        User.objects.filter(pk=user.pk).update(email='after@example.com')
+        log = TransactionAuditLog.objects.get(pk=log.pk)
+        self.assertEqual(str(log), 'gift_card#4 - cancelled by before@example.com')
+
+    def test_signatures_form_verifiable_chain(self):
+        """Test that entries chain per transaction and tampering breaks verification"""
+        first = TransactionAuditLog.create_audit_log('gift_card', 6, 'created')
+        second = TransactionAuditLog.create_audit_log('gift_card', 6, 'payment_locked')
+        TransactionAuditLog.create_audit_log('gift_card', 7, 'created')
+        self.assertNotEqual(bytes(first.signature), bytes(second.signature))
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 6))
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 7))
+
+        TransactionAuditLog.objects.filter(pk=first.pk).update(action=AuditAction.CANCELLED)
+        self.assertFalse(TransactionAuditLog.verify_chain('gift_card', 6))
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 7))
+
+    def test_bulk_create_audit_logs_extends_chains(self):
+        """Test that bulk-inserted entries are signed onto each transaction's existing chain"""
+        TransactionAuditLog.create_audit_log('gift_card', 10, 'created')
+        logs = TransactionAuditLog.bulk_create_audit_logs([
+            TransactionAuditLog(transaction_type='gift_card', transaction_id=10, action='payment_locked'),
+            TransactionAuditLog(transaction_type='gift_card', transaction_id=10, action='card_provided'),
+            TransactionAuditLog(transaction_type='escrow', transaction_id=10, action='created'),
+        ])
+        self.assertEqual(len(logs), 3)
+        self.assertEqual(TransactionAuditLog.objects.filter(transaction_id=10).count(), 4)
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 10))
+        self.assertTrue(TransactionAuditLog.verify_chain('escrow', 10))
+
+    def test_ip_address_packed_and_round_trips(self):
+        """Test that IPv4/IPv6 addresses are stored packed and read back as text"""
+        v4 = TransactionAuditLog.create_audit_log('gift_card', 8, 'created', ip_address='203.0.113.7')
+        v6 = TransactionAuditLog.create_audit_log('gift_card', 9, 'created', ip_address='2001:db8::1')
+        v4.refresh_from_db()
+        v6.refresh_from_db()
+        self.assertEqual(len(bytes(v4.ip_address)), 4)
+        self.assertEqual(v4.ip_str, '203.0.113.7')
+        self.assertEqual(len(bytes(v6.ip_address)), 16)
+        self.assertEqual(v6.ip_str, '2001:db8::1')
+
+    def test_create_audit_log_rejects_unknown_action(self):
+        """Test that unknown actions are refused before hitting the database"""
+        with self.assertRaises(ValueError):
+            TransactionAuditLog.create_audit_log('gift_card', 5, 'not_an_action')
+        self.assertFalse(TransactionAuditLog.objects.filter(transaction_id=5).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent writers need PostgreSQL')
+class TransactionAuditLogConcurrencyTest(TransactionTestCase):
+    def _write_concurrently(self, write, threads=8):
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def run():
+            try:
+                barrier.wait()
+                write()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=run) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_saves_extend_one_chain(self):
+        """Test that parallel writers starting a new chain link up instead of forking it"""
+        self._write_concurrently(lambda: TransactionAuditLog.create_audit_log('gift_card', 20, 'created'))
+        self.assertEqual(TransactionAuditLog.objects.filter(transaction_id=20).count(), 8)
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 20))
+
+    def test_concurrent_bulk_creates_extend_each_chain(self):
+        """Test that parallel batches covering the same chains each sign onto the latest head"""
+        TransactionAuditLog.create_audit_log('gift_card', 21, 'created')
+        self._write_concurrently(lambda: TransactionAuditLog.bulk_create_audit_logs([
+            TransactionAuditLog(transaction_type='gift_card', transaction_id=21, action='payment_locked'),
+            TransactionAuditLog(transaction_type='escrow', transaction_id=21, action='created'),
+        ]))
+        self.assertEqual(TransactionAuditLog.objects.filter(transaction_type=TxnType.GIFT_CARD, transaction_id=21).count(), 9)
+        self.assertTrue(TransactionAuditLog.verify_chain('gift_card', 21))
+        self.assertTrue(TransactionAuditLog.verify_chain('escrow', 21))
+
+
+class P2PServiceListingAdminActionTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='testpass123'
+        )
+        self.seller = User.objects.create_user(
+            username='seller', email='seller@example.com', password='testpass123'
+        )
+        self.listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+            status='under_review',
+        )
+        self.model_admin = P2PServiceListingAdmin(P2PServiceListing, AdminSite())
+        self.request = RequestFactory().post('/')
+        self.request.user = self.admin_user
+
+    def test_approve_listings_updates_and_notifies(self):
+        """Test that approving listings updates status and notifies each seller"""
+        with patch.object(self.model_admin, 'message_user') as message_user:
+            self.model_admin.approve_listings(self.request, P2PServiceListing.objects.all())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, 'active')
+        self.assertEqual(self.listing.reviewed_by, self.admin_user)
+        notification = Notification.objects.get(user=self.seller)
+        self.assertEqual(notification.notification_type, 'P2P_SERVICE_LISTING_APPROVED')
+        self.assertIn(self.listing.reference, notification.message)
+        message_user.assert_called_once_with(self.request, '1 listing(s) approved.')
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_reused_proof_image_puts_listing_back_under_review(self):
+        """Test that the proof image task watermarks the upload and flags one already on file"""
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        image_hash = compute_image_hash(BytesIO(buffer.getvalue()))
+        other = P2PServiceListing.objects.create(
+            seller=self.admin_user,
+            service_type='cashapp',
+            cashapp_tag='$other',
+        )
+        P2PServiceListing.objects.filter(pk=other.pk).update(proof_image_hash=image_hash)
+        self.listing.status = 'active'
+        self.listing.proof_image = SimpleUploadedFile('proof.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        original_name = self.listing.proof_image.name
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.proof_image_hash, image_hash)
+        self.assertEqual(self.listing.status, 'under_review')
+        self.assertIn('Proof image matches', self.listing.admin_notes)
+        self.assertNotEqual(self.listing.proof_image.name, original_name)
+        self.assertFalse(self.listing.proof_image.storage.exists(original_name))
+        self.listing.proof_image.delete(save=False)
+
+    def test_reject_listings_skips_non_pending(self):
+        """Test that rejecting only touches listings still under review"""
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(status='active')
+        with patch.object(self.model_admin, 'message_user'):
+            self.model_admin.reject_listings(self.request, P2PServiceListing.objects.all())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, 'active')
+        self.assertFalse(Notification.objects.filter(user=self.seller).exists())
+
+    def test_changelist_renders_with_projected_columns(self):
+        """Test that listing and transaction changelists render with trimmed querysets"""
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        P2PServiceTransaction.objects.create(
+            listing=self.listing,
+            buyer=buyer,
+            seller=self.seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+        )
+        self.client.force_login(self.admin_user)
+        response = self.client.get('/admin/orders/p2pservicelisting/')
+        self.assertContains(response, self.listing.reference)
+        self.assertContains(response, 'seller@paypal.com')
+        response = self.client.get('/admin/orders/p2pservicetransaction/')
+        self.assertContains(response, 'buyer@example.com')
+
+    def test_log_changelist_query_count_is_constant(self):
+        """Test that the read-only transaction log list does not query per row"""
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        transaction = P2PServiceTransaction.objects.create(
+            listing=self.listing,
+            buyer=buyer,
+            seller=self.seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+        )
+        self.client.force_login(self.admin_user)
+        P2PServiceTransactionLog.objects.create(transaction=transaction, action='created', performed_by=buyer)
+        with CaptureQueriesContext(connection) as one_row:
+            self.client.get('/admin/orders/p2pservicetransactionlog/')
+        for _ in range(5):
+            P2PServiceTransactionLog.objects.create(transaction=transaction, action='cancelled', performed_by=buyer)
+        with CaptureQueriesContext(connection) as many_rows:
+            response = self.client.get('/admin/orders/p2pservicetransactionlog/')
+        self.assertContains(response, transaction.reference)
+        self.assertEqual(len(many_rows), len(one_row))
+
+    def test_transaction_log_export_streams_csv(self):
+        """Test that the log CSV export streams a header plus one line per entry"""
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        transaction = P2PServiceTransaction.objects.create(
+            listing=self.listing,
+            buyer=buyer,
+            seller=self.seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+        )
+        P2PServiceTransactionLog.objects.create(transaction=transaction, action='created', performed_by=buyer)
+        P2PServiceTransactionLog.objects.create(transaction=transaction, action='cancelled', notes='a, b')
+        log_admin = P2PServiceTransactionLogAdmin(P2PServiceTransactionLog, AdminSite())
+        response = log_admin.export_as_csv(self.request, P2PServiceTransactionLog.objects.all())
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('id,transaction__reference,action'))
+        self.assertIn(f'{transaction.reference},created,buyer@example.com', lines[1])
+        self.assertIn('"a, b"', lines[2])
+
+
+class P2PServiceListingModelTest(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', email='seller@example.com', password='testpass123'
+        )
+        self.listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+            status='under_review',
+        )
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_proof_image_is_hashed_after_commit(self):
+        """Test that uploading a proof image queues hashing instead of hashing inside save()"""
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        self.listing.proof_image = SimpleUploadedFile('proof.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.listing.save()
+            self.assertEqual(self.listing.proof_image_hash, '')
+        self.assertEqual(len(callbacks), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(len(self.listing.proof_image_hash), 16)
+        self.listing.proof_image.delete(save=False)
+
+    def test_batch_hash_images_matches_single_hash(self):
+        """Test that batch hashing agrees with per-image hashing and skips unreadable files"""
+        files = []
+        for color in [(200, 30, 30), (10, 120, 240)]:
+            buffer = BytesIO()
+            image = Image.new('RGB', (64, 48), color)
+            image.paste((255, 255, 255), (0, 0, 20, 30))
+            image.save(buffer, 'JPEG')
+            files.append(buffer)
+        expected = [P2PServiceListing.compute_proof_image_hash(f) for f in files]
+        hashes = P2PServiceListing.batch_hash_images(files[:1] + [BytesIO(b'not an image')] + files[1:])
+        self.assertEqual(hashes, [expected[0], None, expected[1]])
+
+    def test_identifier_hash_follows_identifier_changes_only(self):
+        """Test that save() rehashes the service identifier only when it changes"""
+        listing = P2PServiceListing.objects.get(pk=self.listing.pk)
+        original_hash = listing.service_identifier_hash
+        with patch.object(P2PServiceListing, 'hash_service_identifier', wraps=P2PServiceListing.hash_service_identifier) as hasher:
+            listing.views_count += 1
+            listing.save(update_fields=['views_count'])
+            listing.save()
+            hasher.assert_not_called()
+            listing.paypal_email = 'other@paypal.com'
+            listing.save(update_fields=['paypal_email'])
+            hasher.assert_called_once_with('other@paypal.com')
+        listing.refresh_from_db()
+        self.assertNotEqual(listing.service_identifier_hash, original_hash)
+        self.assertEqual(listing.service_identifier_hash, P2PServiceListing.hash_service_identifier('other@paypal.com'))
+
+    def test_check_buyer_qualifications_loads_buyer_flags_once(self):
+        """Test that qualifying a buyer against many listings reads the buyer row once"""
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        kyc_listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='cashapp',
+            cashapp_tag='$seller',
+            buyer_must_be_kyc_verified=True,
+        )
+        listings = [self.listing, kyc_listing]
+        with self.assertNumQueries(1):
+            results = P2PServiceListing.check_buyer_qualifications(listings, buyer)
+        self.assertEqual(results[self.listing.pk], (True, None))
+        self.assertEqual(results[kyc_listing.pk], (False, "Buyer must have KYC approval"))
+
+    def test_saving_other_fields_does_not_queue_proof_image_task(self):
+        """Test that only a new upload queues the proof image task, even while the hash is empty"""
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(proof_image='p2p_service_listing_proofs/legacy.jpg')
+        listing = P2PServiceListing.objects.get(pk=self.listing.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            listing.views_count += 1
+            listing.save(update_fields=['views_count'])
+            listing.save()
+        self.assertEqual(callbacks, [])
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_proof_image_task_leaves_a_newer_upload_alone(self):
+        """Test that a queued task doesn't overwrite an image uploaded after it was queued, or leave its copy behind"""
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        self.listing.proof_image = SimpleUploadedFile('proof.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.listing.save()
+        uploaded_name = self.listing.proof_image.name
+        stored_files = set(default_storage.listdir('p2p_service_listing_proofs')[1])
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(proof_image='p2p_service_listing_proofs/newer.jpg')
+        
+        for callback in callbacks:
+            callback()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.proof_image.name, 'p2p_service_listing_proofs/newer.jpg')
+        self.assertEqual(self.listing.proof_image_hash, '')
+        self.assertIsNone(self.listing.proof_image_processed_at)
+        self.assertEqual(set(default_storage.listdir('p2p_service_listing_proofs')[1]), stored_files)
+        default_storage.delete(uploaded_name)
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_hash_proof_images_backfills_unprocessed_listings(self):
+        """Test that the backfill command hashes legacy proof images and records the ones it can't hash"""
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        image_name = default_storage.save('p2p_service_listing_proofs/legacy.jpg', BytesIO(buffer.getvalue()))
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(proof_image=image_name)
+        missing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='cashapp',
+            cashapp_tag='$seller',
+        )
+        P2PServiceListing.objects.filter(pk=missing.pk).update(proof_image='p2p_service_listing_proofs/missing.jpg')
+        
+        with patch.object(P2PServiceListing, 'batch_hash_images', wraps=P2PServiceListing.batch_hash_images) as batch_hash:
+            call_command('hash_proof_images', stdout=StringIO())
+        batch_hash.assert_called_once()
+        self.listing.refresh_from_db()
+        missing.refresh_from_db()
+        image_hash = compute_image_hash(BytesIO(buffer.getvalue()))
+        self.assertEqual(self.listing.proof_image_hash, image_hash)
+        self.assertEqual(
+            self.listing.proof_image_hash_band0, phash_band_fields('proof_image_hash', image_hash)['proof_image_hash_band0']
+        )
+        self.assertIsNotNone(self.listing.proof_image_processed_at)
+        self.assertEqual(missing.proof_image_hash, '')
+        self.assertIsNotNone(missing.proof_image_processed_at)
+        
+        output = StringIO()
+        call_command('hash_proof_images', stdout=output)
+        self.assertIn('Found 0 listings', output.getvalue())
+        default_storage.delete(image_name)
+
+
+class P2PServiceListingCreateSerializerTest(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', email='seller@example.com', password='testpass123', can_sell_p2p=True
+        )
+        self.request = RequestFactory().post('/')
+        self.request.user = self.seller
+        self.payment_methods = [{'method': 'momo', 'provider': 'MTN', 'number': '0240000000'}]
+        self.existing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+            status='active',
+            rate_cedis_per_usd=Decimal('12.00'),
+            min_amount_usd=Decimal('5.00'),
+            max_amount_usd=Decimal('40.00'),
+            available_amount_usd=Decimal('40.00'),
+            accepted_payment_methods=self.payment_methods,
+        )
+
+    def _serializer(self, **overrides):
+        data = {
+            'listing_type': 'sell',
+            'service_type': 'paypal',
+            'paypal_email': 'Seller@PayPal.com',
+            'rate_cedis_per_usd': '12.00',
+            'min_amount_usd': '5.00',
+            'max_amount_usd': '40.00',
+            'available_amount_usd': '40.00',
+            'accepted_payment_methods': self.payment_methods,
+            **overrides,
+        }
+        return P2PServiceListingCreateSerializer(data=data, context={'request': self.request})
+
+    def test_approved_application_authorizes_seller_in_one_query(self):
+        """Test that an approved application lets a user sell even before their user flags catch up"""
+        applicant = User.objects.create_user(username='applicant', email='applicant@example.com', password='testpass123')
+        SellerApplication.objects.create(user=applicant, reason='Selling PayPal balance', status='approved')
+        self.request.user = applicant
+        serializer = self._serializer(paypal_email='applicant@paypal.com')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(len([q for q in queries.captured_queries if 'seller_applications' in q['sql']]), 1)
+
+    def test_pending_applicant_cannot_create_sell_listing(self):
+        """Test that a user whose application is still pending is told so"""
+        applicant = User.objects.create_user(
+            username='applicant', email='applicant@example.com', password='testpass123', seller_status='pending'
+        )
+        SellerApplication.objects.create(user=applicant, reason='Selling PayPal balance')
+        self.request.user = applicant
+        serializer = self._serializer(paypal_email='applicant@paypal.com')
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('pending review', str(serializer.errors['listing_type']))
+
+    def test_exact_duplicate_listing_is_rejected(self):
+        """Test that a listing matching an active one on rate, amounts and payment methods is rejected"""
+        serializer = self._serializer()
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('already have an active listing', str(serializer.errors['rate_cedis_per_usd']))
+
+    def test_payment_method_order_does_not_make_a_listing_different(self):
+        """Test that reordering the same payment methods still counts as a duplicate"""
+        methods = [{'method': 'bank', 'bank_name': 'GCB', 'account_number': '123'}, *self.payment_methods]
+        P2PServiceListing.objects.filter(pk=self.existing.pk).update(accepted_payment_methods=methods)
+        serializer = self._serializer(accepted_payment_methods=list(reversed(methods)))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('already have an active listing', str(serializer.errors['rate_cedis_per_usd']))
+
+    def test_listing_without_meaningful_difference_is_rejected(self):
+        """Test that a rate within 0.10 of an otherwise identical listing is rejected as similar"""
+        serializer = self._serializer(rate_cedis_per_usd='12.05')
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('1 similar active listing(s)', str(serializer.errors['rate_cedis_per_usd']))
+
+    def test_listing_outside_the_rate_window_still_counts_as_a_difference(self):
+        """Test that a live listing 0.10 or more away on rate keeps a similar listing from being rejected"""
+        P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+            status='active',
+            rate_cedis_per_usd=Decimal('15.00'),
+            min_amount_usd=Decimal('5.00'),
+            max_amount_usd=Decimal('40.00'),
+            available_amount_usd=Decimal('40.00'),
+            accepted_payment_methods=self.payment_methods,
+        )
+        serializer = self._serializer(rate_cedis_per_usd='12.05')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        compared = [q for q in queries.captured_queries if '"p2p_service_listings"."accepted_payment_methods"' in q['sql']]
+        self.assertEqual(len(compared), 1)
+        self.assertIn('"p2p_service_listings"."rate_cedis_per_usd" <', compared[0]['sql'])
+
+    def test_listing_with_meaningful_rate_difference_is_allowed(self):
+        """Test that the same identifier is accepted once the rate differs by at least 0.10"""
+        serializer = self._serializer(rate_cedis_per_usd='12.10')
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+
+class SimilarHashExistsTest(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', email='seller@example.com', password='testpass123'
+        )
+        self.listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+        )
+
+    def test_similar_hash_exists_uses_the_duplicate_threshold(self):
+        """Test that stored hashes match within 9 differing bits (over 85% similar) and not beyond"""
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(proof_image_hash='00000000000001ff')
+        listings = P2PServiceListing.objects.all()
+        self.assertTrue(similar_hash_exists(listings, 'proof_image_hash', '00000000000001ff'))
+        self.assertTrue(similar_hash_exists(listings, 'proof_image_hash', '0000000000000000'))
+        self.assertFalse(similar_hash_exists(listings, 'proof_image_hash', '8000000000000000'))
+        self.assertFalse(similar_hash_exists(listings.exclude(pk=self.listing.pk), 'proof_image_hash', '00000000000001ff'))
+
+    def test_similar_hash_exists_narrows_candidates_by_band(self):
+        """Test that banded hashes are still found when no band matches exactly"""
+        stored = '0007000700030001'
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(
+            proof_image_hash=stored, **phash_band_fields('proof_image_hash', stored)
+        )
+        listings = P2PServiceListing.objects.all()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(similar_hash_exists(listings, 'proof_image_hash', '0000000000000000'))
+        self.assertIn('"proof_image_hash_band3" IN', queries.captured_queries[-1]['sql'])
+        self.assertFalse(similar_hash_exists(listings, 'proof_image_hash', '00000000000c0000'))
+
+    def test_find_similar_hash_returns_the_matching_hash(self):
+        """Test that find_similar_hash hands back the stored hash it matched, so callers can look up its row"""
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(proof_image_hash='00000000000001ff')
+        listings = P2PServiceListing.objects.all()
+        self.assertEqual(find_similar_hash(listings, 'proof_image_hash', '0000000000000000'), '00000000000001ff')
+        self.assertIsNone(find_similar_hash(listings, 'proof_image_hash', '8000000000000000'))
+
+    def test_similar_hash_exists_band_lookup_matches_up_to_max_distance(self):
+        """Test that banded lookups match a hash exactly 9 bits away and reject one 10 bits away"""
+        listings = P2PServiceListing.objects.all()
+        nine_bits_away = '0007000300030003'
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(
+            proof_image_hash=nine_bits_away, **phash_band_fields('proof_image_hash', nine_bits_away)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(similar_hash_exists(listings, 'proof_image_hash', '0000000000000000'))
+        self.assertIn('"proof_image_hash_band0" IN', queries.captured_queries[-1]['sql'])
+        # 3 + 3 + 2 + 2 bits: band3 still makes it a candidate, so the distance filter has to reject it
+        ten_bits_away = '0007000700030003'
+        P2PServiceListing.objects.filter(pk=self.listing.pk).update(
+            proof_image_hash=ten_bits_away, **phash_band_fields('proof_image_hash', ten_bits_away)
+        )
+        self.assertFalse(similar_hash_exists(listings, 'proof_image_hash', '0000000000000000'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.gettempdir())
+class SellerApplicationCreateSerializerTest(TestCase):
+    def setUp(self):
+        self.applicant = User.objects.create_user(
+            username='applicant', email='applicant@example.com', password='testpass123',
+            email_verified=True, kyc_status='approved',
+        )
+        self.request = RequestFactory().post('/')
+        self.request.user = self.applicant
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, 'JPEG')
+        self.image_bytes = buffer.getvalue()
+        self.image_hash = compute_image_hash(BytesIO(self.image_bytes))
+
+    def _apply(self):
+        serializer = SellerApplicationCreateSerializer(data={
+            'reason': 'I have a funded PayPal account to sell from',
+            'service_types': ['paypal'],
+            'proof_of_funds_image': SimpleUploadedFile('funds.jpg', self.image_bytes, content_type='image/jpeg'),
+        }, context={'request': self.request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            application = serializer.save()
+        self.assertEqual(len(callbacks), 1)
+        application.refresh_from_db()
+        self.addCleanup(application.proof_of_funds_image.delete, save=False)
+        return application
+
+    def test_proof_of_funds_is_hashed_after_commit(self):
+        """Test that a new proof of funds image is hashed by the scan task and the application stays pending"""
+        application = self._apply()
+        self.assertEqual(application.status, 'pending')
+        self.assertEqual(application.proof_of_funds_hash, self.image_hash)
+        self.assertIsNotNone(application.proof_of_funds_hash_band0)
+
+    def test_reused_proof_of_funds_image_is_rejected(self):
+        """Test that a proof of funds image on another user's application rejects the new one"""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        SellerApplication.objects.create(user=other, reason='Selling PayPal balance', proof_of_funds_hash=self.image_hash)
+        application = self._apply()
+        self.assertEqual(application.status, 'rejected')
+        self.assertIn('used before', application.rejection_reason)
+        self.applicant.refresh_from_db()
+        self.assertEqual(self.applicant.seller_status, 'rejected')
+        self.assertTrue(Notification.objects.filter(
+            user=self.applicant, notification_type='SELLER_APPLICATION_REJECTED'
+        ).exists())
+
+    def test_listing_proof_image_cannot_be_reused_as_proof_of_funds(self):
+        """Test that an image already used as a listing proof rejects the application"""
+        listing = P2PServiceListing.objects.create(seller=self.applicant, service_type='cashapp', cashapp_tag='$applicant')
+        P2PServiceListing.objects.filter(pk=listing.pk).update(proof_image_hash=self.image_hash)
+        application = self._apply()
+        self.assertEqual(application.status, 'rejected')
+        self.assertIn('used in a listing', application.rejection_reason)
+
+    def test_scan_leaves_an_application_approved_while_queued(self):
+        """Test that the scan only rejects an application that is still pending when it takes the row lock"""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        SellerApplication.objects.create(user=other, reason='Selling PayPal balance', proof_of_funds_hash=self.image_hash)
+        serializer = SellerApplicationCreateSerializer(data={
+            'reason': 'I have a funded PayPal account to sell from',
+            'service_types': ['paypal'],
+            'proof_of_funds_image': SimpleUploadedFile('funds.jpg', self.image_bytes, content_type='image/jpeg'),
+        }, context={'request': self.request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks() as callbacks:
+            application = serializer.save()
+        self.addCleanup(application.proof_of_funds_image.delete, save=False)
+        SellerApplication.objects.filter(pk=application.pk).update(status='approved')
+        for callback in callbacks:
+            callback()
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'approved')
+        self.assertFalse(Notification.objects.filter(user=self.applicant).exists())
+
+
+class SellerApplicationViewSetTest(TestCase):
+    def test_list_annotates_applicant_names(self):
+        """Test that applicant names are annotated on the queryset rather than built per row"""
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='testpass123', is_staff=True)
+        for index, (first_name, last_name) in enumerate([('Ama', 'Mensah'), ('', '')]):
+            applicant = User.objects.create_user(
+                username=f'applicant{index}', email=f'applicant{index}@example.com', password='testpass123',
+                first_name=first_name, last_name=last_name,
+            )
+            SellerApplication.objects.create(user=applicant, reason='Selling PayPal balance')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/orders/seller-applications/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual({row['user_name'] for row in results}, {'Ama Mensah', 'applicant1@example.com'})
+        self.assertTrue(all(row['reviewer_name'] is None for row in results))
+
+
+class P2PServiceListingViewSetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.sellers = []
+        for i in range(3):
+            seller = User.objects.create_user(
+                username=f'seller{i}', email=f'seller{i}@example.com', password='testpass123'
+            )
+            listing = P2PServiceListing.objects.create(
+                seller=seller,
+                service_type='paypal',
+                paypal_email=f'seller{i}@paypal.com',
+                status='active',
+            )
+            for rating in range(1, i + 2):
+                transaction = P2PServiceTransaction.objects.create(
+                    listing=listing,
+                    buyer=self.buyer,
+                    seller=seller,
+                    amount_usd=Decimal('10.00'),
+                    agreed_price_cedis=Decimal('120.00'),
+                    escrow_amount_cedis=Decimal('120.00'),
+                )
+                P2PServiceTransactionRating.objects.create(
+                    transaction=transaction, rater=self.buyer, rated_user=seller, rating=rating
+                )
+            self.sellers.append(seller)
+
+    def test_list_uses_annotated_seller_names(self):
+        """Test that seller names come from the queryset annotation, falling back to email"""
+        User.objects.filter(pk=self.sellers[0].pk).update(first_name='Kofi', last_name='Boateng')
+        response = self.client.get('/api/orders/p2p-service-listings/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual(
+            {row['seller_name'] for row in results},
+            {'Kofi Boateng', 'seller1@example.com', 'seller2@example.com'},
+        )
+
+    def test_list_fetches_seller_rating_stats_per_page(self):
+        """Test that listing rating stats are fetched once per page, not per row"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/p2p-service-listings/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        stats = {row['seller']: row['seller_rating_stats'] for row in results}
+        self.assertEqual(stats[self.sellers[0].id], {'average_rating': 1.0, 'total_ratings': 1})
+        self.assertEqual(stats[self.sellers[2].id], {'average_rating': 2.0, 'total_ratings': 3})
+        rating_queries = [q for q in queries.captured_queries if 'p2p_service_transaction_ratings' in q['sql']]
+        self.assertEqual(len(rating_queries), 1)
+
+    def test_seller_rating_stats_are_cached_until_a_new_rating(self):
+        """Test that a repeat page load reads rating stats from the cache and a new rating refreshes them"""
+        self.client.get('/api/orders/p2p-service-listings/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/orders/p2p-service-listings/')
+        self.assertFalse([q for q in queries.captured_queries if 'p2p_service_transaction_ratings' in q['sql']])
+        seller = self.sellers[0]
+        transaction = P2PServiceTransaction.objects.create(
+            listing=P2PServiceListing.objects.get(seller=seller),
+            buyer=self.buyer,
+            seller=seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+        )
+        P2PServiceTransactionRating.objects.create(transaction=transaction, rater=self.buyer, rated_user=seller, rating=5)
+        results = self.client.get('/api/orders/p2p-service-listings/').json()
+        results = results.get('results', results)
+        stats = {row['seller']: row['seller_rating_stats'] for row in results}
+        self.assertEqual(stats[seller.id], {'average_rating': 3.0, 'total_ratings': 2})
+
+    def test_seller_stats_uses_one_aggregate_query(self):
+        """Test that the seller stats endpoint returns totals and breakdown from a single query"""
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        seller = self.sellers[2]
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/orders/p2p-service-ratings/seller_stats/?seller_id={seller.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'total_ratings': 3,
+            'average_rating': 2.0,
+            'rating_breakdown': {'1': 1, '2': 1, '3': 1, '4': 0, '5': 0},
+        })
+        rating_queries = [q for q in queries.captured_queries if 'p2p_service_transaction_ratings' in q['sql']]
+        self.assertEqual(len(rating_queries), 1)
+
+    def test_list_computes_trust_score_once_per_seller(self):
+        """Test that a seller with several listings is only scored once per page"""
+        P2PServiceListing.objects.create(
+            seller=self.sellers[0],
+            service_type='cashapp',
+            cashapp_tag='$seller0',
+            status='active',
+        )
+        with patch('authentication.models.User.get_effective_trust_score', return_value=0) as trust_score:
+            response = self.client.get('/api/orders/p2p-service-listings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(trust_score.call_count, len(self.sellers))
+
+    def test_list_qualifies_the_buyer_once_per_page(self):
+        """Test that the feed reports the buyer's qualification per listing from a single read of the buyer's flags"""
+        P2PServiceListing.objects.filter(seller=self.sellers[0]).update(min_completed_trades=1)
+        P2PServiceListing.objects.filter(seller=self.sellers[1]).update(required_payment_providers=['MTN'])
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/orders/p2p-service-listings/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        qualifications = {row['seller']: row['buyer_qualification'] for row in results}
+        self.assertFalse(qualifications[self.sellers[0].pk]['qualified'])
+        self.assertIn('at least 1 completed P2P trades', qualifications[self.sellers[0].pk]['reason'])
+        # Provider requirements wait until the buyer picks a payment method
+        self.assertEqual(qualifications[self.sellers[1].pk], {'qualified': True, 'reason': None})
+        flag_reads = [
+            q for q in queries.captured_queries
+            if '"completed_p2p_trades_count"' in q['sql'] and '"password"' not in q['sql']
+        ]
+        self.assertEqual(len(flag_reads), 1)
+
+    def test_anonymous_list_has_no_buyer_qualification(self):
+        """Test that anonymous visitors get no qualification and trigger no buyer lookups"""
+        response = self.client.get('/api/orders/p2p-service-listings/')
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual({row['buyer_qualification'] for row in results}, {None})
+
+    def test_public_feed_uses_card_fields_without_deferred_loads(self):
+        """Test that the public feed leaves out notes fields and never loads deferred columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/p2p-service-listings/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        self.assertNotIn('admin_notes', results[0])
+        self.assertNotIn('terms_notes', results[0])
+        listing_queries = [
+            q for q in queries.captured_queries if q['sql'].startswith('SELECT "p2p_service_listings"."id"')
+        ]
+        self.assertEqual(len(listing_queries), 1)
+        self.assertNotIn('admin_notes', listing_queries[0]['sql'])
+
+
+class P2PServiceTransactionViewSetTest(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123', first_name='Ama', last_name='Mensah'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def _create_rated_transaction(self, index):
+        seller = User.objects.create_user(
+            username=f'seller{index}', email=f'seller{index}@example.com', password='testpass123'
+        )
+        listing = P2PServiceListing.objects.create(
+            seller=seller,
+            service_type='paypal',
+            paypal_email=f'seller{index}@paypal.com',
+            status='active',
+        )
+        transaction = P2PServiceTransaction.objects.create(
+            listing=listing,
+            buyer=self.buyer,
+            seller=seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+        )
+        P2PServiceTransactionRating.objects.create(transaction=transaction, rater=self.buyer, rated_user=seller, rating=5)
+
+    def test_list_filters_by_payment_provider_column(self):
+        """Test that transactions can be filtered by provider through the indexed column, not the JSON details"""
+        for index in range(2):
+            self._create_rated_transaction(index)
+        mtn = P2PServiceTransaction.objects.filter(seller__username='seller0').get()
+        mtn.payment_method_details = {'method': 'momo', 'provider': 'MTN'}
+        mtn.save(update_fields=['payment_method_details'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/p2p-service-transactions/', {'selected_payment_provider': 'MTN'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual([row['id'] for row in results], [mtn.pk])
+        self.assertTrue(any(
+            '"p2p_service_transactions"."selected_payment_provider" = ' in q['sql'] for q in queries.captured_queries
+        ))
+
+    def test_create_is_blocked_by_incomplete_transactions(self):
+        """Test that a buyer with open transactions gets their count and references back in one query"""
+        for index in range(4):
+            self._create_rated_transaction(index)
+        seller = User.objects.get(username='seller0')
+        listing = P2PServiceListing.objects.get(seller=seller)
+        listing.accepted_payment_methods = [{'method': 'momo', 'provider': 'MTN', 'number': '0240000000'}]
+        listing.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/p2p-service-transactions/', {
+                'listing_id': listing.id,
+                'amount_usd': '10.00',
+                'selected_payment_method': 'momo',
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['count'], 4)
+        self.assertEqual(len(response.json()['incomplete_transactions']), 3)
+        transaction_queries = [q for q in queries.captured_queries if 'FROM "p2p_service_transactions"' in q['sql']]
+        self.assertEqual(len(transaction_queries), 1)
+
+    def test_create_loads_the_listing_once(self):
+        """Test that the create serializer and view share one listing lookup"""
+        self._create_rated_transaction(0)
+        P2PServiceTransaction.objects.update(status='pending_payment')
+        listing = P2PServiceListing.objects.get(seller__username='seller0')
+        listing.accepted_payment_methods = [{'method': 'momo', 'provider': 'MTN', 'number': '0240000000'}]
+        listing.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/p2p-service-transactions/', {
+                'listing_id': listing.id,
+                'amount_usd': '10.00',
+                'selected_payment_method': 'momo',
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        listing_queries = [q for q in queries.captured_queries if 'FROM "p2p_service_listings"' in q['sql']]
+        self.assertEqual(len(listing_queries), 1)
+
+    def test_rating_an_already_rated_transaction(self):
+        """Test that the already-rated check comes from the transaction lookup itself"""
+        self._create_rated_transaction(0)
+        transaction = P2PServiceTransaction.objects.get()
+        P2PServiceTransaction.objects.update(status='completed')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/p2p-service-ratings/', {
+                'transaction': str(transaction.id),
+                'rating': 4,
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['transaction'], ['This transaction has already been rated.'])
+        self.assertEqual(len(queries.captured_queries), 1)
+
+    def test_list_image_urls_are_absolute(self):
+        """Test that image links in the list use the request's scheme and host"""
+        self._create_rated_transaction(0)
+        self._create_rated_transaction(1)
+        P2PServiceTransaction.objects.filter(seller__username='seller0').update(
+            service_proof_image='p2p_service_transaction_proofs/proof.png',
+            payment_screenshot='p2p_payment_screenshots/paid.png',
+        )
+        response = self.client.get('/api/orders/p2p-service-transactions/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        rows = {row['seller_email']: row for row in results}
+        self.assertEqual(
+            rows['seller0@example.com']['service_proof_image_url'],
+            'http://testserver/media/p2p_service_transaction_proofs/proof.png',
+        )
+        self.assertEqual(
+            rows['seller0@example.com']['payment_screenshot_url'],
+            'http://testserver/media/p2p_payment_screenshots/paid.png',
+        )
+        self.assertIsNone(rows['seller1@example.com']['service_proof_image_url'])
+
+    def test_list_query_count_is_constant(self):
+        """Test that listing transactions doesn't look up the listing, parties or rating per row"""
+        self._create_rated_transaction(0)
+        with CaptureQueriesContext(connection) as one_row:
+            response = self.client.get('/api/orders/p2p-service-transactions/')
+        self.assertEqual(response.status_code, 200)
+        for index in range(1, 4):
+            self._create_rated_transaction(index)
+        with CaptureQueriesContext(connection) as many_rows:
+            response = self.client.get('/api/orders/p2p-service-transactions/')
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(row['has_rating'] for row in results))
+        self.assertTrue(all(row['is_buyer'] and not row['is_seller'] for row in results))
+        self.assertEqual({row['buyer_name'] for row in results}, {'Ama Mensah'})
+        self.assertEqual({row['seller_name'] for row in results}, {f'seller{index}@example.com' for index in range(4)})
+        self.assertEqual(len(many_rows), len(one_row))
+        rating_queries = [
+            q for q in many_rows.captured_queries if q['sql'].startswith('SELECT "p2p_service_transaction_ratings"')
+        ]
+        self.assertEqual(rating_queries, [])
+
+class ProcessAutoActionsEnhancedTest(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@example.com', password='testpass123')
+        self.listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+            status='sold',
+            available_amount_usd=Decimal('0.00'),
+        )
+        self.buyer_wallet = Wallet.objects.create(user=self.buyer, escrow_balance=Decimal('120.00'))
+        self.seller_wallet = Wallet.objects.create(user=self.seller)
+
+    def _create_transaction(self, **kwargs):
+        return P2PServiceTransaction.objects.create(
+            listing=self.listing,
+            buyer=self.buyer,
+            seller=self.seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+            **kwargs
+        )
+
+    def test_payment_timeout_cancels_and_refunds(self):
+        """Test that an unpaid SELL transaction past its deadline is cancelled and escrow refunded"""
+        transaction = self._create_transaction(
+            status='payment_received',
+            payment_deadline=timezone.now() - timedelta(minutes=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'], 1)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'cancelled')
+        self.assertIsNotNone(transaction.cancelled_at)
+        self.buyer_wallet.refresh_from_db()
+        self.assertEqual(self.buyer_wallet.escrow_balance, Decimal('0.00'))
+        self.assertEqual(self.buyer_wallet.balance_cedis, Decimal('120.00'))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.available_amount_usd, Decimal('10.00'))
+        self.assertEqual(self.listing.status, 'active')
+        self.assertTrue(WalletTransaction.objects.filter(reference=f'{transaction.reference}-PAYMENT-TIMEOUT').exists())
+        self.assertTrue(Notification.objects.filter(user=self.buyer, notification_type='P2P_SERVICE_CANCELLED').exists())
+
+    def test_buyer_verification_timeout_releases_to_seller(self):
+        """Test that an unverified SELL transaction past its deadline completes and pays the seller"""
+        transaction = self._create_transaction(
+            status='service_provided',
+            buyer_verification_deadline=timezone.now() - timedelta(minutes=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['buyer_verification_timeout'], 1)
+        self.assertEqual(processed['safety_net_releases'], 0)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'completed')
+        self.assertTrue(transaction.escrow_released)
+        self.assertTrue(transaction.buyer_verified)
+        self.buyer_wallet.refresh_from_db()
+        self.seller_wallet.refresh_from_db()
+        self.assertEqual(self.buyer_wallet.escrow_balance, Decimal('0.00'))
+        self.assertEqual(self.seller_wallet.balance_cedis, Decimal('120.00'))
+        self.assertEqual(Notification.objects.filter(related_object_id=transaction.id).count(), 2)
+
+    def test_missing_seller_wallet_is_created(self):
+        """Test that a release creates the seller's wallet when it does not exist yet"""
+        self.seller_wallet.delete()
+        self._create_transaction(
+            status='verifying',
+            buyer_verified=True,
+            auto_release_at=timezone.now() - timedelta(minutes=1),
+        )
+        processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['auto_released'], 1)
+        self.assertEqual(Wallet.objects.get(user=self.seller).balance_cedis, Decimal('120.00'))
+
+    def test_failed_row_leaves_no_ledger_entry(self):
+        """Test that a row whose escrow release fails is skipped without a wallet transaction"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('0.00'))
+        transaction = self._create_transaction(
+            status='payment_received',
+            payment_deadline=timezone.now() - timedelta(minutes=1),
+        )
+        processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'], 0)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'payment_received')
+        self.assertFalse(WalletTransaction.objects.exists())
+
+    def test_failed_row_does_not_leave_stale_wallet_for_next_row(self):
+        """Test that a row rolled back after moving escrow doesn't break the same buyer's next row"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('240.00'))
+        deadline = timezone.now() - timedelta(minutes=1)
+        failing = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        second = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        original_save = P2PServiceTransaction.save
+        
+        def save(instance, *args, **kwargs):
+            if instance.pk == failing.pk:
+                raise DatabaseError('simulated failure after the escrow release')
+            return original_save(instance, *args, **kwargs)
+        
+        with patch.object(P2PServiceTransaction, 'save', autospec=True, side_effect=save):
+            processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'], 1)
+        failing.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(failing.status, 'payment_received')
+        self.assertEqual(second.status, 'cancelled')
+        self.buyer_wallet.refresh_from_db()
+        self.assertEqual(self.buyer_wallet.escrow_balance, Decimal('120.00'))
+        self.assertEqual(self.buyer_wallet.balance_cedis, Decimal('120.00'))
+        ledger = WalletTransaction.objects.get()
+        self.assertEqual(ledger.reference, f'{second.reference}-PAYMENT-TIMEOUT')
+        self.assertEqual(ledger.balance_before, Decimal('0.00'))
+
+    def test_rows_are_processed_in_chunks(self):
+        """Test that a run works through several chunks up to the batch size"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('360.00'))
+        deadline = timezone.now() - timedelta(minutes=1)
+        for _ in range(3):
+            self._create_transaction(status='payment_received', payment_deadline=deadline)
+        with patch('orders.p2p_binance_refactor.AUTO_ACTION_CHUNK_SIZE', 2):
+            self.assertEqual(process_auto_actions_enhanced()['payment_timeout'], 3)
+        self.assertFalse(P2PServiceTransaction.objects.exclude(status='cancelled').exists())
+
+    def test_clashing_ledger_reference_only_skips_its_row(self):
+        """Test that a ledger insert failure rolls back that row's escrow move and nothing else"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('240.00'))
+        deadline = timezone.now() - timedelta(minutes=1)
+        clashing = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        other = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        WalletTransaction.objects.create(
+            wallet=self.buyer_wallet,
+            transaction_type='escrow_release',
+            amount=Decimal('1.00'),
+            currency='cedis',
+            status='completed',
+            reference=f'{clashing.reference}-PAYMENT-TIMEOUT',
+        )
+        processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'], 1)
+        clashing.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(clashing.status, 'payment_received')
+        self.assertEqual(other.status, 'cancelled')
+        self.buyer_wallet.refresh_from_db()
+        self.assertEqual(self.buyer_wallet.escrow_balance, Decimal('120.00'))
+        self.assertTrue(WalletTransaction.objects.filter(reference=f'{other.reference}-PAYMENT-TIMEOUT').exists())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.available_amount_usd, Decimal('10.00'))
+
+    def test_cancellations_restore_listing_amount(self):
+        """Test that several cancellations on one listing add up and reopen it"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('240.00'))
+        deadline = timezone.now() - timedelta(minutes=1)
+        self._create_transaction(status='payment_received', payment_deadline=deadline)
+        self._create_transaction(status='payment_received', seller_response_deadline=deadline)
+        processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'] + processed['seller_response_timeout'], 2)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.available_amount_usd, Decimal('20.00'))
+        self.assertEqual(self.listing.status, 'active')
+
+    def test_batch_size_caps_rows_per_run(self):
+        """Test that a run claims at most AUTO_ACTION_BATCH_SIZE rows, oldest first"""
+        Wallet.objects.filter(pk=self.buyer_wallet.pk).update(escrow_balance=Decimal('240.00'))
+        deadline = timezone.now() - timedelta(minutes=1)
+        first = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        second = self._create_transaction(status='payment_received', payment_deadline=deadline)
+        with patch('orders.p2p_binance_refactor.AUTO_ACTION_BATCH_SIZE', 1):
+            self.assertEqual(process_auto_actions_enhanced()['payment_timeout'], 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'cancelled')
+        self.assertEqual(second.status, 'payment_received')
+
+    def test_row_due_on_several_deadlines_is_handled_once(self):
+        """Test that a row past two deadlines is handled by the first matching check only"""
+        deadline = timezone.now() - timedelta(minutes=1)
+        transaction = self._create_transaction(
+            status='payment_received',
+            payment_deadline=deadline,
+            seller_response_deadline=deadline,
+        )
+        processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['payment_timeout'], 1)
+        self.assertEqual(processed['seller_response_timeout'], 0)
+        self.assertEqual(WalletTransaction.objects.filter(reference__startswith=transaction.reference).count(), 1)
+        self.buyer_wallet.refresh_from_db()
+        self.assertEqual(self.buyer_wallet.balance_cedis, Decimal('120.00'))
+
+    def test_safety_net_release_is_logged_after_commit(self):
+        """Test that the safety net writes its action log only once the release commits"""
+        transaction = self._create_transaction(status='verifying')
+        P2PServiceTransaction.objects.filter(pk=transaction.pk).update(status='completed')
+        with self.captureOnCommitCallbacks() as callbacks:
+            processed = process_auto_actions_enhanced()
+        self.assertEqual(processed['safety_net_releases'], 1)
+        self.assertFalse(P2PServiceTransactionLog.objects.filter(transaction=transaction).exists())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(P2PServiceTransactionLog.objects.filter(transaction=transaction, action='auto_released').exists())
+
+    def test_completion_maintains_buyer_completed_trades_count(self):
+        """Test that completing a transaction bumps the buyer's count used by listing requirements"""
+        self._create_transaction(
+            status='service_provided',
+            buyer_verification_deadline=timezone.now() - timedelta(minutes=1),
+        )
+        process_auto_actions_enhanced()
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.completed_p2p_trades_count, 1)
+        self.listing.listing_type = 'sell'
+        self.listing.min_completed_trades = 2
+        qualified, reason = self.listing.check_buyer_qualification(self.buyer)
+        self.assertFalse(qualified)
+        self.assertIn('You have 1.', reason)
+
+
+class P2PServiceTransactionModelTest(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@example.com', password='testpass123')
+        self.listing = P2PServiceListing.objects.create(
+            seller=self.seller,
+            service_type='paypal',
+            paypal_email='seller@paypal.com',
+        )
+
+    def _create_transaction(self, **kwargs):
+        return P2PServiceTransaction.objects.create(
+            listing=self.listing,
+            buyer=self.buyer,
+            seller=self.seller,
+            amount_usd=Decimal('10.00'),
+            agreed_price_cedis=Decimal('120.00'),
+            escrow_amount_cedis=Decimal('120.00'),
+            **kwargs
+        )
+
+    def test_repeated_saves_count_completion_once(self):
+        """Test that only the save that moves a transaction into 'completed' bumps the buyer's count"""
+        transaction = P2PServiceTransaction.objects.get(pk=self._create_transaction(status='verifying').pk)
+        P2PServiceTransaction.objects.filter(pk=transaction.pk).update(escrow_released=True)
+        transaction.refresh_from_db()
+        transaction.status = 'completed'
+        transaction.save()
+        transaction.save()
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.completed_p2p_trades_count, 1)
+
+    def test_stale_instance_does_not_count_completion_twice(self):
+        """Test that a copy loaded before another path completed the row doesn't bump the count again"""
+        transaction = self._create_transaction(status='service_provided')
+        P2PServiceTransaction.objects.filter(pk=transaction.pk).update(escrow_released=True)
+        first = P2PServiceTransaction.objects.get(pk=transaction.pk)
+        stale = P2PServiceTransaction.objects.get(pk=transaction.pk)
+        first.status = 'completed'
+        first.save()
+        stale.status = 'completed'
+        stale.save()
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.completed_p2p_trades_count, 1)
+
+    def test_deleting_completed_transaction_uncounts_it(self):
+        """Test that deleting a completed transaction takes it back out of the buyer's count"""
+        transaction = self._create_transaction(status='verifying', escrow_released=True)
+        transaction.status = 'completed'
+        transaction.save()
+        self._create_transaction(status='cancelled')
+        P2PServiceTransaction.objects.all().delete()
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.completed_p2p_trades_count, 0)
+
+    def test_payment_provider_column_follows_payment_method_details(self):
+        """Test that the provider column is filled from payment_method_details on create and partial saves"""
+        transaction = self._create_transaction(payment_method_details={'method': 'momo', 'provider': 'MTN'})
+        self.assertEqual(
+            P2PServiceTransaction.objects.filter(selected_payment_provider='MTN').get().pk, transaction.pk
+        )
+        transaction.payment_method_details = {'method': 'momo', 'provider': 'Vodafone'}
+        transaction.save(update_fields=['payment_method_details'])
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.selected_payment_provider, 'Vodafone')
+
+    def test_partial_save_without_status_skips_status_lookup(self):
+        """Test that saving only non-status fields doesn't re-read the transaction row"""
+        transaction = P2PServiceTransaction.objects.only('id', 'admin_notes').get(
+            pk=self._create_transaction(status='verifying').pk
+        )
+        transaction.admin_notes = 'Checked by support'
+        with CaptureQueriesContext(connection) as queries:
+            transaction.save(update_fields=['admin_notes'])
+        status_reads = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and '"p2p_service_transactions"."status"' in q['sql']
+        ]
+        self.assertEqual(status_reads, [])
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.completed_p2p_trades_count, 0)
+
+    def test_status_save_reads_the_stored_row_once(self):
+        """Test that a status save and the escrow receiver share one narrow read of the stored row"""
+        transaction = self._create_transaction(status='verifying', escrow_released=True)
+        transaction.status = 'completed'
+        with CaptureQueriesContext(connection) as queries:
+            transaction.save()
+        row_reads = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "p2p_service_transactions"' in q['sql']
+        ]
+        self.assertEqual(len(row_reads), 1)
+        self.assertNotIn('"risk_factors"', row_reads[0])
+        self.assertFalse(hasattr(transaction, '_stored_status'))
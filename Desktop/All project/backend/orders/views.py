@@ -605,7 +605,7 @@ class GiftCardTransactionViewSet(viewsets.ModelViewSet):
                 
                 # ✅ FIX #6: Create audit log for transaction creation
                 from .models import TransactionAuditLog
-                TransactionAuditLog.create_audit_log(
+                TransactionAuditLog.queue_audit_log(
                     transaction_type='gift_card',
                     transaction_id=transaction.id,
                     action='created',
@@ -627,7 +627,7 @@ class GiftCardTransactionViewSet(viewsets.ModelViewSet):
                 )
                 
                 # ✅ FIX #6: Create audit log for escrow lock
-                TransactionAuditLog.create_audit_log(
+                TransactionAuditLog.queue_audit_log(
                     transaction_type='gift_card',
                     transaction_id=transaction.id,
                     action='payment_locked',
@@ -761,7 +761,6 @@ class GiftCardTransactionViewSet(viewsets.ModelViewSet):
         card_hash = GiftCardListing.compute_card_hash(gift_card_code, gift_card_pin)
         
         # Check in active listings (excluding current transaction's listing)
-        from orders.models import GiftCardListing
         existing_listing = GiftCardListing.objects.filter(
             card_hash=card_hash,
             status__in=['active', 'under_review', 'sold']
@@ -852,47 +851,19 @@ class GiftCardTransactionViewSet(viewsets.ModelViewSet):
                     
                     if image_hash:
                         # Check for similar images in listings
-                        from orders.models import GiftCardListing
-                        existing_listings = GiftCardListing.objects.filter(
-                            proof_image_hash__isnull=False
-                        ).exclude(id=transaction.listing.id)
-                        
-                        try:
-                            import imagehash
-                            current_hash = imagehash.hex_to_hash(image_hash)
-                            
-                            for listing in existing_listings:
-                                if not listing.proof_image_hash:
-                                    continue
-                                
-                                try:
-                                    existing_hash = imagehash.hex_to_hash(listing.proof_image_hash)
-                                    distance = current_hash - existing_hash
-                                    similarity = ((64 - distance) / 64) * 100
-                                    
-                                    if similarity > 85:
-                                        return Response(
-                                            {
-                                                'error': f'This proof image has been used before (similarity: {similarity:.1f}%). Reused photos are not allowed. Please upload a unique image of your gift card.',
-                                                'duplicate_listing_reference': listing.reference
-                                            },
-                                            status=status.HTTP_400_BAD_REQUEST
-                                        )
-                                except (ValueError, TypeError):
-                                    continue
-                        except ImportError:
-                            # Fallback: exact match if imagehash not available
-                            exact_match = existing_listings.filter(
-                                proof_image_hash=image_hash
-                            ).first()
-                            if exact_match:
-                                return Response(
-                                    {
-                                        'error': 'This proof image has been used before. Reused photos are not allowed. Please upload a unique image of your gift card.',
-                                        'duplicate_listing_reference': exact_match.reference
-                                    },
-                                    status=status.HTTP_400_BAD_REQUEST
-                                )
+                        from orders.image_utils import find_similar_hash
+                        other_listings = GiftCardListing.objects.exclude(id=transaction.listing.id)
+                        similar_hash = find_similar_hash(other_listings, 'proof_image_hash', image_hash)
+                        if similar_hash:
+                            return Response(
+                                {
+                                    'error': 'This proof image has been used before. Reused photos are not allowed. Please upload a unique image of your gift card.',
+                                    'duplicate_listing_reference': other_listings.filter(
+                                        proof_image_hash=similar_hash
+                                    ).values_list('reference', flat=True).first()
+                                },
+                                status=status.HTTP_400_BAD_REQUEST
+                            )
                 
                 # Set buyer verification deadline (48 hours from now)
                 from datetime import timedelta
@@ -1833,7 +1804,14 @@ class GiftCardTransactionRatingViewSet(viewsets.ModelViewSet):
             is_visible=True
         )
         
-        total_ratings = ratings.count()
+        # Total, average and per-star counts in one aggregate query
+        stats = ratings.aggregate(
+            total=models.Count('id'),
+            avg=models.Avg('rating'),
+            **{f'stars_{star}': models.Count('id', filter=models.Q(rating=star)) for star in range(1, 6)}
+        )
+        
+        total_ratings = stats['total']
         if total_ratings == 0:
             return Response({
                 'total_ratings': 0,
@@ -1841,21 +1819,11 @@ class GiftCardTransactionRatingViewSet(viewsets.ModelViewSet):
                 'rating_breakdown': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
             })
         
-        average_rating = ratings.aggregate(
-            avg=models.Avg('rating')
-        )['avg'] or 0
-        
-        rating_breakdown = {
-            1: ratings.filter(rating=1).count(),
-            2: ratings.filter(rating=2).count(),
-            3: ratings.filter(rating=3).count(),
-            4: ratings.filter(rating=4).count(),
-            5: ratings.filter(rating=5).count(),
-        }
+        rating_breakdown = {star: stats[f'stars_{star}'] for star in range(1, 6)}
         
         return Response({
             'total_ratings': total_ratings,
-            'average_rating': round(average_rating, 2),
+            'average_rating': round(stats['avg'] or 0, 2),
             'rating_breakdown': rating_breakdown
         })
 
@@ -40,7 +40,7 @@ class Wallet(models.Model):
         
         # Database-level atomic update with conditional check
         updated_rows = Wallet.objects.filter(
-            user=self.user,
+            pk=self.pk,
             version=self.version,
             balance_cedis__gte=amount  # Check balance at DB level
         ).update(
@@ -67,7 +67,7 @@ class Wallet(models.Model):
             raise ValidationError("Amount must be positive")
         
         updated_rows = Wallet.objects.filter(
-            user=self.user,
+            pk=self.pk,
             version=self.version,
             escrow_balance__gte=amount
         ).update(
@@ -94,7 +94,7 @@ class Wallet(models.Model):
             raise ValidationError("Amount must be positive")
         
         updated_rows = Wallet.objects.filter(
-            user=self.user,
+            pk=self.pk,
             version=self.version,
             escrow_balance__gte=amount
         ).update(
@@ -116,7 +116,7 @@ class Wallet(models.Model):
         if amount <= 0:
             raise ValidationError("Amount must be positive")
         
-        Wallet.objects.filter(user=self.user).update(
+        Wallet.objects.filter(pk=self.pk).update(
             balance_cedis=F('balance_cedis') + amount,
             version=F('version') + 1,
             updated_at=timezone.now()
@@ -132,7 +132,7 @@ class Wallet(models.Model):
             raise ValidationError("Amount must be positive")
         
         updated_rows = Wallet.objects.filter(
-            user=self.user,
+            pk=self.pk,
             version=self.version,
             balance_cedis__gte=amount
         ).update(